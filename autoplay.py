@@ -0,0 +1,188 @@
+import queue
+import subprocess
+import sys
+import threading
+import time
+import change_detect
+import vision
+
+# Block Blast draws a dragged piece above the finger, so the finger has to end
+# up below the target cells. Offset from the finger to the center of the
+# dragged piece, in board cells (calibrate with `python autoplay.py calibrate`).
+FINGER_OFFSET = (0.0, -2.5)
+
+# Duration of one drag; too fast and the game drops the piece where it started
+SWIPE_MS = 250
+
+class AdbInputSession:
+    """
+    One long-lived 'adb shell' whose stdin takes 'input swipe' commands,
+    instead of one adb process per gesture.
+    sync() waits until the shell has run everything sent so far. The shell's
+    output is read on a helper thread, so a hung shell can't block sync()
+    past its timeout.
+    """
+    def __init__(self, adb_cmd=('adb',)):
+        self.adb_cmd = list(adb_cmd)
+        self.process = None
+        self.lines = None
+        self.marker = 0
+
+    def start(self):
+        if self.process is None:
+            self.process = subprocess.Popen(self.adb_cmd + ['shell'], stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, text=True, bufsize=1)
+            self.lines = queue.Queue()
+            threading.Thread(target=self._read_output, args=(self.process, self.lines), daemon=True).start()
+        return self
+
+    @staticmethod
+    def _read_output(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)   # shell closed
+
+    def send(self, command):
+        self.start()
+        self.process.stdin.write(command + "\n")
+        self.process.stdin.flush()
+
+    def swipe(self, x1, y1, x2, y2, duration_ms=SWIPE_MS):
+        self.send(f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration_ms)}")
+
+    def sync(self, timeout=10.0):
+        """Blocks until every command sent so far has finished on the device."""
+        self.marker += 1
+        token = f"__done_{self.marker}__"
+        self.send(f"echo {token}")
+        deadline = time.time() + timeout
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                raise TimeoutError("adb shell did not answer") from None
+            if line is None:
+                raise RuntimeError("adb shell session closed")
+            if line.strip() == token:
+                return
+
+    def close(self):
+        if self.process:
+            try:
+                self.process.stdin.write("exit\n")
+                self.process.stdin.close()
+                self.process.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+def drag_points(shape, bbox, r, c, offset=FINGER_OFFSET, geometry=None):
+    """
+    Screen points (x1, y1, x2, y2) of the drag that puts `shape` (picked up
+    from `bbox` in the spawn area) with its origin on board cell (r, c).
+    geometry is (board_x, board_y, cell_size); default is the board from the
+    last parse_board in this process.
+    """
+    board_x, board_y, cell_size = geometry or (vision.BOARD_X, vision.BOARD_Y, vision.CELL_SIZE)
+    bx, by, bw, bh = bbox
+    x1, y1 = bx + bw / 2, by + bh / 2
+
+    rows = [dr for dr, _ in shape]
+    cols = [dc for _, dc in shape]
+    center_r = r + (min(rows) + max(rows) + 1) / 2
+    center_c = c + (min(cols) + max(cols) + 1) / 2
+    x2 = board_x + center_c * cell_size
+    y2 = board_y + center_r * cell_size
+    # The piece sits above the finger: move the finger down by the offset
+    x2 -= offset[0] * cell_size
+    y2 -= offset[1] * cell_size
+    return int(x1), int(y1), int(x2), int(y2)
+
+def wait_settled(source, detector, timeout=5.0, grace=1.0):
+    """
+    Reads frames until the scene changed and stopped moving (placement and
+    line-clear animations done). Returns the settled frame, or the last one
+    on timeout. A frame that never changes within `grace` seconds counts as
+    settled (the drag missed, or there was nothing to animate).
+    """
+    start = time.time()
+    img = None
+    while time.time() - start < timeout:
+        img = source.read(fresh=True)
+        if img is None:
+            return None
+        state = detector.update(img)
+        if state == change_detect.CHANGED:
+            return img
+        if state == change_detect.UNCHANGED and time.time() - start > grace:
+            return img
+    print("Board did not settle in time.")
+    return img
+
+class AutoPlayer:
+    """Plays a solver plan on the device, one drag per move."""
+    def __init__(self, source, input_session=None, offset=FINGER_OFFSET):
+        self.source = source
+        self.input = input_session or AdbInputSession()
+        self.offset = offset
+        # Own detector: the main loop's detector must still see the new board as CHANGED
+        self.detector = change_detect.FrameChangeDetector()
+
+    def play(self, plan, shapes, bboxes, first_frame=None):
+        """Executes the plan. Returns the settled frame after the last move."""
+        if first_frame is not None:
+            self.detector.mark_processed(first_frame)
+        img = first_frame
+        for step, (shape_idx, r, c) in enumerate(plan):
+            bbox = bboxes[shape_idx]
+            if not bbox:
+                print(f"Move {step + 1}: no bbox for shape {shape_idx}, stopping.")
+                break
+            x1, y1, x2, y2 = drag_points(shapes[shape_idx], bbox, r, c, self.offset)
+            print(f"Move {step + 1}: shape {shape_idx} -> ({r}, {c}), swipe {x1},{y1} -> {x2},{y2}")
+            self.input.swipe(x1, y1, x2, y2)
+            self.input.sync()
+            img = wait_settled(self.source, self.detector)
+        return img
+
+    def close(self):
+        self.input.close()
+
+def calibrate(adb_cmd=('adb',)):
+    """
+    Drags the first spawn piece to board cell (3, 3) with no offset and
+    reports where the board changed, to measure FINGER_OFFSET.
+    """
+    from frame_source import CaptureFrameSource
+    from vision_executor import VisionExecutor
+    source = CaptureFrameSource()
+    with VisionExecutor(cache_slots=False) as executor, AdbInputSession(adb_cmd) as session:
+        before = source.read()
+        board_before, shapes_data = executor.parse(before)
+        slot = next((i for i, (shape, bbox) in enumerate(shapes_data) if shape), None)
+        if slot is None:
+            print("No piece to drag.")
+            return
+        shape, bbox = shapes_data[slot]
+        x1, y1, x2, y2 = drag_points(shape, bbox, 3, 3, offset=(0.0, 0.0))
+        session.swipe(x1, y1, x2, y2)
+        session.sync()
+        time.sleep(1.0)
+        board_after, _ = executor.parse(source.read())
+        placed = [(int(r), int(c)) for r, c in zip(*((board_after == 1) & (board_before == 0)).nonzero())]
+        print(f"Aimed shape {shape} at (3, 3), cells filled: {placed}")
+        if placed:
+            dr = min(r for r, _ in placed) - 3
+            dc = min(c for _, c in placed) - 3
+            print(f"FINGER_OFFSET ~ ({dc:.1f}, {dr:.1f}) cells")
+
+if __name__ == "__main__":
+    # python autoplay.py calibrate
+    if len(sys.argv) > 1 and sys.argv[1] == 'calibrate':
+        calibrate()
@@ -0,0 +1,109 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import vision
+from frame_source import list_images, load_frame
+from solver import BlockBlastBalancedSolver
+
+# One JSON object per screenshot:
+# {"file": ..., "theme": "BLUE", "board": [[0,1,...], ...], "shapes": [[[0,0],[0,1]], [], ...],
+#  "bboxes": [[x,y,w,h] or null, ...], "plan": [[shape_idx, row, col], ...],
+#  "timings_ms": {"load": ..., "scale": ..., "parse_board": ..., "parse_shapes": ..., "solve": ...}}
+
+solver = None
+
+def init_worker():
+    global solver
+    # One OpenCV thread per process, the pool already uses every core
+    cv2.setNumThreads(1)
+    vision.SAVE_DEBUG_IMAGES = False
+    solver = BlockBlastBalancedSolver()
+
+def solve_file(path, cell_size=None):
+    """Parses and solves one screenshot. Returns the JSONL record."""
+    times = {}
+    t0 = time.perf_counter()
+    try:
+        img = load_frame(path)
+    except (ValueError, OSError) as e:
+        # Truncated/corrupt raw dump or unreadable file: record it, keep the batch going
+        return {'file': path, 'error': str(e)}
+    times['load'] = (time.perf_counter() - t0) * 1000
+    if img is None:
+        return {'file': path, 'error': 'unreadable'}
+
+    try:
+        # The parsers print a lot of debug output; keep the workers quiet
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            t0 = time.perf_counter()
+            work, scale = vision.to_working_scale(img, cell_size)
+            theme = vision.detect_theme(work, scale)
+            t1 = time.perf_counter()
+            board = vision.parse_board(work, scale, theme)
+            t2 = time.perf_counter()
+            shapes_data = vision.parse_shapes(work, scale, theme)
+            t3 = time.perf_counter()
+            shapes = [s[0] for s in shapes_data]
+            plan = solver.solve(board, shapes)
+            t4 = time.perf_counter()
+    except Exception as e:
+        return {'file': path, 'error': str(e)}
+
+    times['scale'] = (t1 - t0) * 1000
+    times['parse_board'] = (t2 - t1) * 1000
+    times['parse_shapes'] = (t3 - t2) * 1000
+    times['solve'] = (t4 - t3) * 1000
+    return {
+        'file': path,
+        'theme': theme,
+        'board': board.astype(int).tolist(),
+        'shapes': [[list(p) for p in shape] for shape in shapes],
+        'bboxes': [list(s[1]) if s[1] else None for s in shapes_data],
+        'plan': [list(move) for move in plan],
+        'timings_ms': {k: round(v, 2) for k, v in times.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse and solve screenshots offline, one JSON line per file")
+    parser.add_argument('paths', nargs='+', help="files, directories or glob patterns")
+    parser.add_argument('-o', '--output', help="JSONL file (default stdout)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--cell-size', type=int, default=None,
+                        help="working cell size in px (default vision.WORK_CELL_SIZE)")
+    args = parser.parse_args()
+
+    files = list_images(args.paths)
+    if not files:
+        print("No screenshots found.", file=sys.stderr)
+        return 1
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    solved = errors = 0
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+            # map keeps input order, results are written as soon as they are in
+            for record in pool.map(solve_file, files, [args.cell_size] * len(files), chunksize=8):
+                if 'error' in record:
+                    errors += 1
+                elif record['plan']:
+                    solved += 1
+                out.write(json.dumps(record) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - t0
+
+    print(f"{len(files)} files in {elapsed:.1f}s ({len(files) / elapsed:.1f}/s, {args.workers} workers): "
+          f"{solved} solved, {len(files) - solved - errors} without solution, {errors} errors",
+          file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
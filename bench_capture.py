@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+import subprocess
+import sys
+import time
+import vision
+
+def time_capture(raw, frames):
+    """Captures `frames` screenshots and returns the per-frame latency in ms."""
+    times = []
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        img = vision.capture_screen(raw=raw)
+        times.append((time.perf_counter() - t0) * 1000)
+        if img is None:
+            print("Capture failed.")
+            break
+    return times
+
+def compare_latency(frames=10):
+    png_times = time_capture(False, frames)
+    raw_times = time_capture(True, frames)
+
+    print(f"\n=== CAPTURE LATENCY ({frames} frames) ===")
+    for name, times in (("PNG", png_times), ("RAW", raw_times)):
+        if times:
+            print(f"{name}: median={np.median(times):.1f}ms, mean={np.mean(times):.1f}ms, max={np.max(times):.1f}ms")
+
+def record_fixture(prefix):
+    """Saves one raw dump and one PNG of the same screen as a parser fixture."""
+    raw = subprocess.run(['adb', 'exec-out', 'screencap'], stdout=subprocess.PIPE).stdout
+    png = subprocess.run(['adb', 'exec-out', 'screencap', '-p'], stdout=subprocess.PIPE).stdout
+    with open(prefix + ".raw", "wb") as f:
+        f.write(raw)
+    with open(prefix + ".png", "wb") as f:
+        f.write(png)
+    print(f"Saved: {prefix}.raw ({len(raw)} bytes), {prefix}.png ({len(png)} bytes)")
+
+def check_fixture(prefix):
+    """
+    Decodes a recorded raw dump and checks it against the PNG of the same screen.
+    Only the board/spawn band is compared, that's all the raw path converts.
+    """
+    with open(prefix + ".raw", "rb") as f:
+        data = f.read()
+    width, height, pixel_format, header_size = vision.parse_raw_header(data)
+    print(f"Header: {width}x{height}, format={pixel_format}, header={header_size} bytes")
+
+    t0 = time.perf_counter()
+    img_raw = vision.decode_raw(data)
+    raw_ms = (time.perf_counter() - t0) * 1000
+
+    with open(prefix + ".png", "rb") as f:
+        png = np.frombuffer(f.read(), np.uint8)
+    t0 = time.perf_counter()
+    img_png = cv2.imdecode(png, cv2.IMREAD_COLOR)
+    png_ms = (time.perf_counter() - t0) * 1000
+
+    if img_png is None or img_png.shape != img_raw.shape:
+        print(f"FAIL: shape mismatch raw={img_raw.shape}, png={None if img_png is None else img_png.shape}")
+        return False
+
+    y1, y2 = vision.capture_roi(height, width)
+    diff = int(np.max(cv2.absdiff(img_raw[y1:y2], img_png[y1:y2])))
+    board_ok = np.array_equal(vision.parse_board(img_raw), vision.parse_board(img_png))
+
+    print(f"Decode: raw={raw_ms:.1f}ms, png={png_ms:.1f}ms")
+    print(f"Max pixel diff in ROI: {diff}, board match: {board_ok}")
+    ok = diff == 0 and board_ok
+    print("PASS" if ok else "FAIL")
+    return ok
+
+if __name__ == "__main__":
+    # python bench_capture.py               -> live latency comparison
+    # python bench_capture.py record NAME   -> save NAME.raw + NAME.png
+    # python bench_capture.py check NAME... -> verify recorded fixtures
+    if len(sys.argv) >= 3 and sys.argv[1] == "record":
+        record_fixture(sys.argv[2])
+    elif len(sys.argv) >= 3 and sys.argv[1] == "check":
+        results = [check_fixture(prefix) for prefix in sys.argv[2:]]
+        sys.exit(0 if all(results) else 1)
+    else:
+        compare_latency()
@@ -0,0 +1,154 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import vision
+from frame_source import list_images, load_frame
+
+# Ground truth lives next to each screenshot: shot.png -> shot.json
+# {"theme": "BLUE", "board": [[0,1,...], ...8 rows], "shapes": [[[0,0],[0,1]], [], ...3 slots]}
+
+STAGES = ('scale', 'detect_theme', 'parse_board', 'parse_shapes')
+
+def find_labeled(paths):
+    """Returns [(image_path, label_path)] for every screenshot that has a label file."""
+    pairs = []
+    for f in list_images(paths):
+        label = os.path.splitext(f)[0] + '.json'
+        if os.path.exists(label):
+            pairs.append((f, label))
+    return pairs
+
+def normalize_shape(shape):
+    return sorted(tuple(p) for p in shape) if shape else []
+
+def init_worker():
+    # One OpenCV thread per process, the pool already uses every core
+    cv2.setNumThreads(1)
+    vision.SAVE_DEBUG_IMAGES = False
+
+def evaluate(pair, cell_size=None):
+    """Runs the vision stages on one screenshot and scores it against its label."""
+    image_path, label_path = pair
+    with open(label_path) as f:
+        label = json.load(f)
+    img = load_frame(image_path)
+    if img is None:
+        return {'file': image_path, 'error': 'unreadable'}
+
+    times = {}
+    # The parsers print a lot of debug output; keep the workers quiet
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        if cell_size == 0:
+            work, scale = img, 1.0
+        else:
+            work, scale = vision.to_working_scale(img, cell_size)
+        t1 = time.perf_counter()
+        theme = vision.detect_theme(work, scale)
+        t2 = time.perf_counter()
+        board = vision.parse_board(work, scale, theme)
+        t3 = time.perf_counter()
+        shapes_data = vision.parse_shapes(work, scale, theme)
+        t4 = time.perf_counter()
+    for stage, (a, b) in zip(STAGES, ((t0, t1), (t1, t2), (t2, t3), (t3, t4))):
+        times[stage] = (b - a) * 1000
+
+    truth_board = np.array(label['board'])
+    truth_shapes = [normalize_shape(s) for s in label['shapes']]
+    found_shapes = [normalize_shape(s[0]) for s in shapes_data]
+
+    return {
+        'file': image_path,
+        'theme': label.get('theme', theme),
+        'theme_ok': label.get('theme', theme) == theme,
+        'cells_ok': int(np.sum(board == truth_board)),
+        'board_ok': bool(np.array_equal(board, truth_board)),
+        'shapes_ok': sum(a == b for a, b in zip(found_shapes, truth_shapes)),
+        'shapes_total': len(truth_shapes),
+        'times': times,
+    }
+
+def summarize(results):
+    by_theme = defaultdict(list)
+    for res in results:
+        by_theme[res['theme']].append(res)
+
+    summary = {'themes': {}, 'latency_ms': {}}
+    for theme, items in sorted(by_theme.items()):
+        summary['themes'][theme] = {
+            'files': len(items),
+            'theme_acc': sum(r['theme_ok'] for r in items) / len(items),
+            'cell_acc': sum(r['cells_ok'] for r in items) / (64 * len(items)),
+            'board_acc': sum(r['board_ok'] for r in items) / len(items),
+            'shape_acc': sum(r['shapes_ok'] for r in items) / max(1, sum(r['shapes_total'] for r in items)),
+        }
+    for stage in STAGES:
+        samples = [r['times'][stage] for r in results]
+        if samples:
+            p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+            summary['latency_ms'][stage] = {'p50': p50, 'p90': p90, 'p99': p99, 'max': max(samples)}
+    return summary
+
+def print_summary(summary, failures):
+    print(f"\n{'THEME':<8}{'FILES':>7}{'THEME%':>9}{'CELL%':>9}{'BOARD%':>9}{'SHAPE%':>9}")
+    for theme, s in summary['themes'].items():
+        print(f"{theme:<8}{s['files']:>7}{s['theme_acc']*100:>9.1f}{s['cell_acc']*100:>9.2f}"
+              f"{s['board_acc']*100:>9.1f}{s['shape_acc']*100:>9.1f}")
+
+    print(f"\n{'STAGE':<14}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}  (ms)")
+    for stage, p in summary['latency_ms'].items():
+        print(f"{stage:<14}{p['p50']:>8.2f}{p['p90']:>8.2f}{p['p99']:>8.2f}{p['max']:>8.2f}")
+
+    if failures:
+        print(f"\nMismatches ({len(failures)}):")
+        for res in failures[:20]:
+            print(f"  {res['file']}: cells={res['cells_ok']}/64, shapes={res['shapes_ok']}/{res['shapes_total']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Vision accuracy/latency over a labeled screenshot corpus")
+    parser.add_argument('paths', nargs='+', help="directories, files or glob patterns")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--cell-size', type=int, default=None,
+                        help="working cell size in px (default vision.WORK_CELL_SIZE, 0 = native)")
+    parser.add_argument('--json', help="also write the summary to this file")
+    parser.add_argument('--min-cell-acc', type=float, default=0.0,
+                        help="exit non-zero if any theme's cell accuracy falls below this (0-1)")
+    args = parser.parse_args()
+
+    pairs = find_labeled(args.paths)
+    if not pairs:
+        print("No labeled screenshots found.")
+        return 1
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        results = list(pool.map(evaluate, pairs, [args.cell_size] * len(pairs), chunksize=8))
+    elapsed = time.perf_counter() - t0
+
+    errors = [r for r in results if 'error' in r]
+    results = [r for r in results if 'error' not in r]
+    for res in errors:
+        print(f"Skipped {res['file']}: {res['error']}")
+
+    summary = summarize(results)
+    failures = [r for r in results if not r['board_ok'] or r['shapes_ok'] < r['shapes_total']]
+    print_summary(summary, failures)
+    print(f"\n{len(results)} files in {elapsed:.1f}s with {args.workers} workers")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    worst = min((s['cell_acc'] for s in summary['themes'].values()), default=1.0)
+    return 1 if worst < args.min_cell_acc else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+import vision
+
+# Frame states returned by FrameChangeDetector.update
+UNCHANGED = 'UNCHANGED'   # same as the last processed frame -> skip parse/solve
+ANIMATING = 'ANIMATING'   # still moving (drag, clear animation) -> wait
+CHANGED = 'CHANGED'       # settled on a new scene -> run the pipeline
+
+class FrameChangeDetector:
+    """
+    Cheap change detection over the board + spawn area.
+    Each frame is reduced to a small grid of block means (a few hundred bytes);
+    frames are compared block-wise, so a single moved piece is still seen while
+    noise from compression/dimming averages out.
+    """
+    def __init__(self, blocks=(32, 48), threshold=8, settle_frames=2):
+        self.blocks = blocks              # (cols, rows) of the signature
+        self.threshold = threshold        # max block mean difference (gray levels)
+        self.settle_frames = settle_frames
+        self.prev_sig = None
+        self.processed_sig = None
+        self.still_count = 0
+
+    def signature(self, image):
+        h, w, _ = image.shape
+        y1, y2 = vision.capture_roi(h, w)
+        # Every 8th pixel is plenty: a board cell is ~120px wide on a phone
+        roi = np.ascontiguousarray(image[y1:y2:8, ::8])
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.blocks, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def differs(self, a, b):
+        return a is None or b is None or int(np.max(np.abs(a - b))) > self.threshold
+
+    def update(self, image):
+        """Returns UNCHANGED, ANIMATING or CHANGED for the new frame."""
+        sig = self.signature(image)
+        moving = self.differs(sig, self.prev_sig)
+        self.prev_sig = sig
+
+        if moving:
+            self.still_count = 0
+        else:
+            self.still_count += 1
+
+        if self.still_count < self.settle_frames and self.differs(sig, self.processed_sig):
+            return ANIMATING
+        if not self.differs(sig, self.processed_sig):
+            return UNCHANGED
+
+        self.processed_sig = sig
+        return CHANGED
+
+    def mark_processed(self, image):
+        """Takes this frame as the last processed one (e.g. the frame a plan was made from)."""
+        self.prev_sig = self.processed_sig = self.signature(image)
+        self.still_count = self.settle_frames
+
+    def reset(self):
+        """Forget the last processed frame (forces the next settled frame through)."""
+        self.processed_sig = None
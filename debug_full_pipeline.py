@@ -2,12 +2,13 @@ import cv2
 import numpy as np
 import vision
 import solver
+from frame_source import ReplayFrameSource
 
 def debug_pipeline(image_path):
     print(f"--- Debugging Pipeline for {image_path} ---")
     
     # 1. Load Image
-    img = cv2.imread(image_path)
+    img = ReplayFrameSource(image_path).read()
     if img is None:
         print("Error: Could not read image.")
         return
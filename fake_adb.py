@@ -0,0 +1,103 @@
+# Stand-in for the adb binary, for running the bot without a phone:
+#   python fake_adb.py --log cmds.txt --frames shots/ shell          (reads commands on stdin)
+#   python fake_adb.py --frames shots/ exec-out screencap [-p]
+# Every shell command is appended to the log. 'echo' is answered like a real
+# shell; everything else only gets recorded. Each 'input swipe' advances to the
+# next screenshot in --frames, so a replay looks like the game reacting.
+# Use it through adb_cmd, e.g. AdbInputSession([sys.executable, 'fake_adb.py', '--log', path]).
+
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+def frame_files(path):
+    if not path:
+        return []
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(('.png', '.jpg')))
+    return [path]
+
+def current_frame(args):
+    files = frame_files(args.frames)
+    if not files:
+        return np.zeros((2400, 1080, 3), np.uint8)
+    index = 0
+    if args.state and os.path.exists(args.state):
+        with open(args.state) as f:
+            index = int(f.read() or 0)
+    return cv2.imread(files[min(index, len(files) - 1)])
+
+def advance(args):
+    if not args.state:
+        return
+    index = 0
+    if os.path.exists(args.state):
+        with open(args.state) as f:
+            index = int(f.read() or 0)
+    with open(args.state, 'w') as f:
+        f.write(str(index + 1))
+
+def screencap(args, png):
+    img = current_frame(args)
+    if png:
+        return cv2.imencode('.png', img)[1].tobytes()
+    h, w, _ = img.shape
+    rgba = cv2.cvtColor(img, cv2.COLOR_BGR2RGBA)
+    # 16-byte header: width, height, format (1 = RGBA_8888), colorspace
+    return np.array([w, h, 1, 0], '<u4').tobytes() + rgba.tobytes()
+
+def shell(args, command=None):
+    log = open(args.log, 'a') if args.log else None
+    lines = [command] if command else sys.stdin
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if log:
+            log.write(line + "\n")
+            log.flush()
+        if line == 'exit':
+            break
+        if line.startswith('echo '):
+            print(line[5:], flush=True)
+        elif line.startswith('input swipe'):
+            parts = line.split()
+            # the gesture takes as long as asked
+            time.sleep(int(parts[6]) / 1000 if len(parts) > 6 else 0.3)
+            advance(args)
+    if log:
+        log.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake adb for tests and replays")
+    parser.add_argument('--log', help="append every shell command here")
+    parser.add_argument('--frames', help="screenshot file or directory served by screencap")
+    parser.add_argument('--state', help="file holding the current frame index (advanced by swipes)")
+    parser.add_argument('-s', dest='serial', help="accepted like adb's device selector (ignored)")
+    parser.add_argument('command', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if not args.command:
+        return 1
+    cmd, rest = args.command[0], args.command[1:]
+    if cmd == 'shell':
+        shell(args, " ".join(rest) if rest else None)
+    elif cmd == 'exec-out':
+        line = " ".join(rest)
+        if line.startswith('screencap'):
+            sys.stdout.buffer.write(screencap(args, '-p' in rest))
+        elif 'while true' in line:
+            try:
+                while True:
+                    sys.stdout.buffer.write(screencap(args, False))
+                    sys.stdout.buffer.flush()
+                    time.sleep(0.05)
+            except BrokenPipeError:
+                pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import glob
+import os
+import subprocess
+import threading
+import time
+import cv2
+import vision
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.raw')
+
+class FrameSource:
+    """
+    Something that hands out BGR screenshots.
+    read() returns the latest frame, or None if there is nothing to give.
+    """
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def read(self, fresh=False):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class CaptureFrameSource(FrameSource):
+    """
+    One capture per read (old behaviour): a new screencap process every time.
+    Used by the APK, where there is no ADB session to keep open.
+    With raw=True a failed raw capture (e.g. a pixel format decode_raw does
+    not know) switches to PNG captures for good.
+    """
+    def __init__(self, use_adb=True, raw=False):
+        self.use_adb = use_adb
+        self.raw = raw
+
+    def read(self, fresh=False):
+        img = vision.capture_screen(use_adb=self.use_adb, raw=self.raw)
+        if img is None and self.raw:
+            print("Raw capture failed, using PNG captures.")
+            self.raw = False
+            img = vision.capture_screen(use_adb=self.use_adb)
+        return img
+
+class AdbStreamFrameSource(FrameSource):
+    """
+    Keeps a single 'adb exec-out' shell running screencap in a loop and reads
+    the raw frames off its stdout on a background thread.
+    Frames land in a double buffer: the reader fills the back buffer while the
+    last complete frame stays readable, so read() never waits on the device.
+    Only frames that are actually read get decoded.
+    """
+    def __init__(self, adb_cmd=('adb',)):
+        self.adb_cmd = list(adb_cmd)
+        self.process = None
+        self.thread = None
+        self.running = False
+        self.cond = threading.Condition()
+        self.raw = None
+        self.frame = None
+        self.frame_id = 0
+        self.decoded_id = 0
+        self.last_read_id = 0
+        self.error = None
+
+    def probe(self):
+        """One-shot capture to learn the frame size and header layout."""
+        data = subprocess.run(self.adb_cmd + ['exec-out', 'screencap'],
+                              stdout=subprocess.PIPE).stdout
+        width, height, _, header_size = vision.parse_raw_header(data)
+        return header_size + width * height * 4
+
+    def start(self):
+        if self.running:
+            return self
+        frame_size = self.probe()
+        self.process = subprocess.Popen(
+            self.adb_cmd + ['exec-out', 'while true; do screencap; done'],
+            stdout=subprocess.PIPE, bufsize=0
+        )
+        self.running = True
+        self.thread = threading.Thread(target=self._reader, args=(frame_size,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.process:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        with self.cond:
+            self.cond.notify_all()
+
+    def _read_into(self, buf):
+        view = memoryview(buf)
+        got = 0
+        while got < len(buf):
+            n = self.process.stdout.readinto(view[got:])
+            if not n:
+                return False
+            got += n
+        return True
+
+    def _reader(self, frame_size):
+        buffers = [bytearray(frame_size), bytearray(frame_size)]
+        back = 0
+        try:
+            while self.running:
+                if not self._read_into(buffers[back]):
+                    break
+                with self.cond:
+                    # read() decodes self.raw under the lock, so the swap never lands mid-decode
+                    self.raw = buffers[back]
+                    self.frame_id += 1
+                    self.cond.notify_all()
+                back ^= 1
+        except Exception as e:
+            self.error = e
+            print(f"Error in frame stream: {e}")
+        finally:
+            self.running = False
+            with self.cond:
+                self.cond.notify_all()
+
+    def read(self, fresh=False, timeout=5.0):
+        """
+        Latest decoded frame. With fresh=True, waits for a frame that started
+        after this call (e.g. after a move, so the old board isn't returned);
+        None if none arrived within timeout or the stream died.
+        """
+        with self.cond:
+            wanted = self.frame_id + 2 if fresh else max(1, self.last_read_id)
+            if fresh or self.frame_id < wanted:
+                self.cond.wait_for(lambda: self.frame_id >= wanted or not self.running, timeout)
+            if self.frame_id < wanted:
+                return None
+            if self.decoded_id != self.frame_id:
+                self.frame = vision.decode_raw(self.raw)
+                self.decoded_id = self.frame_id
+            self.last_read_id = self.frame_id
+            return self.frame
+
+class ReplayFrameSource(FrameSource):
+    """
+    Replays screenshots from files, directories or glob patterns (png/jpg or
+    raw screencap dumps), in sorted order. read() returns the next frame, None when exhausted.
+    """
+    def __init__(self, paths, loop=False):
+        self.files = list_images(paths)
+        self.loop = loop
+        self.index = 0
+
+    def read(self, fresh=False):
+        if self.index >= len(self.files):
+            if not self.loop or not self.files:
+                return None
+            self.index = 0
+        path = self.files[self.index]
+        self.index += 1
+        return load_frame(path)
+
+def list_images(paths):
+    """Screenshot files from files, directories and glob patterns (directories sorted)."""
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, f) for f in os.listdir(path)
+                            if f.lower().endswith(IMAGE_EXTS))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            files += sorted(f for f in glob.glob(path) if f.lower().endswith(IMAGE_EXTS))
+    return files
+
+def load_frame(path):
+    """Reads a screenshot file, raw screencap dumps included."""
+    if path.lower().endswith('.raw'):
+        with open(path, 'rb') as f:
+            return vision.decode_raw(f.read())
+    return cv2.imread(path)
+
+def open_frame_source(spec=None, use_adb=True):
+    """
+    Picks a source from a simple spec:
+    None -> one-shot capture, 'stream' -> persistent ADB stream,
+    anything else -> replay of that file/directory.
+    """
+    if spec is None:
+        return CaptureFrameSource(use_adb=use_adb)
+    if spec == 'stream':
+        return AdbStreamFrameSource()
+    return ReplayFrameSource(spec)
+
+if __name__ == "__main__":
+    # Quick stream rate check against a connected device
+    with AdbStreamFrameSource() as source:
+        source.read(fresh=True)
+        t0 = time.perf_counter()
+        for _ in range(10):
+            source.read(fresh=True)
+        print(f"Stream: {(time.perf_counter() - t0) * 100:.1f}ms per fresh frame")
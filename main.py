@@ -1,8 +1,25 @@
+import startup
 import cv2
 import numpy as np
 import vision
-import solver
+import change_detect
+import screen_classifier
+import os
+import sys
 import time
+import tracing
+from frame_source import open_frame_source
+from pipeline import Pipeline
+from autoplay import AutoPlayer
+from vision_executor import VisionExecutor
+from session import GameSession
+from solver import make_solver
+# Lazy: only loaded when BOT_METRICS_PORT / BOT_RECORD / BOT_SOLVE_SERVER ask for them
+# (BOT_SOLVER's mcts and value_model load inside make_solver)
+metrics_server = startup.lazy_import('metrics_server')
+recorder_module = startup.lazy_import('recorder')
+solve_server = startup.lazy_import('solve_server')
+startup.mark('imports')
 
 # Global state for mouse callback
 needs_capture = False
@@ -63,10 +80,158 @@ def draw_ui(image, board, shapes, bboxes, solution):
                 cv2.rectangle(image, (bx+padding, by+padding), (bx+cell_size-padding, by+cell_size-padding), color, -1)
                 cv2.putText(image, str(i+1), (bx+20, by+40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
 
-def main():
+def print_no_solution(board, shapes):
+    print("No solution found.")
+    print("=== DEBUG: No Solution ===")
+    print(f"Board:\n{board}")
+    print(f"Shapes: {shapes}")
+    for i, shape in enumerate(shapes):
+        if shape:
+            # Check if shape can be placed anywhere
+            can_place = False
+            for r in range(8):
+                for c in range(8):
+                    valid = True
+                    for dr, dc in shape:
+                        nr, nc = r + dr, c + dc
+                        if not (0 <= nr < 8 and 0 <= nc < 8):
+                            valid = False
+                            break
+                        if board[nr, nc] == 1:
+                            valid = False
+                            break
+                    if valid:
+                        can_place = True
+                        break
+                if can_place:
+                    break
+            print(f"Shape {i} ({len(shape)} cells): can_place={can_place}")
+        else:
+            print(f"Shape {i}: EMPTY")
+    print("=== END DEBUG ===")
+
+@tracing.traced('draw')
+def render(result):
+    """Builds the window image for a finished analysis result."""
+    if 'error' in result:
+        ui_image = result['image'].copy() if 'image' in result else np.zeros((2400, 1080, 3), dtype=np.uint8)
+        cv2.putText(ui_image, "ERROR! Check Console", (100, 500), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 3)
+        draw_ui(ui_image, np.zeros((8,8)), [], [], None)
+        return ui_image
+
+    ui_image = result['image'].copy()
+    if result['solution']:
+        draw_ui(ui_image, result['board'], result['shapes'], result['bboxes'], result['solution'])
+    else:
+        cv2.putText(ui_image, "No Solution Found!", (300, 300), cv2.FONT_HERSHEY_SIMPLEX, 3, (0, 0, 255), 5)
+        # Ensure button is redrawn
+        draw_ui(ui_image, result['board'], result['shapes'], result['bboxes'], None)
+    return ui_image
+
+def main(source_spec=None):
+    """
+    source_spec: None (one capture per click), 'stream' (persistent ADB stream)
+    or a screenshot file/directory to replay.
+    Capture and analysis run on a Pipeline; this loop only draws finished results.
+    """
     global needs_capture
     print("Block Blast Bot Started")
     print("Click 'CAPTURE' button or press 'r' to refresh.")
+    print("Press 'c' to toggle continuous mode (solves whenever the board changes).")
+    print("Press 'a' to toggle auto-play (performs the moves over ADB).")
+    print("Press 's' to print pipeline stage stats.")
+    print("Press 't' to toggle tracing (saves trace_snapshot.json / trace_chrome.json when turned off).")
+    
+    source = open_frame_source(source_spec).start()
+    vision_pool = VisionExecutor()
+    if os.environ.get('BOT_SOLVE_SERVER'):
+        # host:port[?workers=N or ?timeout=S] of a solve_server.py shared by several bots;
+        # solves locally (beam search) when it is unreachable
+        if os.environ.get('BOT_SOLVER'):
+            print(f"BOT_SOLVER={os.environ['BOT_SOLVER']} ignored: BOT_SOLVE_SERVER is set (beam search on the server).")
+        solver = solve_server.RemoteSolver(os.environ['BOT_SOLVE_SERVER'])
+    else:
+        # BOT_SOLVER picks the engine: 'beam' (default), 'rollout', 'mcts' or 'learned'
+        solver = make_solver(os.environ.get('BOT_SOLVER', 'beam'))
+    session = GameSession(solver)
+    classifier = screen_classifier.ScreenClassifier()
+    detector = change_detect.FrameChangeDetector()
+    metrics = None
+    if os.environ.get('BOT_METRICS_PORT'):
+        # Stage latencies, solve rate, cache hits on localhost for long runs
+        metrics = metrics_server.MetricsServer(int(os.environ['BOT_METRICS_PORT']), executor=vision_pool, session=session).start()
+    recorder = None
+    if os.environ.get('BOT_RECORD'):
+        # Every solved turn goes to BOT_RECORD/session_*.bbr (python recorder.py replay ...);
+        # BOT_RECORD_COMPACT=1 stores the frames as PNG
+        recorder = recorder_module.SessionRecorder(os.environ['BOT_RECORD'], solver=solver,
+                                                   compact=bool(os.environ.get('BOT_RECORD_COMPACT')))
+    last_state = [None]
+    player = None
+    autoplay_on = False
+    
+    def analyze(img, manual):
+        """Runs on the pipeline's analysis thread. None = nothing to show for this frame."""
+        warm_thread.join()
+        if not manual:
+            # Skip the whole pipeline while nothing moved or the scene is animating
+            state = detector.update(img)
+            pipeline.set_idle(state == change_detect.UNCHANGED)
+            if state == change_detect.ANIMATING and last_state[0] != state:
+                print("Waiting for animation to settle...")
+            last_state[0] = state
+            if state != change_detect.CHANGED:
+                return None
+        
+        # Game over, ads, menus and clear animations never reach the solver
+        screen, _ = classifier.classify(img)
+        if screen != screen_classifier.GAMEPLAY:
+            print(f"Not a game position ({screen}), skipping.")
+            if screen == screen_classifier.DIALOG:
+                session.reset()
+            return None
+        
+        print("Analyzing...")
+        t0 = time.perf_counter()
+        board, shapes_data = session.observe(img, vision_pool)
+        t1 = time.perf_counter()
+        
+        # Unpack shapes and bboxes
+        shapes = [s[0] for s in shapes_data]
+        bboxes = [s[1] for s in shapes_data]
+        
+        # DEBUG: Print detected shapes
+        print(f"Board:\n{board}")
+        for i, shape in enumerate(shapes):
+            print(f"Slot {i+1}: {shape}")
+        
+        print("Solving...")
+        combo = session.combo
+        best_sequence = session.solve(board, shapes)
+        t2 = time.perf_counter()
+        if recorder:
+            recorder.record(vision_pool.last_frame, board, shapes_data, best_sequence, combo,
+                            {'parse': (t1 - t0) * 1000, 'solve': (t2 - t1) * 1000})
+        
+        if best_sequence:
+            print("Solution found!")
+            session.expect(best_sequence, shapes)
+            for move in best_sequence:
+                print(f"  -> Place shape {move[0]} at row={move[1]}, col={move[2]}")
+            if autoplay_on:
+                player.play(best_sequence, shapes, bboxes, first_frame=img)
+        else:
+            tracing.count('no_solution')
+            print_no_solution(board, shapes)
+        if 'first_solve' not in startup.TIMINGS:
+            startup.mark('first_solve')
+            print(startup.report())
+        return {'image': img, 'board': board, 'shapes': shapes, 'bboxes': bboxes, 'solution': best_sequence}
+    
+    # Color/solver tables and one dummy parse + solve while the window comes up
+    warm_thread = startup.in_background(lambda: startup.warm_up(vision_pool, session.solver))
+    pipeline = Pipeline(source, analyze)
+    pipeline.start()
     
     # Initial blank image
     ui_image = np.zeros((2400, 1080, 3), dtype=np.uint8)
@@ -77,89 +242,59 @@ def main():
     
     # Resize window to fit screen
     cv2.resizeWindow("Block Blast Bot", 540, 1200)
+    startup.mark('window_ready')
     
     while True:
         cv2.imshow("Block Blast Bot", ui_image)
-        key = cv2.waitKey(100) & 0xFF
+        key = cv2.waitKey(30) & 0xFF
         
         if key == ord('q'):
             break
+        elif key == ord('c'):
+            pipeline.set_continuous(not pipeline.continuous)
+            # The analysis thread owns the detector
+            pipeline.run_on_analysis(detector.reset)
+            print(f"Continuous mode: {'ON' if pipeline.continuous else 'OFF'}")
+        elif key == ord('a'):
+            if player is None:
+                player = AutoPlayer(source)
+            autoplay_on = not autoplay_on
+            print(f"Auto-play: {'ON' if autoplay_on else 'OFF'}")
+        elif key == ord('s'):
+            print(pipeline.report())
+            if tracing.ENABLED:
+                print(tracing.report())
+        elif key == ord('t'):
+            tracing.enable(not tracing.ENABLED)
+            tracing.EXPORT = tracing.ENABLED
+            print(f"Tracing: {'ON' if tracing.ENABLED else 'OFF'}")
+            if not tracing.ENABLED:
+                print(f"Saved {', '.join(tracing.save())}")
         elif key == ord('r') or needs_capture:
             needs_capture = False # Reset flag
             print("Capturing...")
-            
-            try:
-                img = vision.capture_screen()
-                if img is None:
-                    print("Capture failed.")
-                    continue
-                
-                # Update UI image with new capture
-                ui_image = img.copy()
-                
-                print("Analyzing...")
-                board = vision.parse_board(img)
-                shapes_data = vision.parse_shapes(img)
-                
-                # Unpack shapes and bboxes
-                shapes = [s[0] for s in shapes_data]
-                bboxes = [s[1] for s in shapes_data]
-                
-                # DEBUG: Print detected shapes
-                print(f"Board:\n{board}")
-                for i, shape in enumerate(shapes):
-                    print(f"Slot {i+1}: {shape}")
-                
-                print("Solving...")
-                best_sequence = solver.solve(board, shapes)
-                
-                if best_sequence:
-                    print("Solution found!")
-                    for move in best_sequence:
-                        print(f"  -> Place shape {move[0]} at row={move[1]}, col={move[2]}")
-                    draw_ui(ui_image, board, shapes, bboxes, best_sequence)
-                else:
-                    print("No solution found.")
-                    print("=== DEBUG: No Solution ===")
-                    print(f"Board:\n{board}")
-                    print(f"Shapes: {shapes}")
-                    for i, shape in enumerate(shapes):
-                        if shape:
-                            # Check if shape can be placed anywhere
-                            can_place = False
-                            for r in range(8):
-                                for c in range(8):
-                                    valid = True
-                                    for dr, dc in shape:
-                                        nr, nc = r + dr, c + dc
-                                        if not (0 <= nr < 8 and 0 <= nc < 8):
-                                            valid = False
-                                            break
-                                        if board[nr, nc] == 1:
-                                            valid = False
-                                            break
-                                    if valid:
-                                        can_place = True
-                                        break
-                                if can_place:
-                                    break
-                            print(f"Shape {i} ({len(shape)} cells): can_place={can_place}")
-                        else:
-                            print(f"Shape {i}: EMPTY")
-                    print("=== END DEBUG ===")
-                    cv2.putText(ui_image, "No Solution Found!", (300, 300), cv2.FONT_HERSHEY_SIMPLEX, 3, (0, 0, 255), 5)
-                    # Ensure button is redrawn
-                    draw_ui(ui_image, board, shapes, bboxes, None) 
-                    
-            except Exception as e:
-                print(f"ERROR: An exception occurred: {e}")
-                import traceback
-                traceback.print_exc()
-                cv2.putText(ui_image, "ERROR! Check Console", (100, 500), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 3)
-                draw_ui(ui_image, np.zeros((8,8)), [], [], None) 
-                
-            # Refresh window
+            pipeline.request()
+        
+        result = pipeline.poll()
+        if result is not None:
+            t0 = time.perf_counter()
+            ui_image = render(result)
             cv2.imshow("Block Blast Bot", ui_image)
+            pipeline.rendered(result, t0)
+    
+    pipeline.stop()
+    print(pipeline.report())
+    if tracing.EXPORT:
+        print(tracing.report())
+        print(f"Saved {', '.join(tracing.save())}")
+    if player:
+        player.close()
+    if metrics:
+        metrics.stop()
+    if recorder:
+        recorder.close()
+    source.stop()
+    vision_pool.shutdown()
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,295 @@
+import math
+import random
+import time
+
+from rollout import EDGES, around
+from solver import (ALL_POSSIBLE_SHAPES, BlockBlastBalancedSolver, board_bits, clear_bits, count_holes,
+                    missed_penalty, placements)
+
+# Monte Carlo Tree Search backend (BOT_SOLVER=mcts, see solver.make_solver).
+# The tree alternates decision nodes (place one of the remaining pieces) with
+# chance nodes (the turn is over, the game deals three new pieces drawn from
+# ALL_POSSIBLE_SHAPES). Everything below the root works on 64-bit board
+# integers with solver.py's bitboard core (placements, clear_bits, the survival tables).
+
+COMBO_WINDOW = 3      # same rule as session.COMBO_WINDOW
+POINTS_PER_LINE = 10  # a clear scores lines * POINTS_PER_LINE * (streak + 1), plus one point per cell
+
+def play(bits, mask, cells, streak, since_clear):
+    """One placement. Returns (bits, streak, since_clear, points)."""
+    bits, lines = clear_bits(bits | mask)
+    if lines:
+        points = cells + lines * POINTS_PER_LINE * (streak + 1)
+        return bits, streak + 1, 0, points
+    since_clear += 1
+    if since_clear >= COMBO_WINDOW:
+        streak = 0
+    return bits, streak, since_clear, cells
+
+def contact(bits, mask):
+    """How snugly a placement fits: filled neighbours plus cells against the wall."""
+    return bin(around(mask) & bits).count('1') + bin(mask & EDGES).count('1')
+
+def placement_score(bits, mask, holes_before):
+    """Quick move ordering: lines cleared first, then a snug fit that closes in no new holes."""
+    after, lines = clear_bits(bits | mask)
+    return lines * 64 + contact(bits, mask) - 8 * (count_holes(after) - holes_before)
+
+def room(bits, table):
+    """Share of the survival penalty still avoidable: 1 = every known piece fits somewhere."""
+    return 1 - missed_penalty(bits, table) / sum(penalty for penalty, _ in table)
+
+def deal(rng):
+    """Three random pieces, as the game would hand them out."""
+    return tuple(tuple(rng.choice(ALL_POSSIBLE_SHAPES)) for _ in range(3))
+
+class Node:
+    __slots__ = ('bits', 'shapes', 'remaining', 'streak', 'since_clear', 'gain', 'action',
+                 'children', 'untried', 'visits', 'value')
+
+    def __init__(self, bits, shapes, remaining, streak, since_clear, gain=0, action=None):
+        self.bits = bits
+        self.shapes = shapes            # the turn's three pieces (tuples of cells)
+        self.remaining = remaining      # slots still to place; empty = chance node
+        self.streak = streak
+        self.since_clear = since_clear
+        self.gain = gain                # points scored by the move into this node
+        self.action = action            # (slot, r, c)
+        self.children = {}              # decision: action -> Node, chance: dealt pieces -> Node
+        self.untried = None
+        self.visits = 0
+        self.value = 0.0
+
+    def legal_actions(self):
+        return [(slot, mask, r, c) for slot in self.remaining
+                for mask, r, c in placements(self.shapes[slot]) if not self.bits & mask]
+
+class MCTSSolver(BlockBlastBalancedSolver):
+    """
+    UCT search with the same solve(board, shapes, combo) -> [(shape_idx, r, c)]
+    contract as the beam search, so GameSession can use either.
+    Budget: `iterations`, `time_limit` seconds, or both (whichever ends first).
+    Each solve reseeds from `seed` and the position, so with time_limit=None
+    (iterations only) the same position always gets the same plan; a time
+    limit makes the plan depend on the machine's speed. seed=None: unseeded.
+    A rollout plays up to `horizon` turns (the current one included) with a
+    cheap policy; the reward mixes survival and points. Decision nodes only
+    expand their top_k best-looking moves per piece left (see candidates).
+    The subtree of the dealt pieces is kept for the next turn when the next
+    board is the predicted one.
+    """
+    def __init__(self, iterations=2000, time_limit=0.5, horizon=3, exploration=0.7,
+                 chance_width=8, top_k=8, seed=0, grid_size=8):
+        super().__init__(grid_size)
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.horizon = horizon
+        self.exploration = exploration
+        self.chance_width = chance_width    # dealt triples kept per chance node
+        self.top_k = top_k                  # moves kept per piece left at a decision node (0 = all)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.last_plan = []                 # nodes after each move of the last plan
+        self.reused = 0
+
+    def settings(self):
+        return {'backend': 'mcts', 'iterations': self.iterations, 'time_limit': self.time_limit,
+                'horizon': self.horizon, 'exploration': self.exploration,
+                'chance_width': self.chance_width, 'top_k': self.top_k, 'seed': self.seed}
+
+    def solve_many(self, positions):
+        """One search per position (the tree is per position; nothing to share)."""
+        plans, self.nodes_each = [], []
+        for board, shapes, combo in positions:
+            plans.append(self.solve(board, shapes, combo))
+            self.nodes_each.append(self.nodes)
+        self.nodes = sum(self.nodes_each)
+        return plans
+
+    def solve(self, board, shapes, current_game_combo=0):
+        slots = tuple(i for i, s in enumerate(shapes) if s)
+        if not slots:
+            return []
+        dealt = tuple(tuple(map(tuple, s)) for s in shapes)
+        if self.seed is not None:
+            self.rng.seed(f"{self.seed}:{board_bits(board)}:{dealt}:{current_game_combo}")
+        root = self.reuse_root(board, dealt, current_game_combo)
+        if root is None:
+            root = Node(board_bits(board), dealt, slots, current_game_combo, 0)
+
+        deadline = time.perf_counter() + self.time_limit if self.time_limit else None
+        done = 0
+        while (self.iterations is None or done < self.iterations) and \
+                (deadline is None or time.perf_counter() < deadline):
+            self.iterate(root)
+            done += 1
+        self.nodes = done
+
+        plan, nodes = self.best_plan(root)
+        if not nodes or nodes[-1].remaining:
+            # Like the beam search: no plan unless every piece fits
+            self.last_plan = []
+            return []
+        self.last_plan = nodes
+        return plan
+
+    def reuse_root(self, board, dealt, combo):
+        """
+        The node the tree already has for this position, if the last plan predicted it:
+        a position in the middle of the plan (re-solved after a move), or the
+        pieces dealt after it.
+        """
+        bits = board_bits(board)
+        for node in reversed(self.last_plan):
+            if node.remaining:
+                expected = tuple(s if i in node.remaining else () for i, s in enumerate(node.shapes))
+                child = node if expected == dealt else None
+            else:
+                child = node.children.get(dealt)
+            if child is not None and child.bits == bits and child.streak == combo:
+                self.reused += 1
+                return child
+        return None
+
+    def iterate(self, root):
+        node = root
+        path = [root]
+        points = 0
+        turns = 0
+        dead = False
+        expanded = False
+        while not expanded:
+            if node.remaining:
+                if node.untried is None:
+                    node.untried = self.candidates(node)
+                if node.untried:
+                    slot, mask, r, c = node.untried.pop()
+                    bits, streak, since_clear, gain = play(node.bits, mask, len(node.shapes[slot]),
+                                                          node.streak, node.since_clear)
+                    child = Node(bits, node.shapes, tuple(s for s in node.remaining if s != slot),
+                                 streak, since_clear, gain, (slot, r, c))
+                    node.children[(slot, r, c)] = child
+                    expanded = True
+                elif node.children:
+                    child = self.select(node)
+                else:
+                    dead = True
+                    break
+                node = child
+                points += node.gain
+            else:
+                turns += 1
+                if turns >= self.horizon:
+                    break
+                if len(node.children) < self.chance_width:
+                    dealt = deal(self.rng)
+                    child = node.children.get(dealt)
+                    if child is None:
+                        child = Node(node.bits, dealt, (0, 1, 2), node.streak, node.since_clear)
+                        node.children[dealt] = child
+                        expanded = True
+                else:
+                    child = self.rng.choice(list(node.children.values()))
+                node = child
+            path.append(node)
+
+        bits = node.bits
+        if not dead and turns < self.horizon:
+            extra, completed, dead, bits = self.rollout(node, self.horizon - turns)
+            points += extra
+            turns += completed
+        if dead:
+            reward = 0.5 * turns / self.horizon
+        else:
+            # Alive at the horizon: the more pieces still fit, the better
+            reward = 0.5 + 0.3 * room(bits, self.survival_table) + 0.2 * points / (points + 60)
+        for n in path:
+            n.visits += 1
+            n.value += reward
+
+    def candidates(self, node):
+        """
+        The moves a decision node will expand, best (by placement_score) last so
+        they are tried first. A turn has tens of thousands of move orders; the
+        budget only goes far enough if the obviously bad ones are never opened.
+        """
+        holes_before = count_holes(node.bits)
+        scored = sorted((placement_score(node.bits, action[1], holes_before), self.rng.random(), action)
+                        for action in node.legal_actions())
+        if self.top_k:
+            scored = scored[-self.top_k * len(node.remaining):]
+        return [action for _, _, action in scored]
+
+    def select(self, node):
+        log_n = math.log(node.visits)
+        c = self.exploration
+        return max(node.children.values(),
+                   key=lambda ch: ch.value / ch.visits + c * math.sqrt(log_n / ch.visits))
+
+    def rollout(self, node, turns_left):
+        """
+        Plays the rest of this turn and then full turns of random pieces.
+        Policy (greedy, like rollout.RolloutEngine): the legal placement that
+        scores most, then the one that fits most snugly, random tie-break.
+        Returns (points, turns completed, died, final bits).
+        """
+        rng = self.rng
+        bits, streak, since_clear = node.bits, node.streak, node.since_clear
+        shapes, remaining = node.shapes, list(node.remaining)
+        points = 0
+        for turn in range(turns_left):
+            if turn > 0:
+                shapes, remaining = deal(rng), [0, 1, 2]
+            rng.shuffle(remaining)
+            for slot in remaining:
+                best = best_key = None
+                for mask, _, _ in placements(shapes[slot]):
+                    if bits & mask:
+                        continue
+                    result = play(bits, mask, len(shapes[slot]), streak, since_clear)
+                    key = (result[3], contact(bits, mask), rng.random())
+                    if best is None or key > best_key:
+                        best, best_key = result, key
+                if best is None:
+                    return points, turn, True, bits
+                bits, streak, since_clear, gain = best
+                points += gain
+        return points, turns_left, False, bits
+
+    def best_plan(self, root):
+        """
+        Most visited moves of this turn. A most visited child whose line runs
+        into a dead end before every piece is placed gives way to the next
+        most visited one that completes the turn.
+        Returns (plan, [node after each move]); the nodes stop short when no
+        line completes the turn.
+        """
+        nodes = self.complete_line(root)
+        return [node.action for node in nodes], nodes
+
+    def complete_line(self, node):
+        """Nodes from `node` to the end of its turn, or the most visited partial line."""
+        if not node.remaining:
+            return []
+        if not node.children:
+            # Never expanded below here (tiny budget): finish the turn greedily
+            line = []
+            while node.remaining:
+                actions = node.legal_actions()
+                if not actions:
+                    break
+                holes_before = count_holes(node.bits)
+                slot, mask, r, c = max(actions, key=lambda a: placement_score(node.bits, a[1], holes_before))
+                bits, streak, since_clear, gain = play(node.bits, mask, len(node.shapes[slot]),
+                                                      node.streak, node.since_clear)
+                node = Node(bits, node.shapes, tuple(s for s in node.remaining if s != slot),
+                            streak, since_clear, gain, (slot, r, c))
+                line.append(node)
+            return line
+        partial = None
+        for child in sorted(node.children.values(), key=lambda ch: ch.visits, reverse=True):
+            line = [child] + self.complete_line(child)
+            if not line[-1].remaining:
+                return line
+            partial = partial or line
+        return partial
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import tracing
+import vision
+
+# GET /metrics       Prometheus text format
+# GET /metrics.json  the same numbers as JSON
+# Started by main.py / service.py when BOT_METRICS_PORT is set.
+# Everything is computed when scraped, from numbers the bot keeps anyway
+# (tracing aggregates, cache/session counters); the capture/solve loop never waits on it.
+
+PREFIX = 'blockblast'
+
+def vision_confidence():
+    """How decisive the last board parse was: 1 = every cell clearly empty/filled."""
+    fill = vision.CELL_FILL
+    margin = np.abs(fill - 0.5) * 2
+    return {'mean': float(margin.mean()), 'min': float(margin.min()),
+            'uncertain_cells': int(np.sum(margin < 0.5))}
+
+class MetricsServer:
+    """
+    Localhost HTTP endpoint on a daemon thread.
+    Sources are the live objects to read from: executor (slot cache hits),
+    session (verified boards vs full parses). Starting it turns tracing on,
+    since the stage latencies come from there (trace files are still only
+    written with BOT_TRACE=1, see tracing.EXPORT).
+    """
+    def __init__(self, port=9108, host='127.0.0.1', executor=None, session=None):
+        self.host = host
+        self.port = port
+        self.executor = executor
+        self.session = session
+        self.started = time.time()
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        tracing.enable(True)
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, ctype = metrics.prometheus().encode(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, ctype = json.dumps(metrics.collect(), indent=2).encode(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', ctype)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass   # no console spam per scrape
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+        self.thread.start()
+        print(f"Metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def collect(self):
+        snap = tracing.snapshot()
+        counters = snap['counters']
+        solve = snap['stages'].get('solve', {})
+        solve_seconds = solve.get('total_ms', 0.0) / 1000
+
+        data = {
+            'uptime_s': time.time() - self.started,
+            'stages_ms': {name: {k: s[k] for k in ('count', 'total_ms', 'p50', 'p90', 'p99', 'max')}
+                          for name, s in snap['stages'].items()},
+            'solves_total': solve.get('count', 0),
+            'solves_per_minute': tracing.recent('solve', 60.0),
+            'solver_nodes_total': counters.get('solver_nodes', 0),
+            'solver_nodes_per_second': counters.get('solver_nodes', 0) / solve_seconds if solve_seconds else 0.0,
+            'no_solution_total': counters.get('no_solution', 0),
+            'vision_confidence': vision_confidence(),
+            'cache': {},
+        }
+        if self.executor is not None and self.executor.slot_cache is not None:
+            cache = self.executor.slot_cache
+            lookups = cache.hits + cache.misses
+            data['cache']['slot_hit_rate'] = cache.hits / lookups if lookups else 0.0
+        if self.session is not None:
+            stats = self.session.stats
+            observed = stats['verified'] + stats['full_parses']
+            data['cache']['board_verify_rate'] = stats['verified'] / observed if observed else 0.0
+            data['board_mismatches_total'] = stats['mismatches']
+        return data
+
+    def prometheus(self):
+        data = self.collect()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            """samples: [(labels, value)] or [(labels, value, name suffix)]"""
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for labels, value, *suffix in samples:
+                label_text = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+                lines.append(f"{PREFIX}_{name}{''.join(suffix)}{label_text} {value}")
+
+        samples = []
+        for stage, s in data['stages_ms'].items():
+            for q, key in (('0.5', 'p50'), ('0.9', 'p90'), ('0.99', 'p99')):
+                samples.append(({'stage': stage, 'quantile': q}, s[key]))
+            samples.append(({'stage': stage}, s['total_ms'], '_sum'))
+            samples.append(({'stage': stage}, s['count'], '_count'))
+        metric('stage_latency_ms', 'summary', "Rolling stage latency in milliseconds", samples)
+        metric('uptime_seconds', 'gauge', "Seconds since the metrics server started", [({}, data['uptime_s'])])
+        metric('solves_total', 'counter', "Solver runs", [({}, data['solves_total'])])
+        metric('solves_per_minute', 'gauge', "Solver runs in the last 60 seconds", [({}, data['solves_per_minute'])])
+        metric('solver_nodes_total', 'counter', "Boards evaluated by the solver", [({}, data['solver_nodes_total'])])
+        metric('solver_nodes_per_second', 'gauge', "Boards evaluated per second of solve time",
+               [({}, data['solver_nodes_per_second'])])
+        metric('no_solution_total', 'counter', "Positions where the solver found no plan", [({}, data['no_solution_total'])])
+        conf = data['vision_confidence']
+        metric('vision_confidence', 'gauge', "Cell decisiveness of the last board parse (0-1)",
+               [({'stat': 'mean'}, conf['mean']), ({'stat': 'min'}, conf['min'])])
+        metric('vision_uncertain_cells', 'gauge', "Board cells close to the fill threshold",
+               [({}, conf['uncertain_cells'])])
+        if data['cache']:
+            metric('cache_hit_rate', 'gauge', "Hit rate of the vision caches",
+                   [({'cache': name}, rate) for name, rate in data['cache'].items()])
+        if 'board_mismatches_total' in data:
+            metric('board_mismatches_total', 'counter', "Frames that did not match the predicted board",
+                   [({}, data['board_mismatches_total'])])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import autoplay
+import screen_classifier
+import vision
+from frame_source import list_images
+from session import GameSession
+from solver import BlockBlastBalancedSolver
+
+# One asyncio task per phone: capture -> parse -> solve -> drag, all devices at once.
+# Parsing and solving run on a shared process pool (vision keeps the board
+# geometry in module globals, so two devices must never parse in the same process
+# at the same time). Capture and input are adb subprocesses awaited by the event loop.
+#   python multi_device.py                      every device in 'adb devices'
+#   python multi_device.py -s SERIAL -s SERIAL  just these
+#   python multi_device.py --fake shots/ --fake shots2/   replayed screenshots, no phone
+
+PROFILES_PATH = 'device_profiles.json'
+
+# Per-device calibration; device_profiles.json maps serial -> any of these keys
+DEFAULT_PROFILE = {
+    'finger_offset': list(autoplay.FINGER_OFFSET),
+    'swipe_ms': autoplay.SWIPE_MS,
+    'settle_s': 1.0,      # wait after the last drag of a plan (placement + clear animations)
+    'retry_s': 0.5,       # wait when the screen is not a game position
+}
+
+def adb_devices(adb_cmd=('adb',)):
+    """Serials of the connected devices that are ready ('device' state)."""
+    out = subprocess.run(list(adb_cmd) + ['devices'], stdout=subprocess.PIPE, text=True).stdout
+    serials = []
+    for line in out.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[1] == 'device':
+            serials.append(parts[0])
+    return serials
+
+def load_profiles(path=PROFILES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def profile_for(profiles, name):
+    return {**DEFAULT_PROFILE, **profiles.get(name, {})}
+
+# --- Device backends ---
+
+class AdbDevice:
+    """One phone over `adb -s serial`: screencap per capture, one long-lived shell for input."""
+    def __init__(self, serial, adb_cmd=('adb',)):
+        self.name = serial
+        self.adb_cmd = list(adb_cmd) + ['-s', serial]
+        self.shell = None
+        self.marker = 0
+
+    async def capture(self):
+        """
+        Raw screencap bytes. A failed screencap raises OSError: the phone is
+        still there, so the controller counts an error and tries again.
+        """
+        process = await asyncio.create_subprocess_exec(
+            *self.adb_cmd, 'exec-out', 'screencap', stdout=asyncio.subprocess.PIPE)
+        data, _ = await process.communicate()
+        if process.returncode != 0 or not data:
+            raise OSError(f"screencap failed (exit code {process.returncode}, {len(data)} bytes)")
+        return data
+
+    async def send(self, command):
+        if self.shell is None:
+            self.shell = await asyncio.create_subprocess_exec(
+                *self.adb_cmd, 'shell', stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        self.shell.stdin.write((command + "\n").encode())
+        await self.shell.stdin.drain()
+
+    async def swipe(self, x1, y1, x2, y2, duration_ms):
+        await self.send(f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration_ms)}")
+
+    async def sync(self, timeout=10.0):
+        """Waits until the shell ran everything sent so far (see AdbInputSession.sync)."""
+        if self.shell is None:
+            return
+        self.marker += 1
+        token = f"__done_{self.marker}__"
+        await self.send(f"echo {token}")
+
+        async def wait_token():
+            while True:
+                line = await self.shell.stdout.readline()
+                if not line:
+                    raise RuntimeError("adb shell session closed")
+                if line.decode().strip() == token:
+                    return
+        await asyncio.wait_for(wait_token(), timeout)
+
+    async def close(self):
+        if self.shell is not None:
+            with contextlib.suppress(OSError):
+                self.shell.stdin.write(b"exit\n")
+                self.shell.stdin.close()
+            try:
+                await asyncio.wait_for(self.shell.wait(), 2)
+            except asyncio.TimeoutError:
+                self.shell.kill()
+            self.shell = None
+
+class FakeDevice:
+    """
+    Replays screenshot files (png/jpg or raw dumps) as a phone: every capture
+    returns the next file, swipes are only recorded. capture() returns None
+    when the files run out.
+    """
+    def __init__(self, name, paths, capture_ms=0.0):
+        self.name = name
+        self.files = list_images(paths)
+        self.index = 0
+        self.capture_ms = capture_ms   # pretend screencap latency
+        self.swipes = []
+
+    async def capture(self):
+        if self.capture_ms:
+            await asyncio.sleep(self.capture_ms / 1000)
+        if self.index >= len(self.files):
+            return None
+        self.index += 1
+        with open(self.files[self.index - 1], 'rb') as f:
+            return f.read()
+
+    async def swipe(self, x1, y1, x2, y2, duration_ms):
+        self.swipes.append((int(x1), int(y1), int(x2), int(y2)))
+
+    async def sync(self, timeout=10.0):
+        pass
+
+    async def close(self):
+        pass
+
+# --- Pool side: one set of vision/solver objects per process ---
+
+solver = None
+classifier = None
+
+def init_worker():
+    global solver, classifier
+    cv2.setNumThreads(1)
+    vision.SAVE_DEBUG_IMAGES = False
+    solver = BlockBlastBalancedSolver()
+    classifier = screen_classifier.ScreenClassifier()
+
+def parse_capture(data):
+    """
+    Decodes a capture (raw screencap or an image file's bytes), classifies it
+    and, for game positions, parses it.
+    Returns a dict: screen, and board/shapes/bboxes/geometry/parse_ms for gameplay.
+    """
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if data[:4] == b'\x89PNG' or data[:2] == b'\xff\xd8':
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        else:
+            img = vision.decode_raw(data)
+        screen, _ = classifier.classify(img)
+        if screen != screen_classifier.GAMEPLAY:
+            return {'screen': screen}
+        board, shapes_data = vision.parse_frame(img)
+    return {
+        'screen': screen,
+        'board': board,
+        'shapes': [s[0] for s in shapes_data],
+        'bboxes': [s[1] for s in shapes_data],
+        'geometry': (vision.BOARD_X, vision.BOARD_Y, vision.CELL_SIZE),
+        'parse_ms': (time.perf_counter() - t0) * 1000,
+    }
+
+def solve_position(board, shapes, combo):
+    """Returns (plan, solver nodes, solve ms)."""
+    t0 = time.perf_counter()
+    plan = solver.solve(board, shapes, combo)
+    return plan, solver.nodes, (time.perf_counter() - t0) * 1000
+
+# --- Controller ---
+
+class DeviceController:
+    """
+    The loop for one device. Its session (combo tracking), profile and stats
+    belong to it alone; only the process pool is shared.
+    """
+    def __init__(self, device, pool, profile=None, max_turns=None):
+        self.device = device
+        self.pool = pool
+        self.profile = profile or dict(DEFAULT_PROFILE)
+        self.max_turns = max_turns
+        self.session = GameSession()
+        self.running = True
+        self.stats = {'turns': 0, 'moves': 0, 'no_solution': 0, 'skipped': 0, 'errors': 0,
+                      'capture_ms': 0.0, 'parse_ms': 0.0, 'solve_ms': 0.0, 'act_ms': 0.0}
+
+    def log(self, text):
+        print(f"[{self.device.name}] {text}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self.running and (self.max_turns is None or self.stats['turns'] < self.max_turns):
+                try:
+                    t0 = time.perf_counter()
+                    data = await self.device.capture()
+                    if data is None:
+                        # Only a replayed device runs out; a phone raises and is retried
+                        self.log("No more frames.")
+                        break
+                    t1 = time.perf_counter()
+                    self.stats['capture_ms'] += (t1 - t0) * 1000
+
+                    result = await loop.run_in_executor(self.pool, parse_capture, data)
+                    if result['screen'] != screen_classifier.GAMEPLAY:
+                        self.stats['skipped'] += 1
+                        if result['screen'] == screen_classifier.DIALOG:
+                            self.session.reset()
+                        await asyncio.sleep(self.profile['retry_s'])
+                        continue
+                    self.stats['parse_ms'] += result['parse_ms']
+
+                    board, shapes = result['board'], result['shapes']
+                    combo = self.session.sync(board, shapes)
+                    plan, _, solve_ms = await loop.run_in_executor(self.pool, solve_position, board, shapes, combo)
+                    self.stats['solve_ms'] += solve_ms
+                    self.stats['turns'] += 1
+                    if not plan:
+                        self.stats['no_solution'] += 1
+                        self.log("No solution.")
+                        await asyncio.sleep(self.profile['retry_s'])
+                        continue
+                    self.session.expect(plan, shapes)
+
+                    t2 = time.perf_counter()
+                    await self.play(plan, shapes, result['bboxes'], result['geometry'])
+                    self.stats['act_ms'] += (time.perf_counter() - t2) * 1000
+                    await asyncio.sleep(self.profile['settle_s'])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    self.log(f"Error: {e}")
+                    await asyncio.sleep(self.profile['retry_s'])
+        finally:
+            await self.device.close()
+
+    async def play(self, plan, shapes, bboxes, geometry):
+        offset = tuple(self.profile['finger_offset'])
+        for shape_idx, r, c in plan:
+            bbox = bboxes[shape_idx]
+            if not bbox:
+                self.log(f"No bbox for shape {shape_idx}, stopping the plan.")
+                break
+            x1, y1, x2, y2 = autoplay.drag_points(shapes[shape_idx], bbox, r, c, offset, geometry)
+            await self.device.swipe(x1, y1, x2, y2, self.profile['swipe_ms'])
+            self.stats['moves'] += 1
+        await self.device.sync()
+
+    def report(self):
+        s = self.stats
+        turns = max(1, s['turns'])
+        return (f"{self.device.name:<20}{s['turns']:>6}{s['moves']:>7}{s['no_solution']:>6}{s['skipped']:>6}"
+                f"{s['errors']:>6}{s['capture_ms'] / turns:>9.1f}{s['parse_ms'] / turns:>9.1f}"
+                f"{s['solve_ms'] / turns:>9.1f}{s['act_ms'] / turns:>9.1f}")
+
+REPORT_HEADER = (f"{'DEVICE':<20}{'turns':>6}{'moves':>7}{'nosol':>6}{'skip':>6}{'err':>6}"
+                 f"{'capture':>9}{'parse':>9}{'solve':>9}{'act':>9}  (ms per turn)")
+
+async def run_devices(devices, workers=None, profiles=None, max_turns=None):
+    """Runs every device until its frames run out, max_turns, or Ctrl+C. Returns the controllers."""
+    profiles = profiles or {}
+    with ProcessPoolExecutor(workers or os.cpu_count(), initializer=init_worker) as pool:
+        controllers = [DeviceController(d, pool, profile_for(profiles, d.name), max_turns) for d in devices]
+        try:
+            await asyncio.gather(*(c.run() for c in controllers))
+        finally:
+            print(REPORT_HEADER)
+            for c in controllers:
+                print(c.report())
+    return controllers
+
+def main():
+    parser = argparse.ArgumentParser(description="Play on several devices at once")
+    parser.add_argument('-s', '--serial', action='append', default=[], help="device serial (repeat; default: all)")
+    parser.add_argument('--fake', action='append', default=[], help="screenshot dir/glob to replay as a device (repeat)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="parse/solve processes")
+    parser.add_argument('--turns', type=int, default=None, help="stop each device after this many turns")
+    parser.add_argument('--profiles', default=PROFILES_PATH)
+    args = parser.parse_args()
+
+    if args.fake:
+        devices = [FakeDevice(f"fake{i}", path) for i, path in enumerate(args.fake)]
+    else:
+        devices = [AdbDevice(serial) for serial in args.serial or adb_devices()]
+    if not devices:
+        print("No devices.", file=sys.stderr)
+        return 1
+    print(f"Driving {len(devices)} devices with {args.workers} workers")
+    try:
+        asyncio.run(run_devices(devices, args.workers, load_profiles(args.profiles), args.turns))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
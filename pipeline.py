@@ -0,0 +1,203 @@
+import collections
+import threading
+import time
+import traceback
+import numpy as np
+import tracing
+
+class LatestQueue:
+    """
+    Bounded hand-off between two stages. When it is full, put() drops the
+    oldest item instead of blocking: a stale frame is worth nothing once a
+    newer one exists. Items put with sticky=True are never dropped for a
+    non-sticky one (a manual capture must reach the analysis).
+    """
+    def __init__(self, maxsize=1):
+        self.items = collections.deque()
+        self.maxsize = maxsize
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.sticky = 0
+
+    def put(self, item, sticky=False):
+        with self.cond:
+            if self.sticky and not sticky and len(self.items) >= self.maxsize:
+                self.dropped += 1
+                return
+            while len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append((item, sticky))
+            self.sticky = sum(s for _, s in self.items)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest item, or None after timeout (0 = don't wait)."""
+        with self.cond:
+            if timeout != 0:
+                self.cond.wait_for(lambda: self.items, timeout)
+            if not self.items:
+                return None
+            item, sticky = self.items.popleft()
+            self.sticky -= sticky
+            return item
+
+    def depth(self):
+        return len(self.items)
+
+    def clear(self):
+        with self.cond:
+            self.items.clear()
+            self.sticky = 0
+
+class StageStats:
+    """Rolling latency samples (ms) of one stage."""
+    def __init__(self, window=200):
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+
+    def add(self, ms):
+        self.samples.append(ms)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples:
+            return {'count': 0}
+        p50, p90 = np.percentile(list(self.samples), [50, 90])
+        return {'count': self.count, 'p50': p50, 'p90': p90, 'max': max(self.samples)}
+
+class Pipeline:
+    """
+    capture -> [frames] -> analyze -> [results] -> UI
+
+    Capture and analysis run on their own threads, so frame N+1 is being
+    captured while frame N is parsed and solved. Both queues hold only the
+    newest item. The UI thread calls poll() and only draws finished work.
+
+    analyze(img, manual) returns whatever the UI needs, or None to skip the frame.
+    In continuous mode analyze can call set_idle(True) while the board is
+    stable: captures then back off (doubling up to max_idle seconds) until
+    something changes or a manual capture is requested.
+    """
+    STAGES = ('capture', 'wait', 'analyze', 'render', 'total')
+
+    def __init__(self, source, analyze, min_idle=0.1, max_idle=1.0):
+        self.source = source
+        self.analyze = analyze
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+        self.idle_interval = 0.0
+        self.frames = LatestQueue(1)
+        self.results = LatestQueue(1)
+        self.stats = {name: StageStats() for name in self.STAGES}
+        self.continuous = False
+        self.trigger = threading.Event()      # wakes the capture loop
+        self.lock = threading.Lock()
+        self.manual_pending = False           # set with the trigger, taken by the capture loop
+        self.actions = collections.deque()    # callables for the analysis thread (see run_on_analysis)
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        self.threads = [threading.Thread(target=self._capture_loop, name='capture', daemon=True),
+                        threading.Thread(target=self._analyze_loop, name='analyze', daemon=True)]
+        for t in self.threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.trigger.set()
+        for t in self.threads:
+            t.join(timeout=2)
+        self.threads = []
+
+    def set_continuous(self, on):
+        self.continuous = on
+        self.idle_interval = 0.0
+        self.trigger.set()
+
+    def request(self):
+        """One manual capture (the 'r' key / CAPTURE button)."""
+        with self.lock:
+            self.manual_pending = True
+            self.trigger.set()
+
+    def run_on_analysis(self, action):
+        """Runs action() on the analysis thread before the next frame (e.g. resetting state analyze uses)."""
+        self.actions.append(action)
+
+    def set_idle(self, idle):
+        """Call from analyze: True = nothing changed on this frame, slow capture down."""
+        if idle:
+            self.idle_interval = min(self.max_idle, max(self.min_idle, self.idle_interval * 2))
+        else:
+            self.idle_interval = 0.0
+
+    def _capture_loop(self):
+        while self.running:
+            with self.lock:
+                # Flag and event change together, so a request can't be lost in between
+                manual = self.manual_pending
+                self.manual_pending = False
+                self.trigger.clear()
+            if not self.continuous and not manual:
+                self.trigger.wait(0.1)
+                continue
+
+            t0 = time.perf_counter()
+            # fresh: a stream source would otherwise hand back the same frame again
+            with tracing.span('capture'):
+                img = self.source.read(fresh=True)
+            t1 = time.perf_counter()
+            if img is None:
+                if manual:
+                    print("Capture failed.")
+                else:
+                    time.sleep(0.1)
+                continue
+            self.stats['capture'].add((t1 - t0) * 1000)
+            self.frames.put({'image': img, 'manual': manual, 't_start': t0, 't_captured': t1}, sticky=manual)
+            if self.idle_interval and not manual:
+                # Board is stable: no new screencap/decode until the backoff ends (or 'r')
+                self.trigger.wait(self.idle_interval)
+
+    def _analyze_loop(self):
+        while self.running:
+            frame = self.frames.get(timeout=0.1)
+            while self.actions:
+                self.actions.popleft()()
+            if frame is None:
+                continue
+            t0 = time.perf_counter()
+            self.stats['wait'].add((t0 - frame['t_captured']) * 1000)
+            try:
+                result = self.analyze(frame['image'], frame['manual'])
+            except Exception as e:
+                traceback.print_exc()
+                result = {'error': str(e)}
+            self.stats['analyze'].add((time.perf_counter() - t0) * 1000)
+            if result is not None:
+                result['t_start'] = frame['t_start']
+                self.results.put(result)
+
+    def poll(self):
+        """Finished result for the UI thread, or None. Never blocks."""
+        return self.results.get(timeout=0)
+
+    def rendered(self, result, t_render_start):
+        """Call from the UI thread after drawing a result."""
+        now = time.perf_counter()
+        self.stats['render'].add((now - t_render_start) * 1000)
+        self.stats['total'].add((now - result['t_start']) * 1000)
+
+    def report(self):
+        lines = [f"Queues: frames={self.frames.depth()} (dropped {self.frames.dropped}), "
+                 f"results={self.results.depth()} (dropped {self.results.dropped})"]
+        for name in self.STAGES:
+            s = self.stats[name].summary()
+            if s['count']:
+                lines.append(f"  {name:<8} n={s['count']:<5} p50={s['p50']:7.1f}ms "
+                             f"p90={s['p90']:7.1f}ms max={s['max']:7.1f}ms")
+        return "\n".join(lines)
@@ -1,25 +1,14 @@
 import cv2
 import numpy as np
-import subprocess
+from frame_source import CaptureFrameSource
 
 def precise_board_detection():
     print("Capturing screen from phone...")
     
-    process = subprocess.Popen(
-        ['adb', 'exec-out', 'screencap', '-p'],
-        stdout=subprocess.PIPE
-    )
-    screenshot_data, _ = process.communicate()
-    
-    if not screenshot_data:
-        print("ERROR: No data received from ADB")
-        return
-    
-    nparr = np.frombuffer(screenshot_data, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    img = CaptureFrameSource().read()
     
     if img is None:
-        print("ERROR: Could not decode image")
+        print("ERROR: Could not capture screen")
         return
     
     h, w, _ = img.shape
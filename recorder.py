@@ -0,0 +1,280 @@
+import argparse
+import contextlib
+import json
+import os
+import itertools
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import vision
+from solver import board_bits, make_solver
+
+# Session log (.bbr): append-only, one record per turn
+#   header   '<4sIQ'  magic b'BBR1' (raw) or b'BBR2' (PNG), meta length, frame length
+#   meta     JSON: time, turn, working frame size + scale, theme, roi rows,
+#            board (bit r*8+c), shapes, bboxes, plan, combo, timings_ms,
+#            solver (solver.settings(), what replay rebuilds by default)
+#   frame    the board/spawn rows of the working-scale frame: raw uint8 BGR,
+#            or PNG with compact=True
+# Every record starts on an ALIGN boundary and carries its own lengths, so the
+# file is np.memmap'ed and walked record by record: a raw frame is a view of
+# the map (nothing copied or decoded), a PNG is decoded straight from its
+# slice. A record cut short by a crash is simply ignored by the reader.
+
+RAW_MAGIC = b'BBR1'
+PNG_MAGIC = b'BBR2'
+HEADER = struct.Struct('<4sIQ')
+ALIGN = 64
+
+def pad(n):
+    return -n % ALIGN
+
+def unpack_board(bits, grid_size=8):
+    cells = [(bits >> i) & 1 for i in range(grid_size * grid_size)]
+    return np.array(cells, dtype=int).reshape(grid_size, grid_size)
+
+def new_session_file(directory):
+    """
+    Creates sessions/session_YYYYmmdd_HHMMSS_mmm_PID.bbr; two recorders that
+    still collide (same process, same millisecond) get a -N suffix.
+    """
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    stem = time.strftime('session_%Y%m%d_%H%M%S', time.localtime(now)) + f"_{int(now * 1000) % 1000:03d}_{os.getpid()}"
+    for n in itertools.count():
+        path = os.path.join(directory, stem + (f"-{n}" if n else "") + ".bbr")
+        try:
+            return path, open(path, 'xb')
+        except FileExistsError:
+            continue
+
+class SessionRecorder:
+    """
+    Writes turns to a new sessions/session_*.bbr (or `path`).
+    record() takes the working-scale frame the vision ran on (see
+    VisionExecutor.last_frame) and keeps only the rows the parsers read, raw
+    so replays map them; compact=True stores them as PNG instead (fast level:
+    flat game graphics shrink many times over, at a decode per replayed turn).
+    `solver` is the one that made the plans: its settings() go into every turn.
+    """
+    def __init__(self, directory='sessions', path=None, solver=None, compact=False):
+        if path is None:
+            path, self.file = new_session_file(directory)
+        else:
+            self.file = open(path, 'xb')
+        self.path = path
+        self.solver = solver.settings() if solver is not None else None
+        self.compact = compact
+        self.turns = 0
+        print(f"Recording session to {path}")
+
+    def record(self, frame, board, shapes_data, plan, combo=0, timings=None):
+        """frame: (working image, scale, theme)."""
+        work, scale, theme = frame
+        h, w, _ = work.shape
+        y1, y2 = vision.capture_roi(h, w, scale)
+        if self.compact:
+            ok, frame_data = cv2.imencode('.png', work[y1:y2], [cv2.IMWRITE_PNG_COMPRESSION, 1])
+            if not ok:
+                raise ValueError("PNG encoding of the recorded frame failed")
+            magic = PNG_MAGIC
+        else:
+            frame_data = np.ascontiguousarray(work[y1:y2])
+            magic = RAW_MAGIC
+        meta = {
+            't': round(time.time(), 3),
+            'turn': self.turns,
+            'size': [h, w],
+            'scale': scale,
+            'theme': theme,
+            'roi': [y1, y2],
+            'board': board_bits(board),
+            'shapes': [[list(map(int, p)) for p in s[0]] for s in shapes_data],
+            'bboxes': [list(map(int, s[1])) if s[1] else None for s in shapes_data],
+            'plan': [list(map(int, move)) for move in plan or []],
+            'combo': combo,
+            'timings_ms': {k: round(v, 2) for k, v in (timings or {}).items()},
+            'solver': self.solver,
+        }
+        meta_bytes = json.dumps(meta, separators=(',', ':')).encode()
+        head = HEADER.pack(magic, len(meta_bytes), frame_data.nbytes) + meta_bytes
+        self.file.write(head + b'\0' * pad(len(head)))
+        self.file.write(frame_data.data)
+        self.file.write(b'\0' * pad(frame_data.nbytes))
+        self.file.flush()
+        self.turns += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            print(f"Recorded {self.turns} turns to {self.path}")
+
+def read_session(path, frames=True):
+    """
+    Yields (meta, roi) per turn; roi is the (rows, w, 3) uint8 band that was
+    recorded (a read-only view of the map for raw records), or None with
+    frames=False (metadata only, nothing decoded).
+    """
+    if os.path.getsize(path) == 0:
+        return
+    data = np.memmap(path, np.uint8, 'r')
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        magic, meta_len, frame_len = HEADER.unpack(data[offset:offset + HEADER.size].tobytes())
+        if magic not in (RAW_MAGIC, PNG_MAGIC):
+            break
+        meta_end = offset + HEADER.size + meta_len
+        frame_start = meta_end + pad(meta_end)
+        if frame_start + frame_len > len(data):
+            break     # truncated last record
+        meta = json.loads(data[offset + HEADER.size:meta_end].tobytes())
+        rows = meta['roi'][1] - meta['roi'][0]
+        frame = data[frame_start:frame_start + frame_len]
+        if not frames:
+            roi = None
+        elif magic == RAW_MAGIC:
+            if frame_len != rows * meta['size'][1] * 3:
+                break
+            roi = frame.reshape(rows, meta['size'][1], 3)
+        else:
+            roi = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+            if roi is None or roi.shape[0] != rows:
+                break     # corrupt frame: treat like a truncated tail
+        yield meta, roi
+        offset = frame_start + frame_len + pad(frame_len)
+
+def rebuild_frame(meta, roi):
+    """Working-scale frame with the recorded rows in place (black elsewhere, like decode_raw(crop=True))."""
+    h, w = meta['size']
+    work = np.zeros((h, w, 3), np.uint8)
+    y1, y2 = meta['roi']
+    work[y1:y2] = roi
+    return work
+
+# Replay solvers by settings, built on first use in each worker
+solvers = {}
+
+def init_worker():
+    import cv2
+    cv2.setNumThreads(1)
+    vision.SAVE_DEBUG_IMAGES = False
+
+def get_solver(settings):
+    """make_solver(**settings), one per distinct settings (time limits dropped).
+    Turns recorded before the solver was stored were solved by the beam search."""
+    settings = dict(settings or {'backend': 'beam'})
+    if settings.get('time_limit'):
+        # A search stopped by the clock depends on the machine and its load:
+        # replays run on the iteration budget alone, so they repeat run after run
+        settings['time_limit'] = None
+    key = json.dumps(settings, sort_keys=True)
+    if key not in solvers:
+        solvers[key] = make_solver(**settings)
+    return solvers[key]
+
+def replay_turn(meta, roi, stages=('vision', 'solve'), solver=None):
+    """
+    Re-runs the current vision and/or solver on one recorded turn.
+    Without 'vision', the solver gets the recorded board and shapes.
+    `solver` is a make_solver() backend name; default: the recorded solver.
+    Returns the new results and which of them differ from the recording.
+    """
+    board = unpack_board(meta['board'])
+    shapes = [[tuple(p) for p in s] for s in meta['shapes']]
+    result = {'turn': meta['turn'], 'timings_ms': {}, 'diff': []}
+
+    if 'vision' in stages:
+        work = rebuild_frame(meta, roi)
+        scale = meta['scale']
+        t0 = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            theme = vision.detect_theme(work, scale)
+            new_board = vision.parse_board(work, scale, theme)
+            shapes_data = vision.parse_shapes(work, scale, theme)
+        result['timings_ms']['vision'] = round((time.perf_counter() - t0) * 1000, 2)
+        new_shapes = [[tuple(map(int, p)) for p in s[0]] for s in shapes_data]
+        if theme != meta['theme']:
+            result['diff'].append('theme')
+        if board_bits(new_board) != meta['board']:
+            result['diff'].append('board')
+            result['board'] = new_board.astype(int).tolist()
+        if new_shapes != shapes:
+            result['diff'].append('shapes')
+            result['shapes'] = new_shapes
+        board, shapes = new_board, new_shapes
+
+    if 'solve' in stages:
+        t0 = time.perf_counter()
+        engine = get_solver({'backend': solver} if solver else meta.get('solver'))
+        plan = engine.solve(board, shapes, meta['combo'])
+        result['timings_ms']['solve'] = round((time.perf_counter() - t0) * 1000, 2)
+        plan = [list(map(int, move)) for move in plan or []]
+        if plan != meta['plan']:
+            result['diff'].append('plan')
+            result['plan'] = plan
+    return result
+
+def replay_file(path, stages=('vision', 'solve'), solver=None):
+    """All turns of one session. Returns (path, [turn results])."""
+    return path, [replay_turn(meta, roi, stages, solver) for meta, roi in read_session(path)]
+
+def session_files(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(os.path.join(p, f) for f in os.listdir(p) if f.endswith('.bbr'))
+        else:
+            files.append(p)
+    return files
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay recorded sessions (.bbr)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    info = sub.add_parser('info', help="one line per turn")
+    info.add_argument('paths', nargs='+', help=".bbr files or directories")
+    replay = sub.add_parser('replay', help="re-run vision/solver over recorded turns")
+    replay.add_argument('paths', nargs='+', help=".bbr files or directories")
+    replay.add_argument('-o', '--output', help="JSONL of the turns that changed (default stdout)")
+    replay.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    replay.add_argument('--stage', choices=('vision', 'solve', 'both'), default='both')
+    replay.add_argument('--solver', choices=('beam', 'rollout', 'mcts', 'learned'),
+                        help="solve with this backend's defaults (default: the recorded solver)")
+    args = parser.parse_args()
+
+    files = session_files(args.paths)
+    if args.command == 'info':
+        for path in files:
+            for meta, _ in read_session(path, frames=False):
+                y1, y2 = meta['roi']
+                print(f"{os.path.basename(path)} #{meta['turn']:<4} {meta['theme']:<6} "
+                      f"{meta['size'][1]}x{y2 - y1}  board={meta['board']:016x}  "
+                      f"{(meta.get('solver') or {}).get('backend', 'beam')}  plan={meta['plan']}  {meta['timings_ms']}")
+        return 0
+
+    stages = ('vision', 'solve') if args.stage == 'both' else (args.stage,)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    turns = changed = 0
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+            for path, results in pool.map(replay_file, files, [stages] * len(files), [args.solver] * len(files)):
+                for result in results:
+                    turns += 1
+                    if result['diff']:
+                        changed += 1
+                        out.write(json.dumps({'file': path, **result}) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    print(f"{turns} turns from {len(files)} sessions in {elapsed:.1f}s "
+          f"({turns / elapsed if elapsed else 0:.1f}/s): {changed} differ from the recording",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import vision
+from frame_source import IMAGE_EXTS, load_frame
+
+# Screen classes
+GAMEPLAY = 'GAMEPLAY'     # a settled board with pieces to place -> parse and solve
+ANIMATING = 'ANIMATING'   # line clear / placement / score animation -> wait
+DIALOG = 'DIALOG'         # game over, revive, ad, menu -> don't solve
+UNKNOWN = 'UNKNOWN'       # nothing close enough to the references
+
+CLASSES = (GAMEPLAY, ANIMATING, DIALOG)
+
+REFS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'screen_refs.json')
+
+# Thumbnail grid per region: (cols, rows)
+REGIONS = {'top': (4, 2), 'board': (8, 8), 'spawn': (6, 2)}
+
+def signature(image, width=64):
+    """
+    A few hundred numbers describing the screen layout: mean BGR over small
+    grids of the top bar, the board (one value per cell) and the spawn area.
+    Works on a strided view, so the full frame is never touched.
+    Returns (signature, theme); the theme uses the same rule as vision.detect_theme.
+    """
+    h, w, _ = image.shape
+    step = max(1, w // width)
+    thumb = np.ascontiguousarray(image[::step, ::step])
+    th, tw, _ = thumb.shape
+    scale = 1.0 / step
+
+    # Native geometry brought down to the thumbnail: the short-frame branch of
+    # board_geometry places the board by proportions and ignores a scale
+    board_x, board_y, board_size = (min(v // step, tw - 1) for v in vision.board_geometry(h, w))
+    board_end = min(th - 1, board_y + board_size)
+    rois = {
+        'top': thumb[:max(1, board_y)],
+        'board': thumb[board_y:board_end, board_x:board_x + board_size],
+        'spawn': thumb[board_end:],
+    }
+    parts = []
+    for name, size in REGIONS.items():
+        roi = rois[name]
+        if roi.size == 0:
+            parts.append(np.zeros(size[0] * size[1] * 3, np.float32))
+        else:
+            parts.append(cv2.resize(roi, size, interpolation=cv2.INTER_AREA).astype(np.float32).ravel())
+
+    # Background at 70% height near the left edge, like detect_theme
+    b, g, r = thumb[int(th * 0.70), min(tw - 1, vision.px(15, scale))].astype(int)
+    if b < 100 and g < 100 and r < 100:
+        theme = 'DARK'
+    elif b > g + 20:
+        theme = 'BLUE'
+    else:
+        theme = 'GREEN'
+    return np.concatenate(parts), theme
+
+def region_weights():
+    """Every region counts the same in the distance, whatever its grid size."""
+    weights = [np.full(cols * rows * 3, 1.0 / (cols * rows * 3 * len(REGIONS)), np.float32)
+               for cols, rows in REGIONS.values()]
+    return np.concatenate(weights)
+
+class ScreenClassifier:
+    """
+    Nearest-neighbour match of the screen signature against reference
+    signatures learned per theme from sorted screenshots
+    (see `python screen_classifier.py learn`).
+    All themes are searched: a dialog's dim overlay can make a BLUE game look DARK.
+    Without a reference file every screen counts as GAMEPLAY, i.e. the bot
+    behaves as before.
+    """
+    def __init__(self, refs_path=REFS_PATH, max_distance=25.0):
+        self.max_distance = max_distance   # mean abs difference (gray levels)
+        self.weights = region_weights()
+        self.sigs = None                   # N x len(signature)
+        self.labels = []
+        if refs_path and os.path.exists(refs_path):
+            self.load(refs_path)
+        else:
+            print("No screen references found, screen classifier disabled.")
+
+    def load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        sigs, labels = [], []
+        for by_class in data.values():
+            for label, items in by_class.items():
+                sigs += items
+                labels += [label] * len(items)
+        if sigs:
+            self.sigs = np.array(sigs, np.float32)
+            self.labels = labels
+
+    def classify(self, image):
+        """Returns (screen class, distance to the nearest reference)."""
+        if self.sigs is None:
+            return GAMEPLAY, 0.0
+        sig, _ = signature(image)
+        dist = np.abs(self.sigs - sig) @ self.weights
+        i = int(np.argmin(dist))
+        if dist[i] > self.max_distance:
+            return UNKNOWN, float(dist[i])
+        return self.labels[i], float(dist[i])
+
+def learn(root, out=REFS_PATH):
+    """
+    Builds the reference file from root/gameplay, root/animating and
+    root/dialog (screenshots sorted by hand; any theme mix).
+    """
+    data = {}
+    for label in CLASSES:
+        folder = os.path.join(root, label.lower())
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith(IMAGE_EXTS):
+                continue
+            img = load_frame(os.path.join(folder, name))
+            if img is None:
+                continue
+            sig, theme = signature(img)
+            data.setdefault(theme, {}).setdefault(label, []).append(
+                [round(float(v), 1) for v in sig])
+    with open(out, 'w') as f:
+        json.dump(data, f)
+    for theme, by_class in sorted(data.items()):
+        print(f"{theme}: " + ", ".join(f"{k}={len(v)}" for k, v in by_class.items()))
+    print(f"Saved {out}")
+
+if __name__ == "__main__":
+    # python screen_classifier.py learn SORTED_DIR
+    # python screen_classifier.py screenshots...
+    if len(sys.argv) > 2 and sys.argv[1] == 'learn':
+        learn(sys.argv[2])
+    else:
+        classifier = ScreenClassifier()
+        for path in sys.argv[1:]:
+            img = load_frame(path)
+            if img is None:
+                continue
+            t0 = time.perf_counter()
+            screen, dist = classifier.classify(img)
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"{path}: {screen} (distance {dist:.1f}, {ms:.3f}ms)")
@@ -0,0 +1,197 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import cv2
+
+SCREENSHOT_DIRS = [
+    '/sdcard/Pictures/Screenshots/',
+    '/sdcard/DCIM/Screenshots/',
+    '/sdcard/Screenshots/'
+]
+
+SCREENSHOT_EXTS = ('.png', '.jpg', '.jpeg')
+
+# inotify flags (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')   # wd, mask, cookie, len
+
+def load_inotify():
+    """libc's inotify functions through ctypes, or None (not Linux/Android, or no libc found)."""
+    if not sys.platform.startswith('linux'):
+        return None
+    for name in (None, ctypes.util.find_library('c'), 'libc.so'):
+        try:
+            libc = ctypes.CDLL(name, use_errno=True)
+            libc.inotify_init1
+            libc.inotify_add_watch
+            return libc
+        except (OSError, AttributeError):
+            continue
+    return None
+
+class ScreenshotWatcher:
+    """
+    Keeps the newest screenshot in a few directories at hand, without listing
+    them on every request.
+    With inotify, new files are reported by the kernel (closed after writing or
+    renamed into place). Without it, each directory is rescanned only when its
+    own mtime changed, and only files not seen before are stat'ed.
+    latest() is O(1); with predecode=True the image is already decoded.
+    on_new(path) is called on the watcher thread for every new screenshot.
+    """
+    def __init__(self, dirs=None, on_new=None, predecode=False, poll_interval=1.0, use_inotify=True):
+        self.dirs = list(dirs or SCREENSHOT_DIRS)
+        self.on_new = on_new
+        self.predecode = predecode
+        self.poll_interval = poll_interval
+        self.libc = load_inotify() if use_inotify else None
+        self.lock = threading.Lock()
+        self.latest_path = None
+        self.latest_mtime = 0.0
+        self.image = None
+        self.image_path = None
+        self.index = {}          # dir -> (dir mtime, set of known names)
+        self.fd = None
+        self.wds = {}            # inotify watch descriptor -> dir
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return self
+        self.initial_scan()
+        if self.libc is not None:
+            self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if self.fd < 0:
+                self.fd = None
+            else:
+                for d in self.dirs:
+                    if os.path.isdir(d):
+                        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(d), IN_CLOSE_WRITE | IN_MOVED_TO)
+                        if wd >= 0:
+                            self.wds[wd] = d
+                if not self.wds:
+                    os.close(self.fd)
+                    self.fd = None
+        self.running = True
+        target = self._inotify_loop if self.fd is not None else self._poll_loop
+        self.thread = threading.Thread(target=target, name='screenshot-watcher', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    @property
+    def mode(self):
+        return 'inotify' if self.fd is not None else 'poll'
+
+    def initial_scan(self):
+        """The only full listing: builds the index and finds the newest file."""
+        for d in self.dirs:
+            self.rescan(d, notify=False)
+
+    def rescan(self, d, notify=True):
+        """Stats only files that are new since the last scan of this directory."""
+        try:
+            dir_mtime = os.stat(d).st_mtime
+        except OSError:
+            self.index.pop(d, None)
+            return
+        old_mtime, known = self.index.get(d, (None, set()))
+        if dir_mtime == old_mtime:
+            return
+        names = set()
+        with os.scandir(d) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(SCREENSHOT_EXTS):
+                    continue
+                names.add(entry.name)
+                if entry.name not in known:
+                    try:
+                        self.offer(entry.path, entry.stat().st_mtime, notify)
+                    except OSError:
+                        pass
+        self.index[d] = (dir_mtime, names)
+
+    def offer(self, path, mtime=None, notify=True):
+        """A (possibly) new screenshot; becomes the latest if it is the newest."""
+        if mtime is None:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return
+        with self.lock:
+            if mtime < self.latest_mtime:
+                return
+            self.latest_path, self.latest_mtime = path, mtime
+        if self.predecode:
+            img = cv2.imread(path)
+            with self.lock:
+                if self.latest_path == path:
+                    self.image, self.image_path = img, path
+        if notify and self.on_new:
+            self.on_new(path)
+
+    def _poll_loop(self):
+        while self.running:
+            for d in self.dirs:
+                self.rescan(d)
+            time.sleep(self.poll_interval)
+
+    def _inotify_loop(self):
+        while self.running:
+            ready, _, _ = select.select([self.fd], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+                offset += length
+                if wd in self.wds and name.lower().endswith(SCREENSHOT_EXTS):
+                    self.offer(os.path.join(self.wds[wd], name))
+
+    def latest(self):
+        """Path of the newest screenshot, or None."""
+        with self.lock:
+            return self.latest_path
+
+    def latest_image(self):
+        """Newest screenshot decoded (cached when predecode is on), or None."""
+        with self.lock:
+            path, img, img_path = self.latest_path, self.image, self.image_path
+        if path is None:
+            return None
+        if img is not None and img_path == path:
+            return img
+        return cv2.imread(path)
+
+if __name__ == "__main__":
+    # python screenshot_watcher.py DIR...   (prints every new screenshot)
+    watcher = ScreenshotWatcher(sys.argv[1:] or None, on_new=lambda p: print(f"New screenshot: {p}")).start()
+    print(f"Watching {watcher.dirs} ({watcher.mode}), latest: {watcher.latest()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
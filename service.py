@@ -1,18 +1,30 @@
+import startup
+import os
+import shutil
+import threading
 import time
+import tracing
 from kivy.config import Config
 Config.set('graphics', 'width', '0')
 Config.set('graphics', 'height', '0')
 
-from kivy.app import App
-from kivy.core.window import Window
 from kivy.clock import Clock
 from kivy.utils import platform
 
 # Bot imports (Assuming they are in the same folder)
-import vision
-import solver
-import numpy as np
-import cv2
+# Lazy: cv2, numpy and the solver load on the warm-up thread, not before the button shows
+vision = startup.lazy_import('vision')
+frame_source = startup.lazy_import('frame_source')
+vision_executor = startup.lazy_import('vision_executor')
+session = startup.lazy_import('session')
+screen_classifier = startup.lazy_import('screen_classifier')
+screenshot_watcher = startup.lazy_import('screenshot_watcher')
+metrics_server = startup.lazy_import('metrics_server')
+recorder = startup.lazy_import('recorder')
+solve_server = startup.lazy_import('solve_server')
+solver_module = startup.lazy_import('solver')
+from solve_worker import SolveWorker
+startup.mark('imports')
 
 if platform == 'android':
     from jnius import autoclass, cast
@@ -35,10 +47,14 @@ if platform == 'android':
     service = PythonService.mService
     wm = service.getSystemService(Context.WINDOW_SERVICE)
 
+    # WindowManager calls must happen on the Android UI thread
+    ui_thread = run_on_ui_thread
+
 else:
     # Dummy classes for PC testing
     service = None
     wm = None
+    ui_thread = lambda f: f
 
 class OverlayView:
     def __init__(self):
@@ -48,6 +64,52 @@ class OverlayView:
         self.btn_params = None
         self.overlay_params = None
         self.drawing_view = None
+        # Bot objects, created by ensure_bot() off the UI thread
+        self.bot_lock = threading.Lock()
+        self.source = None
+        self.vision_pool = None
+        self.session = None
+        self.classifier = None
+        self.warm_thread = None
+        self.metrics = None
+        self.recorder = None
+        self.watcher = None
+        self.waiting_for_screenshot = False   # screencap failed, screenshots are the input
+        self.worker = SolveWorker(post=lambda fn: Clock.schedule_once(lambda dt: fn(), 0)).start()
+
+    def ensure_bot(self):
+        """First use pays the imports; the lock keeps warm-up and a first click from racing."""
+        with self.bot_lock:
+            if self.session is None:
+                # Raw framebuffer when the screencap binary is there (no PNG encode/decode)
+                self.source = frame_source.CaptureFrameSource(use_adb=False, raw=shutil.which('screencap') is not None)
+                self.vision_pool = vision_executor.VisionExecutor()
+                self.classifier = screen_classifier.ScreenClassifier()
+                if os.environ.get('BOT_SOLVE_SERVER'):
+                    # host:port[?workers=N or ?timeout=S] of a solve_server.py on the LAN;
+                    # solves locally (beam search) when it is unreachable
+                    if os.environ.get('BOT_SOLVER'):
+                        print(f"BOT_SOLVER={os.environ['BOT_SOLVER']} ignored: BOT_SOLVE_SERVER is set "
+                              "(beam search on the server).")
+                    solver = solve_server.RemoteSolver(os.environ['BOT_SOLVE_SERVER'])
+                else:
+                    # BOT_SOLVER picks the engine: 'beam' (default), 'rollout', 'mcts' or 'learned'
+                    solver = solver_module.make_solver(os.environ.get('BOT_SOLVER', 'beam'))
+                self.session = session.GameSession(solver)
+                if os.environ.get('BOT_METRICS_PORT'):
+                    self.metrics = metrics_server.MetricsServer(
+                        int(os.environ['BOT_METRICS_PORT']), executor=self.vision_pool, session=self.session).start()
+                if os.environ.get('BOT_RECORD'):
+                    self.recorder = recorder.SessionRecorder(os.environ['BOT_RECORD'], solver=solver,
+                                                             compact=bool(os.environ.get('BOT_RECORD_COMPACT')))
+                startup.mark('bot_ready')
+
+    def start_warm_up(self):
+        """Builds everything the first SOLVE needs in the background, right after launch."""
+        def run():
+            self.ensure_bot()
+            startup.warm_up(self.vision_pool, self.session.solver)
+        self.warm_thread = startup.in_background(run)
 
     def create_floating_button(self):
         if not self.wm: return
@@ -75,39 +137,90 @@ class OverlayView:
 
     def on_solve_click(self):
         print("Solve Clicked!")
-        try:
-            # 1. Capture Screen (Local Mode)
-            # Try capturing with 'screencap' (requires permission or trickery)
-            # OR read latest screenshot
-            img = vision.capture_screen(use_adb=False)
-            
-            if img is None:
-                # Fallback: Read latest file in Screenshots folder
-                print("Capture failed, trying safe fallback...")
-                
-                img = self.get_latest_screenshot()
-                
-                if img is None:
-                    print("No screenshot found.")
-                    return
-
-            # 2. Parse and Solve
-            board = vision.parse_board(img)
-            shapes_data = vision.parse_shapes(img)
-            shapes = [s[0] for s in shapes_data]
-            bboxes = [s[1] for s in shapes_data]
+        # Nothing heavy in the click listener: a slow solve would freeze the overlay (ANR).
+        # A second click supersedes the work of the first one.
+        self.worker.submit(self.solve_job, self.on_solved, self.on_solve_error)
+
+    def solve_job(self, job):
+        """
+        Runs on the worker thread: capture, parse and solve.
+        Returns (solution, bboxes), or None if there is nothing to show.
+        """
+        if self.warm_thread is not None:
+            self.warm_thread.join()
+        self.ensure_bot()
+
+        # 1. Capture Screen (Local Mode)
+        # Try capturing with 'screencap' (requires permission or trickery)
+        # OR read latest screenshot
+        with tracing.span('capture'):
+            img = self.source.read()
+        
+        if img is None:
+            # Fallback: Read latest file in Screenshots folder
+            print("Capture failed, trying safe fallback...")
             
-            solution = solver.solve(board, shapes)
+            img = self.get_latest_screenshot()
             
-            if solution:
-                print("Solution Found!")
-                self.draw_solution(solution, bboxes)
-            else:
-                print("No Solution")
+            if img is None:
+                print("No screenshot found.")
+                return None
+        else:
+            self.waiting_for_screenshot = False
+        if job.cancelled:
+            return None
+
+        # 2. Skip screens that are not a game position (game over, ads, animations)
+        screen, _ = self.classifier.classify(img)
+        if screen != screen_classifier.GAMEPLAY:
+            print(f"Not a game position ({screen})")
+            if screen == screen_classifier.DIALOG:
+                self.session.reset()
+            return None
+
+        # 3. Parse and Solve
+        t0 = time.perf_counter()
+        board, shapes_data = self.session.observe(img, self.vision_pool)
+        shapes = [s[0] for s in shapes_data]
+        bboxes = [s[1] for s in shapes_data]
+        if job.cancelled:
+            return None
+        
+        t1 = time.perf_counter()
+        combo = self.session.combo
+        solution = self.session.solve(board, shapes)
+        if job.cancelled:
+            # Superseded while solving: this plan is never shown, so it must not become the prediction
+            return None
+        if self.recorder:
+            self.recorder.record(self.vision_pool.last_frame, board, shapes_data, solution, combo,
+                                 {'parse': (t1 - t0) * 1000, 'solve': (time.perf_counter() - t1) * 1000})
+        
+        if not solution:
+            print("No Solution")
+            tracing.count('no_solution')
+            return None
+        print("Solution Found!")
+        self.session.expect(solution, shapes)
+        if tracing.EXPORT:
+            tracing.save()
+        return solution, bboxes
 
-        except Exception as e:
-            print(f"Error in solve: {e}")
+    def on_solved(self, result):
+        """Posted back through the Clock once the newest job finished."""
+        if 'first_solve' not in startup.TIMINGS:
+            startup.mark('first_solve')
+            print(startup.report())
+        if result is None:
+            return
+        solution, bboxes = result
+        self.draw_solution(solution, bboxes)
 
+    def on_solve_error(self, error):
+        print(f"Error in solve: {error}")
+
+    @ui_thread
+    @tracing.traced('draw')
     def draw_solution(self, solution, bboxes):
         if not self.wm: return
 
@@ -132,11 +245,30 @@ class OverlayView:
         # Clear overlay after 3 seconds
         Clock.schedule_once(lambda dt: self.clear_overlay(), 3)
 
+    @ui_thread
     def clear_overlay(self):
         if self.drawing_view and self.wm:
             self.wm.removeView(self.drawing_view)
             self.drawing_view = None
 
+    def get_latest_screenshot(self):
+        """Fallback: the newest screenshot, kept ready by the watcher (no directory listing)."""
+        if self.watcher is None:
+            # Full scan once, then inotify (or an mtime index) keeps it current
+            self.watcher = screenshot_watcher.ScreenshotWatcher(on_new=self.on_new_screenshot, predecode=True).start()
+        path = self.watcher.latest()
+        if path is None:
+            return None
+        print(f"Found latest screenshot: {path}")
+        self.waiting_for_screenshot = True
+        return self.watcher.latest_image()
+
+    def on_new_screenshot(self, path):
+        """Watcher thread: in fallback mode a new screenshot starts a solve by itself."""
+        if self.waiting_for_screenshot:
+            print(f"New screenshot: {path}")
+            self.worker.submit(self.solve_job, self.on_solved, self.on_solve_error)
+
 # Java Proxy for Click Listener
 if platform == 'android':
     from jnius import PythonJavaClass, java_method
@@ -187,38 +319,6 @@ if platform == 'android':
                 canvas.drawRect(float(dest_x), float(dest_y), 
                                 float(dest_x + cell_size), float(dest_y + cell_size), self.paint)
 
-    def get_latest_screenshot(self):
-        """Fallback: Find the latest screenshot in common directories."""
-        import os
-        search_paths = [
-            '/sdcard/Pictures/Screenshots/',
-            '/sdcard/DCIM/Screenshots/',
-            '/sdcard/Screenshots/'
-        ]
-        
-        latest_file = None
-        latest_time = 0
-        
-        for path in search_paths:
-            if not os.path.exists(path): continue
-            
-            for f in os.listdir(path):
-                if f.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    full_path = os.path.join(path, f)
-                    try:
-                        mtime = os.path.getmtime(full_path)
-                        if mtime > latest_time:
-                            latest_time = mtime
-                            latest_file = full_path
-                    except:
-                        pass
-        
-        if latest_file:
-            print(f"Found latest screenshot: {latest_file}")
-            return cv2.imread(latest_file)
-        return None
-
-
 if __name__ == '__main__':
     if platform == 'android':
         overlay = OverlayView()
@@ -228,9 +328,12 @@ if __name__ == '__main__':
             overlay.create_floating_button()
         
         start_overlay()
+        startup.mark('overlay_ready')
+        overlay.start_warm_up()
         
-        # Keep service alive
+        # Keep service alive; ticking the Clock delivers solver results and overlay timeouts
         while True:
-            time.sleep(1)
+            time.sleep(0.1)
+            Clock.tick()
     else:
         print("This service is designed for Android only.")
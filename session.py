@@ -0,0 +1,188 @@
+import numpy as np
+import tracing
+import vision
+from solver import BlockBlastBalancedSolver
+
+# Cells whose last measured fill is in this band get re-checked every turn
+UNCERTAIN_LOW = 0.25
+UNCERTAIN_HIGH = 0.75
+
+# Block Blast keeps the combo alive as long as a line is cleared within 3 placements
+COMBO_WINDOW = 3
+
+def shape_key(shape):
+    """A parsed or planned shape as a comparable tuple of (r, c) cells."""
+    return tuple(sorted((int(r), int(c)) for r, c in shape or ()))
+
+class GameSession:
+    """
+    Carries the game state across turns.
+    Once a plan is handed out, the boards after each of its moves are fully
+    predictable (place_shape + clear_lines), so the next frame only needs a few
+    pixels sampled per cell and the spawn tray compared with the plan. A full
+    parse_board only runs when either disagrees.
+    Also tracks the combo streak so solve() gets the real current_game_combo.
+    """
+    def __init__(self, solver=None):
+        self.solver = solver or BlockBlastBalancedSolver()
+        self.board = None           # last verified board
+        self.combo = 0
+        self.moves_since_clear = 0
+        self.predictions = []       # [(board, combo, moves_since_clear)] after each planned move
+        self.plan = []              # the plan those predictions are for
+        self.tray = []              # shape_key() of each slot when it was planned
+        self.uncertain = set()
+        self.stats = {'verified': 0, 'full_parses': 0, 'mismatches': 0}
+
+    def reset(self):
+        self.board = None
+        self.combo = 0
+        self.moves_since_clear = 0
+        self.predictions = []
+        self.plan = []
+        self.tray = []
+        self.uncertain = set()
+
+    def match(self, fits):
+        """
+        Latest step of the plan whose predicted board `fits(step, board)`;
+        step -1 is the board before the plan. None if none of them fits.
+        """
+        for step in reversed(range(-1, len(self.predictions))):
+            expected = self.board if step == -1 else self.predictions[step][0]
+            if fits(step, expected):
+                return step
+        return None
+
+    def settle(self, step):
+        """
+        Applies a match() result: -1 keeps the plan pending, a step adopts that
+        board and its combo, None (someone played something else, or a piece
+        is mid-drag) means the streak can't be trusted.
+        """
+        if step is None:
+            self.stats['mismatches'] += 1
+            self.combo = 0
+            self.moves_since_clear = 0
+        elif step >= 0:
+            self.board, self.combo, self.moves_since_clear = self.predictions[step]
+            self.predictions = []
+            self.stats['verified'] += 1
+            tracing.count('board_verified')
+
+    @tracing.traced('verify')
+    def verify(self, image):
+        """
+        Checks the frame against the predicted boards (latest move first).
+        The cells the plan changes (plus the uncertain ones) pick the step; the
+        step's whole board must then agree too, so a block that landed
+        somewhere unplanned is caught. Returns the match() step.
+        """
+        theme = vision.detect_theme(image)
+        size = self.board.shape[0]
+        filled = (vision.sample_cells(image, [(r, c) for r in range(size) for c in range(size)], theme)
+                  > 0.5).reshape(self.board.shape)
+        # Cells that differ anywhere along the plan tell the steps apart
+        first_changed = self.predictions[0][0] != self.board
+        uncertain = np.zeros_like(first_changed)
+        for r, c in self.uncertain:
+            uncertain[r, c] = True
+
+        def fits(step, expected):
+            cells = first_changed | uncertain
+            if step >= 0:
+                cells = cells | (expected != self.board)
+            return np.array_equal(filled[cells], expected[cells] == 1)
+
+        step = self.match(fits)
+        if step is not None:
+            expected = self.board if step == -1 else self.predictions[step][0]
+            if not np.array_equal(filled, expected == 1):
+                return None
+        return step
+
+    def tray_fits(self, step, shapes):
+        """
+        Whether the spawn slots agree with match() step `step`: the pieces the
+        plan placed up to it are gone, the others are still there (-1: nothing
+        changed). Once every piece is placed the game deals new ones, so any
+        tray fits.
+        """
+        used = {shape_idx for shape_idx, _, _ in self.plan[:step + 1]}
+        if all(i in used or not shape for i, shape in enumerate(self.tray)):
+            return True
+        expected = [() if i in used else shape for i, shape in enumerate(self.tray)]
+        return [shape_key(s) for s in shapes] == expected
+
+    def observe(self, image, executor):
+        """
+        Board and shapes for a new frame.
+        Verifies the predicted board by sampling, falls back to a full parse.
+        """
+        if self.board is not None and self.predictions:
+            step = self.verify(image)
+            if step is not None:
+                shapes_data = executor.parse_shapes(image)
+                if not self.tray_fits(step, [sd[0] for sd in shapes_data]):
+                    print("Spawn tray does not match the prediction.")
+                    step = None
+            self.settle(step)
+            if step == -1:
+                print("Board unchanged, plan still pending.")
+                return self.board.copy(), shapes_data
+            if step is not None:
+                print(f"Board verified after move {step + 1} (combo {self.combo})")
+                return self.board.copy(), shapes_data
+            print("Board does not match the prediction, full parse.")
+
+        board, shapes_data = executor.parse(image)
+        self.stats['full_parses'] += 1
+        tracing.count('full_parse')
+        self.board = board.copy()
+        self.predictions = []
+        fill = vision.CELL_FILL
+        self.uncertain = set(zip(*np.nonzero((fill > UNCERTAIN_LOW) & (fill < UNCERTAIN_HIGH))))
+        return board, shapes_data
+
+    def sync(self, board, shapes=None):
+        """
+        Adopts a board that was parsed elsewhere (e.g. in a worker process).
+        Keeps the combo streak if it is one of the predicted boards (and, given
+        the parsed `shapes`, the spawn tray agrees), like observe().
+        """
+        if self.board is not None and self.predictions:
+            step = self.match(lambda step, expected: np.array_equal(board, expected))
+            if step is not None and shapes is not None and not self.tray_fits(step, shapes):
+                step = None
+            self.settle(step)
+        self.stats['full_parses'] += 1
+        self.board = board.copy()
+        self.predictions = []
+        return self.combo
+
+    @tracing.traced('solve')
+    def solve(self, board, shapes):
+        plan = self.solver.solve(board, shapes, self.combo)
+        tracing.count('solver_nodes', self.solver.nodes)
+        return plan
+
+    def expect(self, plan, shapes):
+        """Records the plan that is about to be played: predicts the board after each move."""
+        if self.board is None:
+            return
+        board = self.board
+        combo, since_clear = self.combo, self.moves_since_clear
+        self.predictions = []
+        self.plan = list(plan)
+        self.tray = [shape_key(s) for s in shapes]
+        for shape_idx, r, c in plan:
+            board = self.solver.place_shape(board, shapes[shape_idx], r, c)
+            board, cleared = self.solver.clear_lines(board)
+            if cleared:
+                combo += 1
+                since_clear = 0
+            else:
+                since_clear += 1
+                if since_clear >= COMBO_WINDOW:
+                    combo = 0
+            self.predictions.append((board, combo, since_clear))
@@ -0,0 +1,354 @@
+import argparse
+import asyncio
+import collections
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from solver import BlockBlastBalancedSolver, board_bits
+
+# Wire format, little endian, fixed size both ways (clients may pipeline):
+#   request   '<IQIIIB'   id, board bits (bit r*8+c), 3 shape masks, combo
+#   response  '<IBBIff9B' id, move count, cached, solver nodes,
+#                         queue ms, solve ms, 3 x (slot, row, col)
+# A shape mask is the shape's cells inside a 5x5 box, bit r*5+c (0 = empty slot).
+
+REQUEST = struct.Struct('<IQIIIB')
+RESPONSE = struct.Struct('<IBBIff9B')
+SHAPE_BOX = 5
+DEFAULT_PORT = 9110
+DEFAULT_MAX_BATCH = 64
+SOLVE_MS = 40           # slowest beam solve seen here ~22ms (median ~11ms), with room for slower hosts
+CONNECT_TIMEOUT = 1.0   # a server that is down is noticed this fast
+
+def shape_mask(shape):
+    """5x5 bitmask of a shape, or None if it does not fit the box."""
+    mask = 0
+    for r, c in shape:
+        if not (0 <= r < SHAPE_BOX and 0 <= c < SHAPE_BOX):
+            return None
+        mask |= 1 << (r * SHAPE_BOX + c)
+    return mask
+
+def mask_shape(mask):
+    """Back to a row-major cell list, the order vision.parse_slot produces."""
+    return [(i // SHAPE_BOX, i % SHAPE_BOX) for i in range(SHAPE_BOX * SHAPE_BOX) if mask >> i & 1]
+
+def bits_board(bits, grid_size=8):
+    cells = [(bits >> i) & 1 for i in range(grid_size * grid_size)]
+    return np.array(cells, dtype=int).reshape(grid_size, grid_size)
+
+def parse_address(address):
+    """'host:port' or 'host' -> (host, port)."""
+    host, _, port = address.rpartition(':')
+    if not host:
+        return address, DEFAULT_PORT
+    return host, int(port)
+
+def batch_timeout(workers=4, max_batch=DEFAULT_MAX_BATCH, solve_ms=SOLVE_MS):
+    """
+    Worst-case seconds for one request: it can arrive just after a full batch
+    was dispatched, wait for it, and then sit in a full batch of its own.
+    """
+    per_worker = -(-max_batch // max(1, workers))
+    return 2 * per_worker * solve_ms / 1000
+
+def parse_server(spec):
+    """
+    BOT_SOLVE_SERVER value -> (host, port, timeout).
+    'host:port' uses batch_timeout() for a 4-worker server; options after '?':
+    'host:port?workers=2' derives it for that pool size, 'host:port?timeout=3'
+    sets it in seconds.
+    """
+    address, _, query = spec.partition('?')
+    options = dict(item.split('=', 1) for item in query.split('&') if item)
+    unknown = set(options) - {'timeout', 'workers'}
+    if unknown:
+        raise ValueError(f"Unknown solve server option(s): {', '.join(sorted(unknown))}")
+    if 'timeout' in options:
+        timeout = float(options['timeout'])
+    else:
+        timeout = batch_timeout(int(options.get('workers', 4)))
+    return (*parse_address(address), timeout)
+
+# --- Worker side (one solver per process) ---
+
+solver = None
+
+def init_worker():
+    global solver
+    solver = BlockBlastBalancedSolver()
+
+def solve_many(keys):
+    """
+    [(bits, masks, combo)] -> [(plan, nodes, solve ms)], all in one
+    solver.solve_many call; solve ms is each position's share of it.
+    """
+    t0 = time.perf_counter()
+    plans = solver.solve_many([(bits_board(bits), [mask_shape(m) for m in masks], combo)
+                               for bits, masks, combo in keys])
+    share_ms = (time.perf_counter() - t0) * 1000 / max(1, len(keys))
+    return [(plan, nodes, share_ms) for plan, nodes in zip(plans, solver.nodes_each)]
+
+# --- Server ---
+
+class SolveServer:
+    """
+    asyncio TCP server in front of a pool of solver processes.
+    Requests from every connection go into one queue. While a batch is being
+    solved the next one piles up, and it is taken as a whole when the pool
+    frees up (up to max_batch, after waiting at most window_ms for company).
+    A batch is de-duplicated, checked against the shared LRU cache, and the
+    misses are split evenly over the workers.
+    workers=0 solves on a thread in this process (tests, small hosts).
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, workers=None, window_ms=2.0,
+                 max_batch=DEFAULT_MAX_BATCH, cache_size=4096):
+        self.host = host
+        self.port = port
+        self.workers = os.cpu_count() if workers is None else workers
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()   # (bits, masks, combo) -> (plan, nodes, solve ms)
+        self.queue = None
+        self.pool = None
+        self.server = None
+        self.stats = {'requests': 0, 'batches': 0, 'solved': 0, 'cache_hits': 0,
+                      'duplicates': 0, 'connections': 0, 'largest_batch': 0}
+
+    async def start(self):
+        if self.workers:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker)
+        else:
+            init_worker()
+            self.pool = ThreadPoolExecutor(1, thread_name_prefix='solve')
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.ensure_future(self._batch_loop())
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"Solve server on {self.host}:{self.port} ({self.workers or 'in-process'} workers)")
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+        self.pool.shutdown(wait=False)
+
+    async def _handle(self, reader, writer):
+        self.stats['connections'] += 1
+        loop = asyncio.get_running_loop()
+        pending = set()
+        try:
+            while True:
+                data = await reader.readexactly(REQUEST.size)
+                req_id, bits, m0, m1, m2, combo = REQUEST.unpack(data)
+                future = loop.create_future()
+                self.stats['requests'] += 1
+                await self.queue.put(((bits, (m0, m1, m2), combo), time.perf_counter(), future))
+                # Answer in completion order; the id tells the client which request it was
+                task = asyncio.ensure_future(self._respond(writer, req_id, future))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+
+    async def _respond(self, writer, req_id, future):
+        try:
+            plan, nodes, cached, queue_ms, solve_ms = await future
+        except Exception as e:
+            # The client sees the connection drop and falls back to solving locally
+            print(f"Solve failed: {e}")
+            writer.close()
+            return
+        moves = [v for move in plan for v in move] + [0] * (9 - 3 * len(plan))
+        writer.write(RESPONSE.pack(req_id, len(plan), cached, nodes, queue_ms, solve_ms, *moves))
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                if self.queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+            await self._solve_batch(batch)
+
+    async def _solve_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        self.stats['batches'] += 1
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+        dispatched = time.perf_counter()
+
+        waiting = collections.defaultdict(list)   # key -> [(arrival, future)]
+        for key, arrived, future in batch:
+            hit = self.cache.get(key)
+            if hit is not None:
+                self.cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                plan, nodes, _ = hit
+                future.set_result((plan, nodes, 1, (dispatched - arrived) * 1000, 0.0))
+            else:
+                if key in waiting:
+                    self.stats['duplicates'] += 1
+                waiting[key].append((arrived, future))
+        if not waiting:
+            return
+
+        keys = list(waiting)
+        chunks = [keys[i::max(1, self.workers)] for i in range(max(1, self.workers))]
+        chunks = [c for c in chunks if c]
+        try:
+            results = await asyncio.gather(*(loop.run_in_executor(self.pool, solve_many, c) for c in chunks))
+        except Exception as e:
+            for futures in waiting.values():
+                for _, future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for chunk, chunk_results in zip(chunks, results):
+            for key, (plan, nodes, solve_ms) in zip(chunk, chunk_results):
+                plan = [tuple(move) for move in plan]
+                self.stats['solved'] += 1
+                self.cache[key] = (plan, nodes, solve_ms)
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+                for arrived, future in waiting[key]:
+                    if not future.done():
+                        future.set_result((plan, nodes, 0, (dispatched - arrived) * 1000, solve_ms))
+
+# --- Client side ---
+
+class SolveClient:
+    """
+    Blocking client for one connection, safe to share between threads.
+    solve() returns (plan, info) with info = nodes, cached, queue/solve/round-trip ms.
+    Raises OSError if the server is unreachable or too slow; `timeout` covers a
+    whole batch on the server (see batch_timeout), connecting gets CONNECT_TIMEOUT.
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=None):
+        self.host = host
+        self.port = port
+        self.timeout = batch_timeout() if timeout is None else timeout
+        self.sock = None
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=min(CONNECT_TIMEOUT, self.timeout))
+        self.sock.settimeout(self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def _recv(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("solve server closed the connection")
+            data += chunk
+        return data
+
+    def solve(self, bits, masks, combo=0):
+        with self.lock:
+            t0 = time.perf_counter()
+            try:
+                if self.sock is None:
+                    self.connect()
+                self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+                self.sock.sendall(REQUEST.pack(self.next_id, bits, *masks, min(combo, 255)))
+                fields = RESPONSE.unpack(self._recv(RESPONSE.size))
+            except OSError:
+                self.close()
+                raise
+            req_id, count, cached, nodes, queue_ms, solve_ms = fields[:6]
+            if req_id != self.next_id:
+                self.close()
+                raise ConnectionError("solve server answered out of turn")
+            moves = fields[6:]
+            plan = [tuple(moves[3 * i:3 * i + 3]) for i in range(count)]
+            info = {'nodes': nodes, 'cached': bool(cached), 'queue_ms': queue_ms, 'solve_ms': solve_ms,
+                    'round_trip_ms': (time.perf_counter() - t0) * 1000}
+            return plan, info
+
+class RemoteSolver(BlockBlastBalancedSolver):
+    """
+    Drop-in solver (GameSession(solver=RemoteSolver('host:port'))) that asks a
+    SolveServer and solves locally when it cannot: server down or slow, or a
+    shape that does not fit the wire format. After a failure the server is
+    left alone for retry_after seconds.
+    `address` takes the BOT_SOLVE_SERVER options (see parse_server); an
+    explicit `timeout` wins over them.
+    """
+    def __init__(self, address, timeout=None, retry_after=30.0, grid_size=8):
+        super().__init__(grid_size)
+        host, port, spec_timeout = parse_server(address)
+        self.client = SolveClient(host, port, timeout=spec_timeout if timeout is None else timeout)
+        self.retry_after = retry_after
+        self.down_until = 0.0
+        self.last_info = None
+
+    def solve(self, board, shapes, current_game_combo=0):
+        masks = [shape_mask(s) for s in shapes]
+        if time.time() >= self.down_until and None not in masks and len(masks) == 3:
+            try:
+                plan, self.last_info = self.client.solve(board_bits(board), masks, current_game_combo)
+                self.nodes = self.last_info['nodes']
+                return plan
+            except OSError as e:
+                print(f"Solve server unavailable ({e}), solving locally.")
+                self.down_until = time.time() + self.retry_after
+        self.last_info = None
+        return super().solve(board, shapes, current_game_combo)
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared solve server for several bots")
+    parser.add_argument('--host', default='127.0.0.1', help="0.0.0.0 to accept phones on the LAN")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="solver processes (0 = in-process)")
+    parser.add_argument('--window-ms', type=float, default=2.0, help="how long a batch waits to fill up")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--cache-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    async def run():
+        server = await SolveServer(args.host, args.port, args.workers, args.window_ms,
+                                   args.max_batch, args.cache_size).start()
+        timeout = batch_timeout(server.workers or 1, args.max_batch)
+        print(f"Clients: BOT_SOLVE_SERVER=<this host>:{server.port}?timeout={timeout:.1f}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            print(server.stats)
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
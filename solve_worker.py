@@ -0,0 +1,104 @@
+import threading
+import traceback
+
+class Job:
+    """
+    One unit of work for SolveWorker. fn(job) gets the job itself so it can
+    look at job.cancelled between stages and bail out early.
+    """
+    def __init__(self, fn, on_done, on_error=None):
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+
+class SolveWorker:
+    """
+    A single background thread with a single-slot queue.
+    submit() replaces a job that has not started yet and cancels the one that
+    is running, so only the newest request ever reaches the UI: a job that was
+    superseded has its result dropped.
+    Callbacks go through `post`, which hands them to the UI side
+    (Clock.schedule_once in the app, a direct call in tests).
+    Plain Python, no Android or Kivy imports.
+    """
+    def __init__(self, post=None):
+        self.post = post or (lambda fn: fn())
+        self.cond = threading.Condition()
+        self.pending = None
+        self.current = None
+        self.running = False
+        self.thread = None
+        self.stats = {'submitted': 0, 'superseded': 0, 'completed': 0, 'dropped': 0, 'failed': 0}
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return self
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name='solve-worker', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cancel_locked()
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def submit(self, fn, on_done, on_error=None):
+        """Queues fn; any older job (waiting or running) is superseded."""
+        job = Job(fn, on_done, on_error)
+        with self.cond:
+            self.cancel_locked()
+            self.pending = job
+            self.stats['submitted'] += 1
+            self.cond.notify()
+        return job
+
+    def cancel(self):
+        with self.cond:
+            self.cancel_locked()
+
+    def cancel_locked(self):
+        for job in (self.pending, self.current):
+            if job is not None and not job.cancelled:
+                job.cancelled = True
+                self.stats['superseded'] += 1
+        self.pending = None
+
+    def busy(self):
+        with self.cond:
+            return self.pending is not None or self.current is not None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending is not None or not self.running)
+                if not self.running:
+                    return
+                job, self.pending = self.pending, None
+                self.current = job
+
+            try:
+                result = job.fn(job)
+                error = None
+            except Exception as e:
+                traceback.print_exc()
+                result, error = None, e
+
+            with self.cond:
+                self.current = None
+                if job.cancelled:
+                    self.stats['dropped'] += 1
+                    continue
+                self.stats['failed' if error else 'completed'] += 1
+
+            # Bind now: post may run the callback after the next job started
+            if error is None:
+                self.post(lambda job=job, result=result: job.on_done(result))
+            elif job.on_error:
+                self.post(lambda job=job, error=error: job.on_error(error))
@@ -47,9 +47,117 @@ ALL_POSSIBLE_SHAPES = [
     [(0, 2), (1, 2), (2, 0), (2, 1), (2, 2)],
 ]
 
+# Bitboard core: a board is one integer, bit r*grid+c. The survival tables,
+# the MCTS backend (mcts.py) and the rollout engine (rollout.py) all build on these.
+PLACEMENTS = {}       # (shape, grid_size) -> [(mask, r, c)]
+LINE_MASKS = {}       # grid_size -> [row masks..., column masks...]
+SURVIVAL_TABLES = {}  # grid_size -> build_tables()
+
+def placements(shape, grid_size=8):
+    """Every in-bounds position of a shape as (placement mask, r, c), row by row."""
+    key = (shape if isinstance(shape, tuple) else tuple(map(tuple, shape)), grid_size)
+    table = PLACEMENTS.get(key)
+    if table is None:
+        h = max(p[0] for p in shape) + 1
+        w = max(p[1] for p in shape) + 1
+        table = [(sum(1 << ((r + dr) * grid_size + c + dc) for dr, dc in shape), r, c)
+                 for r in range(grid_size - h + 1) for c in range(grid_size - w + 1)]
+        PLACEMENTS[key] = table
+    return table
+
+def line_masks(grid_size=8):
+    masks = LINE_MASKS.get(grid_size)
+    if masks is None:
+        rows = [((1 << grid_size) - 1) << (grid_size * r) for r in range(grid_size)]
+        cols = [sum(1 << (grid_size * r + c) for r in range(grid_size)) for c in range(grid_size)]
+        masks = LINE_MASKS[grid_size] = rows + cols
+    return masks
+
+def clear_bits(bits, grid_size=8):
+    """clear_lines for a bitboard: (bits without its full rows/columns, lines cleared)."""
+    full = 0
+    lines = 0
+    for mask in line_masks(grid_size):
+        if bits & mask == mask:
+            full |= mask
+            lines += 1
+    return bits & ~full, lines
+
+def count_holes(bits, grid_size=8):
+    """Empty cells closed in on all four sides (the wall counts as filled), as in calculate_metrics."""
+    lines = line_masks(grid_size)
+    empty = ((1 << grid_size * grid_size) - 1) & ~bits
+    # Cells with an empty neighbour to the left, right, above or below
+    open_cells = (((empty << 1) & ~lines[grid_size]) | ((empty >> 1) & ~lines[-1])
+                  | (empty << grid_size) | (empty >> grid_size))
+    return bin(empty & ~open_cells).count('1')
+
+def shape_penalty(shape):
+    size = len(shape)
+    if size >= 9: # 3x3 shapes
+        return 5000 # كارثة
+    elif size >= 5: # 1x5 shapes
+        return 2000 # خطر جدا
+    return 100
+
+def build_tables(grid_size=8):
+    """[(penalty, [placement masks])] for ALL_POSSIBLE_SHAPES on a grid_size board."""
+    if grid_size in SURVIVAL_TABLES:
+        return SURVIVAL_TABLES[grid_size]
+    table = [(shape_penalty(shape), [mask for mask, _, _ in placements(shape, grid_size)])
+             for shape in ALL_POSSIBLE_SHAPES]
+    SURVIVAL_TABLES[grid_size] = table
+    return table
+
+def missed_penalty(bits, table):
+    """Summed penalty of the table's shapes that fit nowhere on the bitboard."""
+    missed = 0
+    for penalty, masks in table:
+        # بحث سريع عن أول مكان فاضي للشكل
+        for mask in masks:
+            if not bits & mask:
+                break
+        else:
+            # لو الشكل ده مش هينفع يتحط لو جالنا الدور الجاي -> خصم
+            missed += penalty
+    return missed
+
+def board_bits(board: np.ndarray) -> int:
+    """The filled cells as one integer, bit r*grid+c."""
+    packed = np.packbits((board == 1).ravel(), bitorder='little')
+    return int.from_bytes(packed.tobytes(), 'little')
+
+# Re-ranking of the final beam by simulated survival (rollout_games > 0)
+ROLLOUT_TURNS = 3
+ROLLOUT_WEIGHT = 5000   # score of surviving ROLLOUT_TURNS more turns for sure vs. never
+
 class BlockBlastBalancedSolver:
-    def __init__(self, grid_size=8):
+    def __init__(self, grid_size=8, rollout_games=0, rollout_seed=0):
         self.grid_size = grid_size
+        self.survival_table = build_tables(grid_size)
+        self.nodes = 0   # boards evaluated by the last solve()
+        self.rollout_games = rollout_games
+        self.rollout_seed = rollout_seed
+        self.rollouts = None
+
+    def settings(self):
+        """make_solver() backend name and keyword arguments that rebuild this solver."""
+        return {'backend': 'rollout' if self.rollout_games else 'beam',
+                'rollout_games': self.rollout_games, 'rollout_seed': self.rollout_seed}
+
+    def survival_probability(self, boards, turns=ROLLOUT_TURNS, games=128):
+        """
+        Chance that each board survives `turns` turns of random pieces, from
+        lockstep playouts (rollout.RolloutEngine). boards: list of 8x8 arrays.
+        The playouts are seeded from rollout_seed and the boards themselves, so
+        the same position always gets the same estimate (replays, batch runs).
+        """
+        if self.rollouts is None:
+            from rollout import RolloutEngine
+            self.rollouts = RolloutEngine(ALL_POSSIBLE_SHAPES)
+        keys = [board_bits(b) for b in boards]
+        self.rollouts.rng = np.random.default_rng([self.rollout_seed, turns, games] + keys)
+        return self.rollouts.survival(np.array(keys, dtype=np.uint64), turns, games)
 
     def can_place(self, board: np.ndarray, shape: List[Tuple[int, int]], r: int, c: int) -> bool:
         # فحص سريع للحدود بناء على أبعد نقطة في الشكل
@@ -81,7 +189,6 @@ class BlockBlastBalancedSolver:
         return new_board, cleared
 
     def calculate_metrics(self, board: np.ndarray) -> dict:
-        holes = 0
         roughness = 0
         peaks = []
         
@@ -99,14 +206,7 @@ class BlockBlastBalancedSolver:
             roughness += abs(peaks[i] - peaks[i+1])
             
         # 2. Holes (الثقوب المحاطة بـ 4 جهات)
-        padded = np.pad(board, 1, constant_values=1)
-        for r in range(self.grid_size):
-            for c in range(self.grid_size):
-                if board[r, c] == 0:
-                    neighbors = (padded[r, c+1] + padded[r+2, c+1] + 
-                                 padded[r+1, c] + padded[r+1, c+2])
-                    if neighbors == 4:
-                        holes += 1
+        holes = count_holes(board_bits(board), self.grid_size)
                         
         blocked_edges = (np.sum(board[0, :]) + np.sum(board[-1, :]) + 
                          np.sum(board[:, 0]) + np.sum(board[:, -1]))
@@ -119,38 +219,7 @@ class BlockBlastBalancedSolver:
         بنجرب الـ 40 شكل كلهم، وبنشوف كام واحد منهم ينفع يتحط على البورد الحالي.
         لو فيه أشكال خطيرة (زي 3x3) مش هينفع تتحط، بنخصم نقط كتير.
         """
-        dangerous_shapes_missed = 0
-        
-        for shape in ALL_POSSIBLE_SHAPES:
-            can_fit = False
-            # بنجرب نحط الشكل في أي مكان
-            s_rows = [p[0] for p in shape]
-            s_cols = [p[1] for p in shape]
-            h = max(s_rows) + 1
-            w = max(s_cols) + 1
-            size = len(shape)
-            
-            # بحث سريع عن أول مكان فاضي للشكل
-            for r in range(self.grid_size - h + 1):
-                for c in range(self.grid_size - w + 1):
-                    valid = True
-                    for dr, dc in shape:
-                        if board[r+dr, c+dc] == 1:
-                            valid = False; break
-                    if valid:
-                        can_fit = True; break
-                if can_fit: break
-            
-            if not can_fit:
-                # لو الشكل ده مش هينفع يتحط لو جالنا الدور الجاي -> خصم
-                if size >= 9: # 3x3 shapes
-                    dangerous_shapes_missed += 5000 # كارثة
-                elif size >= 5: # 1x5 shapes
-                    dangerous_shapes_missed += 2000 # خطر جدا
-                else:
-                    dangerous_shapes_missed += 100
-                    
-        return -dangerous_shapes_missed
+        return -missed_penalty(board_bits(board), self.survival_table)
 
     def calculate_combo_setup_score(self, board: np.ndarray) -> float:
         """
@@ -207,6 +276,40 @@ class BlockBlastBalancedSolver:
 
         return score
 
+    def evaluate_boards(self, boards, lines_cleared, combo_secured, streaks):
+        """
+        evaluate_board for a batch of candidates (a beam step, of one or of
+        several positions): the grid terms as array operations over the batch,
+        holes and survival on the bitboards. Same scores as evaluate_board; a
+        subclass that only overrides evaluate_board still gets it called.
+        """
+        if type(self).evaluate_board is not BlockBlastBalancedSolver.evaluate_board:
+            return [self.evaluate_board(b, lines, secured, streak)
+                    for b, lines, secured, streak in zip(boards, lines_cleared, combo_secured, streaks)]
+        filled = np.asarray(boards) == 1                  # N x rows x cols
+        n = self.grid_size
+        heights = np.where(filled.any(axis=1), n - filled.argmax(axis=1), 0)
+        roughness = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+        packed = np.packbits(filled.reshape(len(filled), -1), axis=1, bitorder='little')
+        bits = [int.from_bytes(row.tobytes(), 'little') for row in packed]
+        holes = np.array([count_holes(b, n) for b in bits])
+        missed = np.array([missed_penalty(b, self.survival_table) for b in bits])
+        rows, cols = filled.sum(axis=2), filled.sum(axis=1)
+        setup = (np.where(rows == 6, 50, 0) + np.where(rows == 7, 150, 0)).sum(axis=1) + \
+                (np.where(cols == 6, 50, 0) + np.where(cols == 7, 150, 0)).sum(axis=1)
+        lines = np.asarray(lines_cleared)
+        secured = np.asarray(combo_secured, bool)
+        bonus = np.where(lines > 0, (np.asarray(streaks) + 1) * 8000, 0) * np.where(secured, 1, 2)
+
+        # Same terms, in the same order, as evaluate_board
+        score = np.zeros(len(filled))
+        score -= holes * 600
+        score -= roughness * 40
+        score -= missed
+        score += np.where(~secured & (lines == 0), 500, setup)
+        score += bonus
+        return score.tolist()
+
     def get_valid_moves(self, board, shape):
         moves = []
         s_rows = [p[0] for p in shape]
@@ -221,81 +324,138 @@ class BlockBlastBalancedSolver:
         return moves
 
     def solve(self, board: np.ndarray, shapes: List[List[Tuple[int, int]]], current_game_combo: int = 0) -> List[Tuple[int, int, int]]:
-        
-        valid_indices = [i for i, s in enumerate(shapes) if s]
-        if not valid_indices: return []
+        return self.solve_many([(board, shapes, current_game_combo)])[0]
 
-        # (Score, Counter, Bytes, Board, Path, Remaining, Streak, Secured)
-        initial_secured = False 
-        initial_state = (0.0, 0, board.tobytes(), board, [], valid_indices.copy(), current_game_combo, initial_secured)
-        
-        beam = [initial_state]
+    def solve_many(self, positions):
+        """
+        solve() for several (board, shapes, combo) positions at once, e.g. a
+        solve server's batch: their beams advance in lockstep, and each step's
+        candidates of all positions are scored in one evaluate_boards call.
+        Returns one plan per position; self.nodes is the total,
+        self.nodes_each the boards evaluated per position.
+        """
         beam_width = 20 # رقم متوازن بين السرعة والذكاء
-        heap_counter = 0
-        
-        for step in range(len(valid_indices)):
-            candidates = []
-            
-            for neg_score, _, _, current_board, path, remaining_indices, streak, secured in beam:
-                
-                if not remaining_indices:
-                    # وصلنا للنهاية
-                    heapq.heappush(candidates, (neg_score, heap_counter, b'', current_board, path, [], streak, secured))
-                    heap_counter += 1
+        searches = []
+        for board, shapes, current_game_combo in positions:
+            valid_indices = [i for i, s in enumerate(shapes) if s]
+            # (Score, Counter, Bytes, Board, Path, Remaining, Streak, Secured)
+            initial_secured = False
+            initial_state = (0.0, 0, board.tobytes(), board, [], valid_indices.copy(), current_game_combo, initial_secured)
+            searches.append({'shapes': shapes, 'steps': len(valid_indices),
+                             'beam': [initial_state] if valid_indices else [], 'counter': 0, 'nodes': 0})
+
+        for step in range(max((s['steps'] for s in searches), default=0)):
+            pending = []
+            for k, search in enumerate(searches):
+                if step >= search['steps'] or not search['beam']:
                     continue
-                
-                for i in remaining_indices:
-                    shape = shapes[i]
-                    valid_moves = self.get_valid_moves(current_board, shape)
-                    if not valid_moves: continue
-                    
-                    # Optimization: لو الحركات كتيرة، نختار أفضل 8 مبدئياً عشان السرعة
-                    if len(valid_moves) > 8:
-                        move_priority = []
+                shapes = search['shapes']
+                search['candidates'] = candidates = []
+
+                for neg_score, _, _, current_board, path, remaining_indices, streak, secured in search['beam']:
+
+                    if not remaining_indices:
+                        # وصلنا للنهاية
+                        heapq.heappush(candidates, (neg_score, search['counter'], b'', current_board, path, [], streak, secured))
+                        search['counter'] += 1
+                        continue
+
+                    for i in remaining_indices:
+                        shape = shapes[i]
+                        valid_moves = self.get_valid_moves(current_board, shape)
+                        if not valid_moves: continue
+
+                        # Optimization: لو الحركات كتيرة، نختار أفضل 8 مبدئياً عشان السرعة
+                        if len(valid_moves) > 8:
+                            move_priority = []
+                            temp_boards = np.array([self.place_shape(current_board, shape, r, c) for r, c in valid_moves]) == 1
+                            move_clears = temp_boards.all(axis=2).any(axis=1) | temp_boards.all(axis=1).any(axis=1)
+                            for (r, c), clears in zip(valid_moves, move_clears):
+                                # نفضل الأطراف ونسيب النص فاضي للأشكال الكبيرة
+                                dist_from_center = abs(r-3.5) + abs(c-3.5)
+
+                                # إلا لو الحركة بتعمل Clear ومحتاجين نأمن الكومبو
+                                prio = 1000 if (clears and not secured) else (dist_from_center * 10)
+                                move_priority.append((prio, r, c))
+
+                            move_priority.sort(reverse=True)
+                            valid_moves = [(r, c) for _, r, c in move_priority[:8]]
+
                         for r, c in valid_moves:
-                            # نفضل الأطراف ونسيب النص فاضي للأشكال الكبيرة
-                            dist_from_center = abs(r-3.5) + abs(c-3.5)
-                            
-                            # إلا لو الحركة بتعمل Clear ومحتاجين نأمن الكومبو
-                            temp_board = self.place_shape(current_board, shape, r, c)
-                            clears = np.any(np.all(temp_board == 1, axis=1)) or np.any(np.all(temp_board == 1, axis=0))
-                            
-                            prio = 1000 if (clears and not secured) else (dist_from_center * 10)
-                            move_priority.append((prio, r, c))
-                        
-                        move_priority.sort(reverse=True)
-                        valid_moves = [(r, c) for _, r, c in move_priority[:8]]
+                            next_board = self.place_shape(current_board, shape, r, c)
+                            new_path = path + [(i, r, c)]
+                            new_remaining = [idx for idx in remaining_indices if idx != i]
 
-                    for r, c in valid_moves:
-                        next_board = self.place_shape(current_board, shape, r, c)
-                        final_board, cleared = self.clear_lines(next_board)
-                        
-                        new_streak = streak + 1 if cleared > 0 else 0
-                        new_secured = secured or (cleared > 0)
-                        
-                        move_score = self.evaluate_board(final_board, cleared, secured, streak) 
-                        new_total = -neg_score + move_score # (Note: score is positive is better, heap uses min so we verify sign logic)
-                        # Actually in beam search usually we want Max score. 
-                        # Python heapq is Min-Heap. So we store (-score).
-                        # New total needs to be accumulation? 
-                        # Correct logic: The beam stores (-accumulated_score).
-                        # Here evaluate_board returns a "goodness" value.
-                        # So we want to MAXIMIZE score.
-                        # Stored value should be -score.
-                        
-                        new_path = path + [(i, r, c)]
-                        new_remaining = [idx for idx in remaining_indices if idx != i]
-                        
-                        heapq.heappush(candidates, 
-                                     (-new_total, heap_counter, final_board.tobytes(), 
-                                      final_board, new_path, new_remaining, new_streak, new_secured))
-                        heap_counter += 1
-            
-            if not candidates: return []
-            beam = heapq.nsmallest(beam_width, candidates)
-            
-        if not beam: return []
-        return beam[0][4]
+                            # Cleared and scored below, this step's boards of every position at once
+                            pending.append((k, neg_score, search['counter'], next_board, new_path, new_remaining,
+                                            secured, streak))
+                            search['counter'] += 1
+
+            if pending:
+                # clear_lines for the whole step
+                placed = np.array([p[3] for p in pending])
+                full_rows = (placed == 1).all(axis=2)
+                full_cols = (placed == 1).all(axis=1)
+                cleared_lines = full_rows.sum(axis=1) + full_cols.sum(axis=1)
+                final_boards = np.where(full_rows[:, :, None] | full_cols[:, None, :], 0, placed)
+                scores = self.evaluate_boards(final_boards, cleared_lines,
+                                              [p[6] for p in pending], [p[7] for p in pending])
+                for (k, neg_score, counter, _, new_path, new_remaining, secured, streak), final_board, cleared, move_score \
+                        in zip(pending, final_boards, cleared_lines, scores):
+                    new_streak = streak + 1 if cleared > 0 else 0
+                    new_secured = secured or (cleared > 0)
+                    # Scores are "higher is better"; the heap is a min-heap, so it stores -total
+                    new_total = -neg_score + move_score
+                    searches[k]['nodes'] += 1
+                    heapq.heappush(searches[k]['candidates'],
+                                 (-new_total, counter, final_board.tobytes(),
+                                  final_board, new_path, new_remaining, new_streak, new_secured))
+
+            for search in searches:
+                if step < search['steps'] and search['beam']:
+                    # No candidates: some piece fits nowhere, no plan
+                    search['beam'] = heapq.nsmallest(beam_width, search['candidates'])
+
+        self.nodes_each = [s['nodes'] for s in searches]
+        self.nodes = sum(self.nodes_each)
+        plans = []
+        for search in searches:
+            beam = search['beam']
+            if not beam:
+                plans.append([])
+            elif self.rollout_games and len(beam) > 1:
+                # Final pick: add the simulated chance of surviving the next turns
+                survival = self.survival_probability([entry[3] for entry in beam], games=self.rollout_games)
+                best = max(range(len(beam)), key=lambda k: -beam[k][0] + ROLLOUT_WEIGHT * survival[k])
+                plans.append(beam[best][4])
+            else:
+                plans.append(beam[0][4])
+        return plans
+
+def make_solver(backend='beam', **settings):
+    """
+    Solver by name: 'beam' (BlockBlastBalancedSolver), 'rollout' (beam search
+    with the final beam re-ranked by simulated survival), 'mcts' (mcts.MCTSSolver)
+    or 'learned' (beam search scored by value_model.ValueModelSolver).
+    `settings` go to the constructor, e.g. a recorded solver.settings().
+    """
+    if backend == 'rollout':
+        settings.setdefault('rollout_games', 64)
+        return BlockBlastBalancedSolver(**settings)
+    if backend == 'mcts':
+        from mcts import MCTSSolver
+        return MCTSSolver(**settings)
+    if backend == 'learned':
+        from value_model import ValueModelSolver
+        try:
+            return ValueModelSolver(**settings)
+        except FileNotFoundError as e:
+            # e.g. a build that left value_weights.npz out: still play, with the hand-written value
+            print(f"{e}. Falling back to the beam search.")
+            return BlockBlastBalancedSolver()
+    if backend != 'beam':
+        raise ValueError(f"Unknown solver backend: {backend}")
+    return BlockBlastBalancedSolver(**settings)
 
 # Wrapper for compatibility
 def solve(board: np.ndarray, shapes: List[List[Tuple[int, int]]]) -> List[Tuple[int, int, int]]:
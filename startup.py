@@ -0,0 +1,73 @@
+import importlib.util
+import sys
+import threading
+import time
+
+# Import this first in an entry point: T0 is as close to launch as Python gets
+T0 = time.perf_counter()
+
+# name -> ms since T0, in the order they happened
+TIMINGS = {}
+
+def mark(name):
+    """Records the first time `name` happened (ms since launch)."""
+    if name not in TIMINGS:
+        TIMINGS[name] = (time.perf_counter() - T0) * 1000
+    return TIMINGS[name]
+
+def lazy_import(name):
+    """
+    Returns the module without executing it; the real import happens on the
+    first attribute access. Keeps cv2/numpy/solver off the launch path.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def warm_up(executor=None, solver=None):
+    """
+    Pays the cold costs before the first real solve: imports, color tables,
+    solver tables, then one parse of a blank frame and one solve of an empty board.
+    """
+    import numpy as np
+    import vision
+    import solver as solver_module
+    mark('warm_up_imports')
+
+    vision.build_color_luts()
+    solver_module.build_tables()
+    mark('warm_up_tables')
+
+    frame = np.full((2400, 1080, 3), 128, np.uint8)
+    if executor is not None:
+        executor.parse(frame)
+    else:
+        vision.parse_frame(frame)
+    mark('warm_up_parse')
+
+    solver = solver or solver_module.BlockBlastBalancedSolver()
+    solver.solve(np.zeros((8, 8), dtype=int), [[(0, 0), (0, 1)], [(0, 0), (1, 0)], [(0, 0), (0, 1), (1, 0)]])
+    mark('warm_up_solve')
+
+def in_background(fn, name='warm-up'):
+    """Runs fn on a daemon thread (errors are printed, not raised). Returns the thread."""
+    def run():
+        try:
+            fn()
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
+
+def report():
+    lines = ["Startup timings (ms since launch):"]
+    for name, ms in TIMINGS.items():
+        lines.append(f"  {name:<18}{ms:9.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import pytest
+from autoplay import AdbInputSession, AutoPlayer, drag_points
+from frame_source import AdbStreamFrameSource
+
+# AutoPlayer against fake_adb.py: its shell answers 'echo' and logs every
+# command, and each 'input swipe' advances the screenshot it serves.
+
+FAKE_ADB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_adb.py')
+
+def fake_adb(tmp_path, frames=None):
+    cmd = [sys.executable, FAKE_ADB, '--log', str(tmp_path / 'cmds.txt'), '--state', str(tmp_path / 'state')]
+    if frames:
+        cmd += ['--frames', str(frames)]
+    return cmd
+
+def test_sync_answers(tmp_path):
+    with AdbInputSession(fake_adb(tmp_path)) as session:
+        session.swipe(1, 2, 3, 4, duration_ms=10)
+        session.sync(timeout=5)
+    log = (tmp_path / 'cmds.txt').read_text().splitlines()
+    assert log == ["input swipe 1 2 3 4 10", "echo __done_1__", "exit"]
+
+def test_sync_times_out_on_hung_shell():
+    # A 'shell' that never answers and never closes its output
+    session = AdbInputSession([sys.executable, '-c', 'import time; time.sleep(30)'])
+    t0 = time.time()
+    with pytest.raises(TimeoutError):
+        session.sync(timeout=0.5)
+    assert time.time() - t0 < 2
+    session.close()
+
+def test_autoplayer_plays_plan(tmp_path):
+    # One distinct screen per move, so every drag shows up as a board change
+    frames = tmp_path / 'frames'
+    frames.mkdir()
+    for i, value in enumerate((40, 120, 200)):
+        cv2.imwrite(str(frames / f"{i}.png"), np.full((480, 216, 3), value, np.uint8))
+
+    shapes = [[(0, 0)], [(0, 0), (0, 1)], []]
+    bboxes = [(10, 400, 20, 20), (60, 400, 40, 20), None]
+    plan = [(0, 2, 3), (1, 5, 0)]
+    cmd = fake_adb(tmp_path, frames)
+    with AdbStreamFrameSource(cmd) as source:
+        player = AutoPlayer(source, AdbInputSession(cmd))
+        try:
+            last = player.play(plan, shapes, bboxes, first_frame=source.read(fresh=True))
+        finally:
+            player.close()
+
+    assert (tmp_path / 'state').read_text() == str(len(plan))
+    assert int(last[-1, 0, 0]) == 200
+    swipes = [line for line in (tmp_path / 'cmds.txt').read_text().splitlines() if line.startswith('input')]
+    expected = [drag_points(shapes[i], bboxes[i], r, c) for i, r, c in plan]
+    assert [tuple(map(int, line.split()[2:6])) for line in swipes] == expected
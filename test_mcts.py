@@ -0,0 +1,29 @@
+import numpy as np
+from mcts import MCTSSolver, Node
+from solver import board_bits
+
+SINGLE = ((0, 0),)
+SQUARE = tuple((r, c) for r in range(3) for c in range(3))
+
+def test_same_position_same_plan():
+    board = (np.random.default_rng(2).random((8, 8)) < 0.3).astype(int)
+    shapes = [[(0, 0)], [(0, 0), (0, 1)], [(0, 0), (1, 0), (1, 1)]]
+    plans = [MCTSSolver(iterations=300, time_limit=None).solve(board, shapes) for _ in range(2)]
+    solver = MCTSSolver(iterations=300, time_limit=None)
+    plans += solver.solve_many([(board, shapes, 0)] * 2)
+    assert plans[0] and all(plan == plans[0] for plan in plans)
+
+def test_best_plan_skips_dead_branch():
+    # Full board but for a 3x3 hole and one cell: the single block has to go in the corner
+    board = np.ones((8, 8), int)
+    board[:3, :3] = 0
+    board[7, 7] = 0
+    bits = board_bits(board)
+    root = Node(bits, (SINGLE, SQUARE, ()), (0, 1), 0, 0)
+    dead = Node(bits | 1, root.shapes, (1,), 0, 0, action=(0, 0, 0))
+    good = Node(bits | 1 << 63, root.shapes, (1,), 0, 0, action=(0, 7, 7))
+    dead.visits, good.visits = 10, 5
+    root.children = {dead.action: dead, good.action: good}
+    plan, nodes = MCTSSolver().best_plan(root)
+    assert plan == [(0, 7, 7), (1, 0, 0)]
+    assert not nodes[-1].remaining
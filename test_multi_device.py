@@ -0,0 +1,86 @@
+import asyncio
+import sys
+
+import cv2
+import numpy as np
+import pytest
+from multi_device import AdbDevice, FakeDevice, run_devices
+from session import GameSession
+
+# FakeDevice controllers on a one-process pool, with drawn phone screenshots
+
+SHAPES = [[(0, 0)], [(0, 0), (0, 1)], [(0, 0), (1, 0)]]
+FAST = {'settle_s': 0.0, 'retry_s': 0.0}
+
+def draw_frame(path, seed):
+    """Green-theme phone screenshot: a random board and SHAPES in the spawn row."""
+    rng = np.random.default_rng(seed)
+    img = np.full((2400, 1080, 3), (60, 110, 60), np.uint8)
+    board = rng.random((8, 8)) < 0.3
+    cell = 950 // 8
+    for r in range(8):
+        for c in range(8):
+            color = (60, 200, 240) if board[r, c] else (40, 70, 40)
+            x, y = 65 + c * cell, 584 + r * cell
+            cv2.rectangle(img, (x + 3, y + 3), (x + cell - 4, y + cell - 4), color, -1)
+    for i, shape in enumerate(SHAPES):
+        for dr, dc in shape:
+            x, y = i * 360 + 130 + dc * 50, 1700 + dr * 50
+            cv2.rectangle(img, (x, y), (x + 45, y + 45), (50, 200, 250), -1)
+    cv2.imwrite(str(path), img)
+    return str(path)
+
+class FlakyDevice(FakeDevice):
+    """A phone whose first screencap fails."""
+    def __init__(self, name, paths):
+        super().__init__(name, paths)
+        self.failed = False
+
+    async def capture(self):
+        if not self.failed:
+            self.failed = True
+            raise OSError("screencap failed")
+        return await super().capture()
+
+def test_fake_devices_play_until_frames_run_out(tmp_path):
+    devices = []
+    for d in range(2):
+        paths = [draw_frame(tmp_path / f"dev{d}_{i}.png", 10 * d + i) for i in range(2)]
+        devices.append(FakeDevice(f"fake{d}", paths))
+    profiles = {device.name: FAST for device in devices}
+    controllers = asyncio.run(run_devices(devices, workers=1, profiles=profiles))
+
+    for controller, device in zip(controllers, devices):
+        assert controller.stats['turns'] == 2
+        assert controller.stats['errors'] == 0
+        assert controller.stats['moves'] == len(device.swipes) > 0
+
+def test_capture_failure_is_retried(tmp_path):
+    device = FlakyDevice('flaky', [draw_frame(tmp_path / "0.png", 0)])
+    [controller] = asyncio.run(run_devices([device], workers=1, profiles={'flaky': FAST}))
+    assert controller.stats['errors'] == 1
+    assert controller.stats['turns'] == 1
+
+def test_adb_capture_failure_raises():
+    # Stands in for adb: exits 1 without output, whatever the arguments
+    device = AdbDevice('serial', adb_cmd=[sys.executable, '-c', 'import sys; sys.exit(1)'])
+    with pytest.raises(OSError):
+        asyncio.run(device.capture())
+
+def test_sync_keeps_combo_on_predicted_board():
+    session = GameSession()
+    board = np.zeros((8, 8), int)
+    board[0, :7] = 1
+    session.sync(board)
+    session.combo = 2
+    # The single block completes row 0
+    session.expect([(0, 0, 7)], SHAPES)
+    predicted = session.predictions[-1][0]
+    assert session.sync(predicted) == 3
+    assert session.stats['verified'] == 1
+
+    session.expect([(0, 5, 5)], SHAPES)
+    other = predicted.copy()
+    other[7, 7] = 1
+    assert session.sync(other) == 0
+    assert session.stats['mismatches'] == 1
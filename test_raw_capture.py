@@ -0,0 +1,73 @@
+import struct
+
+import numpy as np
+import pytest
+import vision
+
+# Synthetic 'screencap' dumps (no -p): 3 uint32 header on older Android,
+# 4 (with the color space) on newer ones, then w*h*4 pixel bytes.
+
+def make_dump(pixels, pixel_format=1, header_words=4):
+    h, w, _ = pixels.shape
+    header = struct.pack('<3I', w, h, pixel_format)
+    if header_words == 4:
+        header += struct.pack('<I', 1)
+    return header + pixels.tobytes()
+
+def rgba_pixels(h=6, w=5):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (h, w, 4), dtype=np.uint8)
+    pixels[..., 3] = 255
+    return pixels
+
+@pytest.mark.parametrize('header_words', [3, 4])
+def test_header(header_words):
+    data = make_dump(rgba_pixels(), header_words=header_words)
+    assert vision.parse_raw_header(data) == (5, 6, 1, header_words * 4)
+
+@pytest.mark.parametrize('header_words', [3, 4])
+def test_raw_to_array(header_words):
+    pixels = rgba_pixels()
+    array, pixel_format = vision.raw_to_array(make_dump(pixels, header_words=header_words))
+    assert pixel_format == 1
+    assert np.array_equal(array, pixels)
+
+@pytest.mark.parametrize('pixel_format, channels', [(1, [2, 1, 0]), (5, [0, 1, 2])])
+def test_decode_channel_order(pixel_format, channels):
+    pixels = rgba_pixels()
+    img = vision.decode_raw(make_dump(pixels, pixel_format), crop=False)
+    assert np.array_equal(img, pixels[..., channels])
+
+def test_unsupported_format():
+    with pytest.raises(ValueError, match="pixel format"):
+        vision.parse_raw_header(make_dump(rgba_pixels(), pixel_format=4))
+
+def test_too_short():
+    with pytest.raises(ValueError, match="too short"):
+        vision.parse_raw_header(b'\x00' * 8)
+
+@pytest.mark.parametrize('header_words', [3, 4])
+def test_truncated_payload(header_words):
+    data = make_dump(rgba_pixels(), header_words=header_words)
+    with pytest.raises(ValueError, match="size mismatch"):
+        vision.parse_raw_header(data[:-40])
+
+def test_trailing_bytes():
+    data = make_dump(rgba_pixels())
+    with pytest.raises(ValueError, match="size mismatch"):
+        vision.parse_raw_header(data + b'\x00' * 8)
+
+def test_capture_source_falls_back_to_png(monkeypatch):
+    from frame_source import CaptureFrameSource
+    png = np.zeros((4, 4, 3), np.uint8)
+    calls = []
+
+    def capture_screen(use_adb=True, raw=False):
+        calls.append(raw)
+        return None if raw else png     # a phone whose raw dump can't be decoded
+
+    monkeypatch.setattr(vision, 'capture_screen', capture_screen)
+    source = CaptureFrameSource(use_adb=False, raw=True)
+    assert source.read() is png
+    assert source.read() is png
+    assert calls == [True, False, False]
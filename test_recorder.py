@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+import pytest
+import recorder
+import vision
+from recorder import SessionRecorder, read_session, replay_turn
+from solver import make_solver
+
+# Sessions recorded from a drawn green-theme phone screenshot, then replayed
+
+SHAPES = [[(0, 0)], [(0, 0), (0, 1)], [(0, 0), (1, 0)]]
+
+def draw():
+    board = (np.random.default_rng(3).random((8, 8)) < 0.3).astype(int)
+    img = np.full((2400, 1080, 3), (60, 110, 60), np.uint8)
+    cell = 950 // 8
+    for r in range(8):
+        for c in range(8):
+            color = (60, 200, 240) if board[r, c] else (40, 70, 40)
+            x, y = 65 + c * cell, 584 + r * cell
+            cv2.rectangle(img, (x + 3, y + 3), (x + cell - 4, y + cell - 4), color, -1)
+    for i, shape in enumerate(SHAPES):
+        for dr, dc in shape:
+            x, y = i * 360 + 130 + dc * 50, 1700 + dr * 50
+            cv2.rectangle(img, (x, y), (x + 45, y + 45), (50, 200, 250), -1)
+    return img, board
+
+def record(directory, compact, solver):
+    img, board = draw()
+    shapes_data = [(s, (0, 0, 1, 1)) for s in SHAPES]
+    plan = solver.solve(board, SHAPES)
+    rec = SessionRecorder(str(directory), solver=solver, compact=compact)
+    rec.record((img, 1.0, 'GREEN'), board, shapes_data, plan)
+    rec.close()
+    return rec.path, img
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_round_trip(tmp_path, compact):
+    path, img = record(tmp_path, compact, make_solver('beam'))
+    [(meta, roi)] = list(read_session(path))
+    y1, y2 = vision.capture_roi(*img.shape[:2])
+    assert np.array_equal(roi, img[y1:y2])
+    # Raw frames are views of the map, not copies
+    assert isinstance(roi.base, np.memmap) != compact
+    assert meta['solver'] == {'backend': 'beam', 'rollout_games': 0, 'rollout_seed': 0}
+
+def test_replay_uses_recorded_solver(tmp_path, monkeypatch):
+    monkeypatch.setattr(vision, 'SAVE_DEBUG_IMAGES', False)
+    path, _ = record(tmp_path, False, make_solver('rollout', rollout_seed=7))
+    [(meta, roi)] = list(read_session(path))
+    assert replay_turn(meta, roi)['diff'] == []
+    assert recorder.get_solver(meta['solver']).settings() == meta['solver']
+
+def test_same_second_sessions_get_their_own_files(tmp_path):
+    recs = [SessionRecorder(str(tmp_path)) for _ in range(3)]
+    for rec in recs:
+        rec.close()
+    assert len({rec.path for rec in recs}) == 3
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+import vision
+from screen_classifier import REGIONS, signature
+
+TOP, BOARD, SPAWN = (0, 0, 200), (200, 0, 0), (0, 200, 0)
+
+def regions(sig):
+    parts, start = {}, 0
+    for name, (cols, rows) in REGIONS.items():
+        parts[name] = sig[start:start + cols * rows * 3].reshape(-1, 3)
+        start += cols * rows * 3
+    return parts
+
+@pytest.mark.parametrize('h, w', [(1000, 1000), (900, 1200), (2400, 1080)])
+def test_regions_follow_the_board(h, w):
+    # Paint the regions where board_geometry puts them on the native frame
+    x, y, size = vision.board_geometry(h, w)
+    img = np.zeros((h, w, 3), np.uint8)
+    img[:y] = TOP
+    img[y:y + size, x:x + size] = BOARD
+    img[y + size:] = SPAWN
+    parts = regions(signature(img)[0])
+    for name, color in (('top', TOP), ('board', BOARD), ('spawn', SPAWN)):
+        # Every thumbnail cell is mostly its own region's color (edges blend a little)
+        nearest = np.argmin([np.abs(parts[name] - c).sum(axis=1) for c in (TOP, BOARD, SPAWN)], axis=0)
+        assert (nearest == (TOP, BOARD, SPAWN).index(color)).all(), name
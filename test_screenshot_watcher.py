@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+from screenshot_watcher import ScreenshotWatcher, load_inotify
+
+BACKENDS = [
+    pytest.param(True, marks=pytest.mark.skipif(load_inotify() is None, reason="no inotify")),
+    False,
+]
+
+def write_shot(path, value=0):
+    cv2.imwrite(str(path), np.full((8, 8, 3), value, np.uint8))
+
+@pytest.mark.parametrize('use_inotify', BACKENDS)
+def test_tracks_newest(tmp_path, use_inotify):
+    old = tmp_path / 'old.png'
+    write_shot(old)
+    past = time.time() - 60
+    os.utime(old, (past, past))
+
+    seen = []
+    arrived = threading.Event()
+
+    def on_new(path):
+        seen.append(path)
+        arrived.set()
+
+    watcher = ScreenshotWatcher([str(tmp_path)], on_new=on_new, poll_interval=0.05,
+                                use_inotify=use_inotify, predecode=True).start()
+    try:
+        assert watcher.mode == ('inotify' if use_inotify else 'poll')
+        # Files already there are indexed, not reported
+        assert watcher.latest() == str(old)
+        assert seen == []
+
+        (tmp_path / 'notes.txt').write_text("not a screenshot")
+        new = tmp_path / 'new.png'
+        write_shot(new, 255)
+        assert arrived.wait(5)
+    finally:
+        watcher.stop()
+
+    assert seen == [str(new)]
+    assert watcher.latest() == str(new)
+    assert int(watcher.latest_image()[0, 0, 0]) == 255
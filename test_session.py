@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+import pytest
+from session import GameSession
+from vision_executor import VisionExecutor
+
+# GameSession.observe on drawn green-theme phone screenshots
+
+SHAPES = [[(0, 0)], [(0, 0), (0, 1)], [(0, 0), (1, 0)]]
+PLAN = [(0, 7, 7)]
+
+def draw(board, shapes):
+    img = np.full((2400, 1080, 3), (60, 110, 60), np.uint8)
+    cell = 950 // 8
+    for r in range(8):
+        for c in range(8):
+            color = (60, 200, 240) if board[r, c] else (40, 70, 40)
+            x, y = 65 + c * cell, 584 + r * cell
+            cv2.rectangle(img, (x + 3, y + 3), (x + cell - 4, y + cell - 4), color, -1)
+    for i, shape in enumerate(shapes):
+        for dr, dc in shape:
+            x, y = i * 360 + 130 + dc * 50, 1700 + dr * 50
+            cv2.rectangle(img, (x, y), (x + 45, y + 45), (50, 200, 250), -1)
+    return img
+
+def start_board():
+    board = (np.random.default_rng(5).random((8, 8)) < 0.3).astype(int)
+    board[7, 7] = board[0, 0] = 0
+    return board
+
+@pytest.fixture
+def planned():
+    """A session that parsed start_board() and handed out PLAN."""
+    with VisionExecutor() as executor:
+        session = GameSession()
+        board, shapes_data = session.observe(draw(start_board(), SHAPES), executor)
+        assert np.array_equal(board, start_board())
+        session.expect(PLAN, [s[0] for s in shapes_data])
+        yield session, executor
+
+def after_plan():
+    board = start_board()
+    board[7, 7] = 1
+    return board
+
+def test_planned_move_is_verified(planned):
+    session, executor = planned
+    board, _ = session.observe(draw(after_plan(), [[], SHAPES[1], SHAPES[2]]), executor)
+    assert np.array_equal(board, after_plan())
+    assert session.stats == {'verified': 1, 'full_parses': 1, 'mismatches': 0}
+
+def test_unplanned_cell_forces_full_parse(planned):
+    session, executor = planned
+    actual = after_plan()
+    actual[0, 0] = 1    # a block the plan never touches
+    board, _ = session.observe(draw(actual, [[], SHAPES[1], SHAPES[2]]), executor)
+    assert np.array_equal(board, actual)
+    assert session.stats['full_parses'] == 2
+    assert session.stats['verified'] == 0
+
+def test_changed_tray_forces_full_parse(planned):
+    # Board as planned-for, but a piece left the tray: not "plan still pending"
+    session, executor = planned
+    session.observe(draw(start_board(), [SHAPES[0], [], SHAPES[2]]), executor)
+    assert session.stats['full_parses'] == 2
+    assert session.stats['mismatches'] == 1
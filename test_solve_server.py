@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+import solve_server
+from solve_server import RemoteSolver, SolveClient, SolveServer, batch_timeout, parse_server, shape_mask
+from solver import BlockBlastBalancedSolver, board_bits
+
+# Local client stand-ins: several threads with their own RemoteSolver against
+# an in-process server (workers=0), compared with solving locally.
+
+SHAPES = [
+    [[(0, 0), (0, 1)], [(0, 0), (1, 0), (1, 1)], [(0, 0)]],
+    [[(0, 0), (0, 1), (0, 2)], [(0, 0), (1, 0)], [(0, 0), (0, 1), (1, 0), (1, 1)]],
+    [[(0, 1), (1, 0), (1, 1), (1, 2)], [(0, 0)], [(0, 0), (1, 0), (2, 0)]],
+]
+
+def positions():
+    rng = np.random.default_rng(1)
+    return [((rng.random((8, 8)) < 0.3).astype(int), shapes) for shapes in SHAPES]
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    holder = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        holder['server'] = loop.run_until_complete(SolveServer(port=0, workers=0).start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield holder['server']
+    asyncio.run_coroutine_threadsafe(holder['server'].stop(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+
+def test_parse_server():
+    assert parse_server('10.0.0.2:9000?timeout=2.5') == ('10.0.0.2', 9000, 2.5)
+    assert parse_server('box?workers=2') == ('box', solve_server.DEFAULT_PORT, batch_timeout(2))
+    assert parse_server('box:9000')[2] == batch_timeout()
+    # A full default batch on one worker is far past the old 1s
+    assert batch_timeout(1) > 10 * solve_server.SOLVE_MS / 1000
+    with pytest.raises(ValueError):
+        parse_server('box:9000?retries=3')
+
+def test_solve_many_matches_solve():
+    local = BlockBlastBalancedSolver()
+    cases = positions() + [(np.ones((8, 8), int), SHAPES[0])]    # no room: no plan
+    expected = [local.solve(board, shapes) for board, shapes in cases]
+    nodes = []
+    for board, shapes in cases:
+        local.solve(board, shapes)
+        nodes.append(local.nodes)
+    assert local.solve_many([(board, shapes, 0) for board, shapes in cases]) == expected
+    assert local.nodes_each == nodes
+
+def test_stand_in_clients_match_local(server):
+    local = BlockBlastBalancedSolver()
+    cases = positions()
+    expected = [local.solve(board, shapes) for board, shapes in cases]
+    results = {}
+
+    def client(k):
+        remote = RemoteSolver(f"127.0.0.1:{server.port}?timeout=30")
+        results[k] = [(remote.solve(board, shapes), remote.last_info) for board, shapes in cases]
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(60)
+
+    assert len(results) == 4
+    for answers in results.values():
+        assert [plan for plan, _ in answers] == expected
+        assert all(info is not None for _, info in answers)   # none fell back to a local solve
+    # 12 requests for 3 positions: everything past the first solve of each is shared
+    assert server.stats['requests'] == 12
+    assert server.stats['solved'] == 3
+
+def test_cached_answer(server):
+    board, shapes = positions()[0]
+    client = SolveClient('127.0.0.1', server.port, timeout=30)
+    masks = [shape_mask(s) for s in shapes]
+    first, info = client.solve(board_bits(board), masks)
+    again, info_again = client.solve(board_bits(board), masks)
+    client.close()
+    assert again == first
+    assert not info['cached'] and info_again['cached']
+
+def test_falls_back_when_unreachable():
+    board, shapes = positions()[0]
+    # Nothing listens on port 1
+    remote = RemoteSolver('127.0.0.1:1?timeout=0.5')
+    assert remote.solve(board, shapes) == BlockBlastBalancedSolver().solve(board, shapes)
+    assert remote.last_info is None
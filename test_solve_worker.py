@@ -0,0 +1,92 @@
+import threading
+
+from solve_worker import SolveWorker
+
+# SolveWorker with post=None: callbacks run directly on the worker thread.
+
+def make_worker():
+    done = []
+    errors = []
+    finished = threading.Event()
+    worker = SolveWorker()
+
+    def on_done(result):
+        done.append(result)
+        finished.set()
+
+    def on_error(error):
+        errors.append(error)
+        finished.set()
+    return worker, done, errors, finished, on_done, on_error
+
+def test_newest_job_wins():
+    worker, done, _, finished, on_done, _ = make_worker()
+    started = threading.Event()
+    release = threading.Event()
+    seen_cancelled = []
+
+    def slow(job):
+        started.set()
+        release.wait(5)
+        seen_cancelled.append(job.cancelled)
+        return 'slow'
+
+    worker.start()
+    try:
+        first = worker.submit(slow, on_done)
+        assert started.wait(5)
+        second = worker.submit(lambda job: 'second', on_done)   # waiting, replaced by the third
+        worker.submit(lambda job: 'third', on_done)
+        assert first.cancelled and second.cancelled
+        release.set()
+        assert finished.wait(5)
+    finally:
+        worker.stop()
+
+    assert done == ['third']
+    assert seen_cancelled == [True]
+    assert worker.stats['submitted'] == 3
+    assert worker.stats['superseded'] == 2
+    assert worker.stats['dropped'] == 1
+    assert worker.stats['completed'] == 1
+
+def test_cancel_drops_running_result():
+    worker, done, _, _, on_done, _ = make_worker()
+    started = threading.Event()
+    release = threading.Event()
+    returned = threading.Event()
+
+    def slow(job):
+        started.set()
+        release.wait(5)
+        returned.set()
+        return 'late'
+
+    worker.start()
+    try:
+        job = worker.submit(slow, on_done)
+        assert started.wait(5)
+        worker.cancel()
+        assert job.cancelled
+        release.set()
+        assert returned.wait(5)
+    finally:
+        worker.stop()
+    assert done == []
+    assert not worker.busy()
+
+def test_error_goes_to_on_error():
+    worker, done, errors, finished, on_done, on_error = make_worker()
+
+    def broken(job):
+        raise ValueError("bad frame")
+
+    worker.start()
+    try:
+        worker.submit(broken, on_done, on_error)
+        assert finished.wait(5)
+    finally:
+        worker.stop()
+    assert done == []
+    assert [str(e) for e in errors] == ["bad frame"]
+    assert worker.stats['failed'] == 1
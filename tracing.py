@@ -0,0 +1,171 @@
+import collections
+import functools
+import json
+import os
+import threading
+import time
+
+# Off unless asked for (BOT_TRACE=1 or tracing.enable()); disabled spans cost one flag check
+ENABLED = os.environ.get('BOT_TRACE') == '1'
+# Trace files were asked for (BOT_TRACE=1). The metrics server turns ENABLED on for
+# its latencies without this, so the bot doesn't start writing files on its own.
+EXPORT = ENABLED
+
+# Histogram bucket upper bounds (ms); the last bucket is everything above
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+WINDOW = 500          # rolling samples kept per stage
+MAX_EVENTS = 20000    # spans kept for the Chrome trace
+RECENT_S = 300.0      # how far back recent() can count
+
+T0 = time.perf_counter()
+lock = threading.Lock()
+stages = {}           # name -> deque of recent durations (ms)
+totals = collections.defaultdict(lambda: [0, 0.0])   # name -> [count, total ms]
+counters = collections.Counter()
+events = collections.deque(maxlen=MAX_EVENTS)        # (name, start_us, dur_us, thread id)
+ends = {}             # name -> deque of span end times (s) from the last RECENT_S
+thread_names = {}
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NO_SPAN = _NoSpan()
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter())
+        return False
+
+def span(name):
+    """with tracing.span('solve'): ..."""
+    return Span(name) if ENABLED else NO_SPAN
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, start, time.perf_counter())
+        return wrapper
+    return decorator
+
+def record(name, start, end):
+    ms = (end - start) * 1000
+    thread = threading.current_thread()
+    with lock:
+        samples = stages.get(name)
+        if samples is None:
+            samples = stages[name] = collections.deque(maxlen=WINDOW)
+        samples.append(ms)
+        total = totals[name]
+        total[0] += 1
+        total[1] += ms
+        events.append((name, (start - T0) * 1e6, ms * 1000, thread.ident))
+        done = ends.get(name)
+        if done is None:
+            done = ends[name] = collections.deque()
+        done.append(end)
+        while done[0] < end - RECENT_S:
+            done.popleft()
+        thread_names[thread.ident] = thread.name
+
+def count(name, n=1):
+    if ENABLED:
+        with lock:
+            counters[name] += n
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+def reset():
+    with lock:
+        stages.clear()
+        totals.clear()
+        counters.clear()
+        events.clear()
+        ends.clear()
+
+def recent(name, seconds=60.0):
+    """How many `name` spans ended in the last `seconds` (up to RECENT_S)."""
+    since = time.perf_counter() - seconds
+    n = 0
+    with lock:
+        # Newest first, so this only touches the spans it counts
+        for end in reversed(ends.get(name, ())):
+            if end < since:
+                break
+            n += 1
+    return n
+
+def histogram(samples):
+    """Counts per bucket of BUCKETS_MS (plus one overflow bucket)."""
+    import numpy as np   # report path only: keeps numpy off the app's launch path
+    counts = np.bincount(np.searchsorted(BUCKETS_MS, samples), minlength=len(BUCKETS_MS) + 1)
+    labels = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+    return dict(zip(labels, counts.tolist()))
+
+def snapshot():
+    """Per-stage rolling latency stats + histograms, and the counters."""
+    import numpy as np
+    with lock:
+        data = {name: list(samples) for name, samples in stages.items()}
+        all_time = {name: list(t) for name, t in totals.items()}
+        counts = dict(counters)
+    result = {'stages': {}, 'counters': counts}
+    for name, samples in data.items():
+        p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+        result['stages'][name] = {
+            'count': all_time[name][0],
+            'total_ms': all_time[name][1],
+            'p50': p50, 'p90': p90, 'p99': p99, 'max': max(samples),
+            'histogram': histogram(samples),
+        }
+    return result
+
+def save_snapshot(path='trace_snapshot.json'):
+    with open(path, 'w') as f:
+        json.dump(snapshot(), f, indent=2)
+    return path
+
+def save_chrome_trace(path='trace_chrome.json'):
+    """Trace Event Format: open in chrome://tracing or ui.perfetto.dev."""
+    pid = os.getpid()
+    with lock:
+        spans = list(events)
+        names = dict(thread_names)
+    trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': tname}}
+             for tid, tname in names.items()]
+    trace += [{'name': name, 'ph': 'X', 'ts': round(ts, 1), 'dur': round(dur, 1), 'pid': pid, 'tid': tid}
+              for name, ts, dur, tid in spans]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+    return path
+
+def save(prefix='trace'):
+    """Writes both files; returns their paths."""
+    return save_snapshot(f"{prefix}_snapshot.json"), save_chrome_trace(f"{prefix}_chrome.json")
+
+def report():
+    lines = [f"{'STAGE':<16}{'n':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)"]
+    for name, s in snapshot()['stages'].items():
+        lines.append(f"{name:<16}{s['count']:>7}{s['p50']:>9.2f}{s['p90']:>9.2f}{s['p99']:>9.2f}{s['max']:>9.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,285 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import rollout
+from rollout import COLS, EDGES, FULL, ROWS, BYTE_BITS, RolloutEngine, full_lines, popcount, to_bits
+from solver import ALL_POSSIBLE_SHAPES, BlockBlastBalancedSolver, board_bits, shape_penalty
+
+# Learned replacement for the hand-tuned evaluate_board (BOT_SOLVER=learned).
+# A board is described by a few bitboard features (holes, transitions, nearly
+# full lines, which of the known pieces still fit, ...) and a small linear or
+# one-hidden-layer model predicts how much of the next HORIZON turns the
+# position survives. It is trained on self-play games played by the lockstep
+# rollout engine, in NumPy only:
+#   python value_model.py train [-o value_weights.npz] [--hidden 16]
+#   python value_model.py bench [--games 20]
+
+WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'value_weights.npz')
+HORIZON = 8            # turns a position is followed for its training target
+VALUE_SCALE = 20000    # evaluate_board units of a sure survival (vs. sure death)
+
+COL0, COL7 = COLS[0], COLS[-1]
+ROW0, ROW7 = ROWS[0], ROWS[-1]
+NOT_LAST_COL = np.uint64(FULL & ~int(COL7))
+NOT_LAST_ROW = np.uint64(FULL >> 8)
+FULL64 = np.uint64(FULL)
+EDGES64 = np.uint64(EDGES)
+PENALTIES = np.array([shape_penalty(s) for s in ALL_POSSIBLE_SHAPES], np.float32)
+
+FEATURES = ['filled', 'holes', 'pits', 'row_transitions', 'col_transitions', 'lines_7', 'lines_6',
+            'empty_lines', 'edge_cells', 'missed_penalty'] + [f'fits_{i}' for i in range(len(ALL_POSSIBLE_SHAPES))]
+
+TABLES = None
+
+def features(bits, chunk=8192):
+    """(N,) uint64 boards -> (N, len(FEATURES)) float32."""
+    global TABLES
+    if TABLES is None:
+        engine = RolloutEngine(ALL_POSSIBLE_SHAPES)
+        TABLES = engine.masks, engine.valid
+    masks, valid = TABLES
+    b = np.asarray(bits, dtype=np.uint64).reshape(-1)
+    one, eight = np.uint64(1), np.uint64(8)
+
+    # Occupancy of each neighbour, the wall counting as filled
+    left = ((b << one) & ~COL0 & FULL64) | COL0
+    right = ((b >> one) & ~COL7) | COL7
+    up = ((b << eight) & FULL64) | ROW0
+    down = (b >> eight) | ROW7
+    empty = ~b & FULL64
+    holes = empty & left & right & up & down
+    pits = empty & ~holes & ((left & right & (up | down)) | (up & down & (left | right)))
+
+    counts = np.column_stack([BYTE_BITS[((b >> np.uint64(8 * r)) & np.uint64(0xFF)).astype(np.uint8)]
+                              for r in range(8)] + [popcount(b & c) for c in COLS])
+
+    fits = np.empty((len(b), len(masks)), bool)
+    for start in range(0, len(b), chunk):
+        part = b[start:start + chunk, None, None]
+        fits[start:start + chunk] = (((masks[None] & part) == 0) & valid[None]).any(axis=2)
+
+    return np.column_stack([
+        popcount(b),
+        popcount(holes),
+        popcount(pits),
+        popcount((b ^ (b >> one)) & NOT_LAST_COL),
+        popcount((b ^ (b >> eight)) & NOT_LAST_ROW),
+        (counts == 7).sum(axis=1),
+        (counts == 6).sum(axis=1),
+        (counts == 0).sum(axis=1),
+        popcount(b & EDGES64),
+        (~fits * PENALTIES).sum(axis=1) / PENALTIES.sum(),
+        fits,
+    ]).astype(np.float32)
+
+class ValueModel:
+    """
+    Standardized features -> [ReLU hidden layer] -> value in about [0, 1]
+    (share of the next HORIZON turns survived).
+    layers: [(W, b), ...]; one layer = linear model.
+    """
+    def __init__(self, mean, std, layers):
+        self.mean = mean
+        self.std = std
+        self.layers = layers
+
+    def predict_features(self, x):
+        h = (x - self.mean) / self.std
+        for k, (w, bias) in enumerate(self.layers):
+            h = h @ w + bias
+            if k < len(self.layers) - 1:
+                h = np.maximum(h, 0)
+        return h[:, 0]
+
+    def predict(self, bits):
+        return self.predict_features(features(bits))
+
+    def save(self, path=WEIGHTS_PATH):
+        arrays = {'mean': self.mean, 'std': self.std}
+        for k, (w, bias) in enumerate(self.layers):
+            arrays[f'w{k}'] = w.astype(np.float32)
+            arrays[f'b{k}'] = bias.astype(np.float32)
+        np.savez_compressed(path, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path=WEIGHTS_PATH):
+        data = np.load(path)
+        layers = []
+        while f'w{len(layers)}' in data:
+            layers.append((data[f'w{len(layers)}'], data[f'b{len(layers)}']))
+        return cls(data['mean'], data['std'], layers)
+
+    @classmethod
+    def fit(cls, x, y, hidden=0, epochs=40, lr=1e-3, l2=1e-4, seed=0):
+        """Ridge regression (hidden=0) or a one-hidden-layer MLP trained with Adam on MSE."""
+        mean = x.mean(axis=0)
+        std = x.std(axis=0) + 1e-6
+        z = (x - mean) / std
+        y = y.astype(np.float32)[:, None]
+        if not hidden:
+            a = np.hstack([z, np.ones((len(z), 1), np.float32)])
+            reg = l2 * len(z) * np.eye(a.shape[1])
+            reg[-1, -1] = 0
+            w = np.linalg.solve(a.T @ a + reg, a.T @ y)
+            return cls(mean, std, [(w[:-1].astype(np.float32), w[-1].astype(np.float32))])
+
+        rng = np.random.default_rng(seed)
+        params = [rng.normal(0, np.sqrt(2 / z.shape[1]), (z.shape[1], hidden)).astype(np.float32),
+                  np.zeros(hidden, np.float32),
+                  rng.normal(0, np.sqrt(1 / hidden), (hidden, 1)).astype(np.float32),
+                  np.full(1, y.mean(), np.float32)]
+        m = [np.zeros_like(p) for p in params]
+        v = [np.zeros_like(p) for p in params]
+        step = 0
+        for _ in range(epochs):
+            order = rng.permutation(len(z))
+            for start in range(0, len(z), 256):
+                idx = order[start:start + 256]
+                xb, yb = z[idx], y[idx]
+                w1, b1, w2, b2 = params
+                pre = xb @ w1 + b1
+                h = np.maximum(pre, 0)
+                err = (h @ w2 + b2 - yb) * (2 / len(idx))
+                dh = (err @ w2.T) * (pre > 0)
+                grads = [xb.T @ dh + l2 * w1, dh.sum(axis=0), h.T @ err + l2 * w2, err.sum(axis=0)]
+                step += 1
+                for p, g, mp, vp in zip(params, grads, m, v):
+                    mp *= 0.9
+                    mp += 0.1 * g
+                    vp *= 0.999
+                    vp += 0.001 * g * g
+                    p -= lr * (mp / (1 - 0.9 ** step)) / (np.sqrt(vp / (1 - 0.999 ** step)) + 1e-8)
+        return cls(mean, std, [(params[0], params[1]), (params[2], params[3])])
+
+def self_play(games=32768, turns=60, horizon=HORIZON, seed=0):
+    """
+    Positions and outcomes from lockstep greedy games. Half of the games
+    start from a random partly filled board. Returns (boards, targets): the
+    share of the next `horizon` turns each position survived (positions too
+    close to the end of an unfinished game are left out).
+    """
+    rng = np.random.default_rng(seed)
+    engine = RolloutEngine(ALL_POSSIBLE_SHAPES, seed=seed)
+    density = np.where(rng.random(games) < 0.5, 0.0, rng.uniform(0.2, 0.6, games))
+    boards = to_bits(rng.random((games, 8, 8)) < density[:, None, None])
+    rows, cols = full_lines(boards)
+    boards &= ~(rows * np.uint64(0xFF) | cols * rollout.COLUMN_SPREAD)
+
+    alive = np.ones(games, bool)
+    died = np.full(games, np.iinfo(np.int32).max)
+    history = []
+    for turn in range(turns):
+        history.append((turn, np.flatnonzero(alive), boards[alive].copy()))
+        result = engine.run(boards, 1)
+        boards = result['boards']
+        newly_dead = alive & ~result['alive']
+        died[newly_dead] = turn
+        alive &= result['alive']
+        if not alive.any():
+            break
+
+    xs, ys = [], []
+    for turn, games_alive, positions in history:
+        survived = np.minimum(died[games_alive] - turn, horizon)
+        known = (survived < horizon) | (turn + horizon <= turns)
+        xs.append(positions[known])
+        ys.append(survived[known] / horizon)
+    return np.concatenate(xs), np.concatenate(ys).astype(np.float32)
+
+class ValueModelSolver(BlockBlastBalancedSolver):
+    """
+    The beam search with the learned value in place of the hand-written terms
+    (holes, roughness, survival table, setup). The combo bonus stays: it is the
+    game's own score. Each beam step is evaluated as one batch.
+    """
+    def __init__(self, model=None, path=WEIGHTS_PATH, grid_size=8):
+        super().__init__(grid_size)
+        if model is None and not os.path.exists(path):
+            raise FileNotFoundError(f"No value weights at {path}; run 'python value_model.py train'")
+        self.model = model or ValueModel.load(path)
+
+    def settings(self):
+        return {'backend': 'learned'}
+
+    def evaluate_boards(self, boards, lines_cleared, combo_secured, streaks):
+        bits = np.array([board_bits(b) for b in boards], dtype=np.uint64)
+        value = self.model.predict(bits) * VALUE_SCALE
+        lines = np.asarray(lines_cleared)
+        bonus = np.where(lines > 0, (np.asarray(streaks) + 1) * 8000.0, 0.0)
+        bonus *= np.where(np.asarray(combo_secured, bool), 1, 2)
+        return (value + bonus).tolist()
+
+    def evaluate_board(self, board, lines_cleared, is_combo_secured, current_combo_streak):
+        return self.evaluate_boards([board], [lines_cleared], [is_combo_secured], [current_combo_streak])[0]
+
+def play_game(solver, seed, max_turns=60):
+    """One seeded game (random pieces). Returns (turns survived, lines cleared)."""
+    rng = random.Random(seed)
+    board = np.zeros((8, 8), dtype=int)
+    lines = 0
+    for turn in range(max_turns):
+        shapes = [list(rng.choice(ALL_POSSIBLE_SHAPES)) for _ in range(3)]
+        plan = solver.solve(board, shapes)
+        if not plan:
+            return turn, lines
+        for shape_idx, r, c in plan:
+            board = solver.place_shape(board, shapes[shape_idx], r, c)
+            board, cleared = solver.clear_lines(board)
+            lines += cleared
+    return max_turns, lines
+
+def bench(model, games=20, max_turns=60):
+    """Decision quality (seeded games) and evaluation cost per board, hand-tuned vs learned."""
+    rng = np.random.default_rng(1)
+    boards = [(rng.random((8, 8)) < rng.uniform(0.2, 0.6)).astype(int) for _ in range(200)]
+    zeros = [0] * len(boards)
+    print(f"{'SOLVER':<10}{'turns':>8}{'lines':>8}{'us/board':>10}{'solve ms':>10}")
+    for name, solver in (('beam', BlockBlastBalancedSolver()), ('learned', ValueModelSolver(model))):
+        t0 = time.perf_counter()
+        solver.evaluate_boards(boards, zeros, zeros, zeros)
+        per_board = (time.perf_counter() - t0) / len(boards) * 1e6
+        t0 = time.perf_counter()
+        results = [play_game(solver, seed, max_turns) for seed in range(games)]
+        turns = sum(r[0] for r in results)
+        lines = sum(r[1] for r in results)
+        solve_ms = (time.perf_counter() - t0) * 1000 / max(1, turns)
+        print(f"{name:<10}{turns / games:>8.1f}{lines / games:>8.1f}{per_board:>10.1f}{solve_ms:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or benchmark the learned board value")
+    sub = parser.add_subparsers(dest='command', required=True)
+    train = sub.add_parser('train', help="self-play, fit, save the weights")
+    train.add_argument('-o', '--output', default=WEIGHTS_PATH)
+    train.add_argument('--games', type=int, default=32768)
+    train.add_argument('--turns', type=int, default=60)
+    train.add_argument('--hidden', type=int, default=0, help="hidden units (0 = linear)")
+    train.add_argument('--seed', type=int, default=0)
+    bench_cmd = sub.add_parser('bench', help="decision quality and cost vs evaluate_board")
+    bench_cmd.add_argument('--weights', default=WEIGHTS_PATH)
+    bench_cmd.add_argument('--games', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        t0 = time.perf_counter()
+        boards, targets = self_play(args.games, args.turns, seed=args.seed)
+        x = features(boards)
+        print(f"{len(boards)} positions from {args.games} games in {time.perf_counter() - t0:.1f}s, "
+              f"mean target {targets.mean():.3f}")
+        split = len(x) * 9 // 10
+        order = np.random.default_rng(args.seed).permutation(len(x))
+        fit, held = order[:split], order[split:]
+        model = ValueModel.fit(x[fit], targets[fit], hidden=args.hidden)
+        mse = float(np.mean((model.predict_features(x[held]) - targets[held]) ** 2))
+        print(f"held-out MSE {mse:.4f} (predicting the mean: {float(np.var(targets[held])):.4f})")
+        print(f"Saved {model.save(args.output)} ({os.path.getsize(args.output)} bytes)")
+    else:
+        bench(ValueModel.load(args.weights), args.games)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 import subprocess
+import struct
+import tracing
 
 # Module-level globals for board coordinates (updated by parse_board)
 BOARD_X = 0
@@ -8,28 +10,106 @@ BOARD_Y = 0
 BOARD_SIZE = 0
 CELL_SIZE = 0
 
-def capture_screen(use_adb=True):
+# screencap raw pixel formats (android.graphics.PixelFormat) -> conversion to BGR
+RAW_PIXEL_FORMATS = {
+    1: cv2.COLOR_RGBA2BGR,  # RGBA_8888
+    2: cv2.COLOR_RGBA2BGR,  # RGBX_8888
+    5: cv2.COLOR_BGRA2BGR,  # BGRA_8888
+}
+
+def parse_raw_header(data):
+    """
+    Parses the header of a raw 'screencap' dump (no -p).
+    Returns (width, height, pixel_format, header_size).
+    Older Android writes 3 uint32 (w, h, format), newer adds a 4th (color space).
+    """
+    if len(data) < 12:
+        raise ValueError(f"Raw screencap too short: {len(data)} bytes")
+    width, height, pixel_format = struct.unpack_from('<3I', data, 0)
+    if pixel_format not in RAW_PIXEL_FORMATS:
+        raise ValueError(f"Unsupported screencap pixel format: {pixel_format}")
+    
+    payload = width * height * 4
+    extra = len(data) - payload
+    if extra == 12:
+        header_size = 12
+    elif extra == 16:
+        header_size = 16
+    else:
+        raise ValueError(f"Raw screencap size mismatch: {len(data)} bytes for {width}x{height}")
+    return width, height, pixel_format, header_size
+
+def raw_to_array(data):
+    """
+    Zero-copy (h, w, 4) view over the pixel payload of a raw screencap dump.
+    Returns (pixels, pixel_format).
+    """
+    width, height, pixel_format, header_size = parse_raw_header(data)
+    pixels = np.frombuffer(data, np.uint8, count=width * height * 4, offset=header_size)
+    return pixels.reshape(height, width, 4), pixel_format
+
+def capture_roi(h, w, scale=1.0):
+    """
+    Row band (y1, y2) that the parsers read: board, theme sample and spawn area.
+    Everything above the board (score, crown, ads) is never looked at.
+    `scale` is the working scale of the frame (see to_working_scale).
+    """
+    _, board_y, _ = board_geometry(h, w, scale)
+    return board_y, h
+
+@tracing.traced('decode')
+def decode_raw(data, crop=True):
+    """
+    Converts a raw screencap dump to a BGR image.
+    With crop=True only the board/spawn band is color converted; the rows above
+    it are left black, so the parsers see the same layout as a full frame.
+    """
+    pixels, pixel_format = raw_to_array(data)
+    code = RAW_PIXEL_FORMATS[pixel_format]
+    h, w, _ = pixels.shape
+    
+    if not crop:
+        return cv2.cvtColor(pixels, code)
+    
+    y1, y2 = capture_roi(h, w)
+    img = np.zeros((h, w, 3), dtype=np.uint8)
+    img[y1:y2] = cv2.cvtColor(pixels[y1:y2], code)
+    return img
+
+def capture_screen(use_adb=True, raw=False):
     """
     Captures the screen.
     If use_adb=True, uses ADB (for PC bot).
     If use_adb=False, tries local 'screencap' command (for Android APK).
+    If raw=True, reads the uncompressed framebuffer instead of a PNG
+    (no encode on the phone, no decode here).
     """
     try:
         if use_adb:
             # Capture screen using ADB (PC Mode)
-            process = subprocess.Popen(
-                ['adb', 'exec-out', 'screencap', '-p'],
-                stdout=subprocess.PIPE
-            )
+            cmd = ['adb', 'exec-out', 'screencap'] if raw else ['adb', 'exec-out', 'screencap', '-p']
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
             screenshot_data, _ = process.communicate()
             
             if not screenshot_data:
                 print("Error: No data received from ADB.")
                 return None
             
+            if raw:
+                return decode_raw(screenshot_data)
+            
             # Convert to numpy array
             image_array = np.frombuffer(screenshot_data, np.uint8)
-            img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+            with tracing.span('decode'):
+                img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+            
+        elif raw:
+            # Native Android Mode (APK) - raw framebuffer straight from stdout
+            result = subprocess.run(['screencap'], stdout=subprocess.PIPE)
+            if not result.stdout:
+                print("Error: No data received from screencap.")
+                return None
+            img = decode_raw(result.stdout)
             
         else:
             # Native Android Mode (APK)
@@ -51,15 +131,230 @@ BOARD_SIZE = 990
 GRID_SIZE = 8
 CELL_SIZE = BOARD_SIZE // GRID_SIZE
 
-def parse_board(image):
+# Fill score (0-1, > 0.5 = filled) of every cell from the last parse_board; values near 0.5 are uncertain
+CELL_FILL = np.zeros((GRID_SIZE, GRID_SIZE))
+
+# Write debug_*.png masks/contours from the shape parsers (slow: several PNG encodes per call)
+SAVE_DEBUG_IMAGES = True
+
+# Working resolution: board cell size (px) the parsers run at. None = native.
+# Frames are shrunk by an integer factor, so a cell ends up 32-63px on any device.
+WORK_CELL_SIZE = 32
+
+def px(n, scale):
+    """A length measured in native (1080-wide) pixels, at working scale."""
+    return max(1, int(round(n * scale)))
+
+def to_screen(v, scale):
+    """Working-scale coordinate back to screen pixels."""
+    return int(round(v / scale))
+
+def working_scale(h, w, cell_size=None):
+    """Scale factor (<= 1) that brings the board cell down to about cell_size px."""
+    cell_size = cell_size or WORK_CELL_SIZE
+    if not cell_size:
+        return 1.0
+    _, _, board_size = board_geometry(h, w)
+    factor = max(1, (board_size // GRID_SIZE) // cell_size)
+    return 1.0 / factor
+
+@tracing.traced('scale')
+def to_working_scale(image, cell_size=None):
+    """Returns (working image, scale)."""
+    h, w, _ = image.shape
+    scale = working_scale(h, w, cell_size)
+    if scale == 1.0:
+        return image, scale
+    small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return small, scale
+
+def parse_frame(image, cell_size=None):
     """
-    Parses the 8x8 grid from the screenshot.
-    Returns a numpy matrix (8x8) where 1=filled, 0=empty.
+    Board + shapes at working scale.
+    Returns (board, shapes_data) with bboxes and BOARD_* globals in screen pixels.
+    """
+    work, scale = to_working_scale(image, cell_size)
+    theme = detect_theme(work, scale)
+    return parse_board(work, scale, theme), parse_shapes(work, scale, theme)
+
+def dilate(mask, size, iterations, scale):
+    """
+    Square dilation, equivalent to `iterations` passes of a size x size kernel
+    at native resolution, done as a single pass at working scale.
+    """
+    radius = px(iterations * (size // 2), scale)
+    kernel = np.ones((2 * radius + 1, 2 * radius + 1), np.uint8)
+    return cv2.dilate(mask, kernel)
+
+def sample_filled(mask, mask_x, mask_y, scale):
+    """Checks the 5x5 (native) window around a cell center for mask pixels."""
+    half = px(2, scale)
+    y_min = max(0, mask_y - half)
+    y_max = min(mask.shape[0], mask_y + half + 1)
+    x_min = max(0, mask_x - half)
+    x_max = min(mask.shape[1], mask_x + half + 1)
+    
+    roi = mask[y_min:y_max, x_min:x_max]
+    # more than 3 of 25 pixels at native resolution
+    return np.count_nonzero(roi) > 3 * (2 * half + 1) ** 2 / 25
+
+def segment_spawn(mask, min_area, min_width=0, min_y=0, max_y=None, largest=False, slots=3, gap=0):
+    """
+    One-pass segmentation of a (dilated) spawn mask into `slots` slots.
+    connectedComponentsWithStats gives every blob's bbox and area as arrays;
+    filters and slot assignment are array comparisons.
+    Each slot gets the union bbox of its blobs (or only the largest blob).
+    `gap`: empty columns between the slots in the mask (see slot_mask).
+    Returns [bbox or None] * slots, bbox = (x, y, w, h) relative to its slot.
+    """
+    pitch = (mask.shape[1] + gap) // slots
+    # Grana (BBDT) labelling: the fastest 8-connectivity variant here
+    _, _, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(mask, 8, cv2.CV_32S, cv2.CCL_GRANA)
+    
+    # Row 0 is the background
+    x, y, cw, ch, area = stats[1:].T
+    keep = (area >= min_area) & (cw >= min_width) & (y >= min_y)
+    if max_y is not None:
+        keep &= y <= max_y
+    slot = np.minimum(slots - 1, (x + cw // 2) // pitch)
+    
+    bboxes = []
+    for i in range(slots):
+        sel = np.flatnonzero(keep & (slot == i))
+        if sel.size == 0:
+            bboxes.append(None)
+        elif largest:
+            j = sel[np.argmax(area[sel])]
+            bboxes.append((int(x[j] - i * pitch), int(y[j]), int(cw[j]), int(ch[j])))
+        else:
+            x1, y1 = x[sel].min(), y[sel].min()
+            x2, y2 = (x[sel] + cw[sel]).max(), (y[sel] + ch[sel]).max()
+            bboxes.append((int(x1 - i * pitch), int(y1), int(x2 - x1), int(y2 - y1)))
+    return bboxes
+
+def draw_segments(shape_area, parsed_shapes, spawn_y1, scale, path):
+    """Debug image: slot boundaries and the bbox found in each slot."""
+    slot_width = shape_area.shape[1] // 3
+    debug_viz = shape_area.copy()
+    for _, bbox in parsed_shapes:
+        if bbox:
+            x, y, bw, bh = (int(v * scale) for v in bbox)
+            y -= spawn_y1
+            cv2.rectangle(debug_viz, (x, y), (x + bw, y + bh), (0, 255, 0), 1)
+    cv2.line(debug_viz, (slot_width, 0), (slot_width, shape_area.shape[0]), (0, 0, 255), 2)
+    cv2.line(debug_viz, (slot_width*2, 0), (slot_width*2, shape_area.shape[0]), (0, 0, 255), 2)
+    cv2.imwrite(path, debug_viz)
+
+# --- Color lookup tables ---
+# Every theme rule is a test on gray/HSV. Instead of converting each frame to
+# HSV, gray/sat/val/mean are computed once for all (quantized) BGR colors and
+# stored as tables: a frame is converted by packing each pixel's color into an
+# index and one gather. Shape rules are per pixel (a 0/255 table per theme);
+# board rules are tested on each cell's average gray/sat/val, as the parser
+# always did. To tune a threshold, change it here and call build_color_luts().
+COLOR_THRESHOLDS = {
+    'BLUE_BOARD_GRAY': 150,   # filled: gray < 150 ...
+    'BLUE_BOARD_SAT': 150,    # ... and sat > 150
+    'DARK_BOARD_SAT': 100,    # filled: sat > 100 ...
+    'DARK_BOARD_VAL': 80,     # ... and val > 80
+    'GREEN_BOARD_MEAN': 100,  # filled: mean(B, G, R) > 100
+    'BLUE_SHAPE_VAL': 230,    # shape: val <= 230 ...
+    'BLUE_SHAPE_SAT': 180,    # ... or (sat > 180 ...
+    'BLUE_SHAPE_BRIGHT': 240, # ... and val <= 240)
+    'DARK_SHAPE_SAT': 100,    # shape: sat > 100 ...
+    'DARK_SHAPE_VAL': 80,     # ... and val > 80
+    'GREEN_SHAPE_VAL': 120,   # shape: val > 120
+}
+
+LUT_BITS = 6   # bits per channel: 6 -> 262144 entries, colors off by at most 2 levels
+COLOR_LUTS = {}
+COLOR_FEATURES = None   # (entries, 4) uint8: gray, sat, val, mean(B, G, R) of each quantized color
+FILL_MARGIN = 40        # levels past a board threshold for CELL_FILL to reach 0 or 1
+
+def board_margin(theme, gray, sat, val, mean):
+    """Signed distance (levels) of average cell colors from the theme's 'filled' rule, > 0 = filled."""
+    t = COLOR_THRESHOLDS
+    if theme == 'BLUE':
+        # Filled cells are darker and more saturated (empty: gray ~197, sat ~100)
+        return np.minimum(t['BLUE_BOARD_GRAY'] - gray, sat - t['BLUE_BOARD_SAT'])
+    if theme == 'DARK':
+        # Filled cells are bright and colorful (empty: gray ~63)
+        return np.minimum(sat - t['DARK_BOARD_SAT'], val - t['DARK_BOARD_VAL'])
+    # GREEN: filled cells are brighter
+    return mean - t['GREEN_BOARD_MEAN']
+
+def board_fill(features, theme):
+    """Cell fill score (0-1, > 0.5 = filled) from average features (..., 4)."""
+    features = np.asarray(features, dtype=np.float64)
+    margin = board_margin(theme, *np.moveaxis(features, -1, 0))
+    return np.clip(0.5 + margin / (2 * FILL_MARGIN), 0, 1)
+
+def build_color_luts(bits=None):
+    """(Re)builds the color feature table and the per-theme tables from COLOR_THRESHOLDS."""
+    global LUT_BITS, COLOR_FEATURES
+    if bits:
+        LUT_BITS = bits
+    n = 1 << LUT_BITS
+    step = 256 // n
+    
+    # Every quantized color (bin centers) as one image, in table index order (r, g, b)
+    levels = np.arange(n, dtype=np.uint16) * step + step // 2
+    r, g, b = np.meshgrid(levels, levels, levels, indexing='ij')
+    colors = np.stack([b, g, r], axis=-1).reshape(n * n, n, 3).astype(np.uint8)
+    
+    gray = cv2.cvtColor(colors, cv2.COLOR_BGR2GRAY)
+    hsv = cv2.cvtColor(colors, cv2.COLOR_BGR2HSV)
+    sat, val = hsv[:,:,1], hsv[:,:,2]
+    mean = colors.mean(axis=2)
+    t = COLOR_THRESHOLDS
+    
+    rules = {
+        # Board tables classify single pixels (debug masks); parse_board uses cell averages
+        ('BLUE', 'board'): board_margin('BLUE', gray, sat, val, mean) > 0,
+        ('DARK', 'board'): board_margin('DARK', gray, sat, val, mean) > 0,
+        ('GREEN', 'board'): board_margin('GREEN', gray, sat, val, mean) > 0,
+        ('BLUE', 'shape'): (val <= t['BLUE_SHAPE_VAL']) | ((sat > t['BLUE_SHAPE_SAT']) & (val <= t['BLUE_SHAPE_BRIGHT'])),
+        ('DARK', 'shape'): (sat > t['DARK_SHAPE_SAT']) & (val > t['DARK_SHAPE_VAL']),
+        ('GREEN', 'shape'): val > t['GREEN_SHAPE_VAL'],
+    }
+    # Swap tables in with one update, parser threads may be reading them
+    COLOR_LUTS.update({key: np.where(rule.ravel(), 255, 0).astype(np.uint8)
+                       for key, rule in rules.items()})
+    COLOR_FEATURES = np.stack([gray.ravel(), sat.ravel(), val.ravel(),
+                               np.round(mean).ravel()], axis=1).astype(np.uint8)
+
+def color_lut(theme, kind):
+    if not COLOR_LUTS:
+        build_color_luts()
+    return COLOR_LUTS[(theme, kind)]
+
+def color_index(image):
+    """Table index of every pixel of a BGR image (quantized r, g, b)."""
+    bits = LUT_BITS
+    shift = 8 - bits
+    m = (1 << bits) - 1
+    # One uint32 per pixel (b | g << 8 | r << 16), then keep the top bits of each channel
+    packed = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA).view(np.uint32)[:,:,0]
+    idx = (packed >> shift) & m
+    idx |= (packed >> (8 + shift - bits)) & (m << bits)
+    idx |= (packed >> (16 + shift - 2 * bits)) & (m << (2 * bits))
+    return idx
+
+def classify_colors(image, table):
+    """0/255 mask of a BGR image through a color table (see build_color_luts)."""
+    return np.take(table, color_index(image))
+
+def color_features(image):
+    """(h, w, 4) gray, sat, val, mean of a BGR image, from the feature table."""
+    if COLOR_FEATURES is None:
+        build_color_luts()
+    return np.take(COLOR_FEATURES, color_index(image), axis=0)
+
+def board_geometry(h, w, scale=1.0):
+    """
+    Board position for a screenshot of size (h, w).
+    Returns (board_x, board_y, board_size).
     """
-    global BOARD_X, BOARD_Y, BOARD_SIZE, CELL_SIZE
-    
-    h, w, _ = image.shape
-    
     # Smart Board Positioning
     # Check aspect ratio
     aspect_ratio = h / w
@@ -70,96 +365,106 @@ def parse_board(image):
         max_board_h = int(h * 0.70)
         target_board_w = int(w * 0.92)
         
-        BOARD_SIZE = min(target_board_w, max_board_h)
+        board_size = min(target_board_w, max_board_h)
         
         # Center the board horizontally
-        BOARD_X = (w - BOARD_SIZE) // 2
+        board_x = (w - board_size) // 2
         
         # Position board at top with small margin
-        BOARD_Y = int(h * 0.05)
+        board_y = int(h * 0.05)
             
     else:
         # Tall image (Phone screen) - precise user measurements
         # Top-Left: (65, 584), Bottom-Right: (1015, 1533)
         # Width: 1015 - 65 = 950
         # Height: 1533 - 584 = 949
-        BOARD_X = 65
-        BOARD_Y = 584
-        BOARD_SIZE = 950
+        board_x = px(65, scale)
+        board_y = px(584, scale)
+        board_size = px(950, scale)
         
-        if BOARD_Y + BOARD_SIZE > h:
-            BOARD_Y = int(h * 0.15)
+        if board_y + board_size > h:
+            board_y = int(h * 0.15)
     
+    return board_x, board_y, board_size
+
+@tracing.traced('parse_board')
+def parse_board(image, scale=1.0, theme=None):
+    """
+    Parses the 8x8 grid from the screenshot.
+    `scale` is the working scale of `image` (see to_working_scale).
+    `theme` skips theme detection when the caller already knows it.
+    Returns a numpy matrix (8x8) where 1=filled, 0=empty.
+    """
+    global BOARD_X, BOARD_Y, BOARD_SIZE, CELL_SIZE, CELL_FILL
+    
+    h, w, _ = image.shape
+    board_x, board_y, board_size = board_geometry(h, w, scale)
+    cell_size = board_size // GRID_SIZE
+    
+    # Globals stay in screen pixels for the overlay
+    BOARD_X, BOARD_Y, BOARD_SIZE = to_screen(board_x, scale), to_screen(board_y, scale), to_screen(board_size, scale)
     CELL_SIZE = BOARD_SIZE // GRID_SIZE
     
     # Detect theme first
-    theme = detect_theme(image)
+    if theme is None:
+        theme = detect_theme(image, scale)
     print(f"Parsing Board with Theme: {theme}")
     
     board = np.zeros((GRID_SIZE, GRID_SIZE), dtype=int)
     
     # Extract board area
-    board_img = image[BOARD_Y:BOARD_Y+BOARD_SIZE, BOARD_X:BOARD_X+BOARD_SIZE]
+    board_img = image[board_y:board_y+board_size, board_x:board_x+board_size]
     
     if board_img.size == 0:
         print("ERROR: Board image is empty! Check coordinates.")
         return board
     
-    for r in range(GRID_SIZE):
-        for c in range(GRID_SIZE):
-            x1 = c * CELL_SIZE
-            y1 = r * CELL_SIZE
-            x2 = x1 + CELL_SIZE
-            y2 = y1 + CELL_SIZE
-            
-            # Sample center of cell to avoid borders
-            # Dynamic padding: 15% of cell size
-            padding = int(CELL_SIZE * 0.15)
-            cell = board_img[y1+padding:y2-padding, x1+padding:x2-padding]
-            
-            if theme == 'BLUE':
-                # Blue Theme: Filled cells are DARKER and MORE SATURATED
-                # Empty: Gray ~197, Sat ~100
-                # Filled: Gray ~78, Sat ~227
-                
-                gray = cv2.cvtColor(cell, cv2.COLOR_BGR2GRAY)
-                avg_gray = np.mean(gray)
-                
-                # Check Saturation as secondary confirmation
-                hsv = cv2.cvtColor(cell, cv2.COLOR_BGR2HSV)
-                avg_sat = np.mean(hsv[:,:,1])
-                
-                # Logic: Darker (< 150) AND Saturated (> 150)
-                if avg_gray < 150 and avg_sat > 150:
-                    board[r, c] = 1
-                else:
-                    board[r, c] = 0
-                    
-            elif theme == 'DARK':
-                # Dark Theme: Filled cells are BRIGHTER and COLORFUL
-                # Empty: Gray ~63 (dark gray)
-                # Filled: Bright colored (green, red, etc.) - Sat > 100, Val > 100
-                
-                hsv = cv2.cvtColor(cell, cv2.COLOR_BGR2HSV)
-                avg_sat = np.mean(hsv[:,:,1])
-                avg_val = np.mean(hsv[:,:,2])
-                
-                # Logic: Saturated (> 100) AND Bright (> 80)
-                if avg_sat > 100 and avg_val > 80:
-                    board[r, c] = 1
-                else:
-                    board[r, c] = 0
-                    
-            else:
-                # Green/Original Theme: Filled cells are BRIGHTER
-                avg_color = np.mean(cell)
-                if avg_color > 100:
-                    board[r, c] = 1
-                else:
-                    board[r, c] = 0
-                    
+    # gray/sat/val/mean of every pixel from the table, averaged per cell,
+    # then the theme rule (board_margin) decides each cell on its averages
+    features = color_features(board_img)
+    if features.shape[:2] != (board_size, board_size):
+        full = np.zeros((board_size, board_size, 4), np.uint8)
+        full[:features.shape[0], :features.shape[1]] = features
+        features = full
+    
+    # Sample center of cell to avoid borders
+    # Dynamic padding: 15% of cell size
+    padding = int(cell_size * 0.15)
+    # Inner-cell sums from one integral image: 4 corner lookups per cell
+    sums = cv2.integral(features)
+    start = np.arange(GRID_SIZE) * cell_size + padding
+    end = start + cell_size - 2 * padding
+    inner = sums[end][:, end] - sums[start][:, end] - sums[end][:, start] + sums[start][:, start]
+    CELL_FILL = board_fill(inner / (cell_size - 2 * padding) ** 2, theme)
+    board[:] = CELL_FILL > 0.5
+    
     return board
 
+def sample_cells(image, cells, theme=None, scale=1.0):
+    """
+    Fill score of a few board cells without parsing the board: a 3x3 grid of
+    single pixels inside each cell, averaged like parse_board averages the cell.
+    Uses the board position from the last parse_board (BOARD_X/BOARD_Y/CELL_SIZE).
+    Returns an array of scores (0-1, > 0.5 = filled), one per (r, c) in `cells`.
+    """
+    if not cells:
+        return np.zeros(0)
+    if theme is None:
+        theme = detect_theme(image, scale)
+    
+    # Sample points at 30/50/70% of the cell, away from the borders
+    offsets = np.array([0.3, 0.5, 0.7]) * CELL_SIZE
+    rows = np.array([r for r, _ in cells])
+    cols = np.array([c for _, c in cells])
+    ys = BOARD_Y + rows[:, None] * CELL_SIZE + offsets[None, :]
+    xs = BOARD_X + cols[:, None] * CELL_SIZE + offsets[None, :]
+    ys = (ys[:, :, None] * scale).astype(int).clip(0, image.shape[0] - 1)
+    xs = (xs[:, None, :] * scale).astype(int).clip(0, image.shape[1] - 1)
+    
+    pixels = image[ys, xs].reshape(-1, 1, 3)
+    features = color_features(pixels).reshape(len(cells), 9, 4)
+    return board_fill(features.mean(axis=1), theme)
+
 def get_shape_area(image):
     """
     Extracts the area where shapes are located.
@@ -182,7 +487,8 @@ def get_shape_area(image):
     start_y = BOARD_Y + BOARD_SIZE + int(h * 0.02) # Small padding
     return image[start_y:, :]
 
-def detect_theme(image):
+@tracing.traced('detect_theme')
+def detect_theme(image, scale=1.0):
     """
     Detects the color theme of the game.
     Returns 'DARK', 'BLUE', or 'GREEN'.
@@ -192,7 +498,8 @@ def detect_theme(image):
     start_y = int(h * 0.70)
     
     # Sample a 10x10 area
-    sample = image[start_y:start_y+10, 10:20]
+    n = px(10, scale)
+    sample = image[start_y:start_y+n, n:2*n]
     avg_color = np.mean(sample, axis=(0, 1)) # BGR
     b, g, r = avg_color
     
@@ -207,33 +514,30 @@ def detect_theme(image):
     else:
         return 'GREEN'
 
-def parse_shapes_adaptive(image):
-    """
-    Parses shapes using HSV Value thresholding (for Blue Theme).
-    Shapes are DARKER than background.
-    """
-    h, w, _ = image.shape
-    
-    # Constants - Calculate SPAWN_Y1 based on board position
+def spawn_y1_below_board(h, w):
+    """Top of the spawn area for the BLUE/DARK parsers: board end + small gap."""
     aspect_ratio = h / w
-    
-    # Calculate board end position first
     if aspect_ratio < 1.5:
         # Cropped window
         max_board_h = int(h * 0.70)
         target_board_w = int(w * 0.92)
         board_sz = min(target_board_w, max_board_h)
         board_y = int(h * 0.05)
-        SPAWN_Y1 = board_y + board_sz + int(h * 0.02)  # Board end + small gap
     else:
         # Phone screen - calculate board end and add gap
         board_sz = int(w * 0.92)
         board_y = int(h * 0.23)
         if board_y + board_sz > h:
             board_y = int(h * 0.15)
-        SPAWN_Y1 = board_y + board_sz + int(h * 0.02)  # Board end + small gap 
-    
-    SPAWN_Y2 = h
+    return board_y + board_sz + int(h * 0.02)
+
+def layout_adaptive(image, scale=1.0):
+    """
+    Shape layout for the Blue Theme.
+    Shapes are DARKER and MORE SATURATED than the light blue background.
+    """
+    h, w, _ = image.shape
+    aspect_ratio = h / w
     
     # Dynamic Block Size
     if aspect_ratio < 1.5:
@@ -241,295 +545,68 @@ def parse_shapes_adaptive(image):
         target_board_w = int(w * 0.92)
         board_sz = min(target_board_w, max_board_h)
         cell_sz = board_sz // 8
-        BLOCK_SIZE_REF = max(10, int(cell_sz * 0.85))
+        BLOCK_SIZE_REF = max(px(10, scale), int(cell_sz * 0.85))
     else:
         # Phone screen: Smaller blocks = more accurate detection
         board_sz = int(w * 0.92)
         cell_sz = board_sz // 8
-        BLOCK_SIZE_REF = max(10, int(cell_sz * 0.50))
-    
-    # Extract shape area
-    shape_area = image[SPAWN_Y1:SPAWN_Y2, :]
-    print(f"DEBUG Shape: SPAWN_Y1={SPAWN_Y1}, SPAWN_Y2={SPAWN_Y2}, shape_area size={shape_area.shape}")
-    
-    # Convert to HSV
-    hsv = cv2.cvtColor(shape_area, cv2.COLOR_BGR2HSV)
-    v_channel = hsv[:,:,2]
-    s_channel = hsv[:,:,1]
-    
-    # For Blue Theme: Shapes are DARKER and MORE SATURATED than background
-    # Background: Light blue (V > 240, S ~150)
-    # Shapes: Dark blue (V < 230) OR High saturated (S > 180)
-    
-    # Detect DARK shapes (low Value) - V threshold raised to 230
-    _, mask_dark = cv2.threshold(v_channel, 230, 255, cv2.THRESH_BINARY_INV)
-    
-    # Detect HIGH SATURATION shapes (S > 180) but NOT bright background
-    _, mask_sat = cv2.threshold(s_channel, 180, 255, cv2.THRESH_BINARY)
-    _, mask_not_bright = cv2.threshold(v_channel, 240, 255, cv2.THRESH_BINARY_INV)
-    mask_saturated = cv2.bitwise_and(mask_sat, mask_not_bright)
-    
-    # Combined mask
-    thresh_original = cv2.bitwise_or(mask_dark, mask_saturated)
-    
-    # DEBUG: Save masks
-    cv2.imwrite("debug_shape_area.png", shape_area)
-    cv2.imwrite("debug_mask_dark.png", mask_dark)
-    cv2.imwrite("debug_mask_sat.png", mask_saturated)
-    cv2.imwrite("debug_thresh.png", thresh_original)
-    
-    # Morphological operations - use dilated version ONLY for contour detection
-    kernel = np.ones((5,5), np.uint8)
-    thresh_dilated = cv2.dilate(thresh_original, kernel, iterations=2)
-    
-    # Find contours on dilated mask
-    contours, _ = cv2.findContours(thresh_dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    print(f"DEBUG: Found {len(contours)} contours before filtering")
-    
-    # Use ORIGINAL thresh for pixel checking (not dilated)
-    thresh = thresh_original
-    
-    slot_width = w // 3
-    parsed_shapes = []
-    slots = [[], [], []]
-    
-    # Lower min_area to detect smaller shapes
-    min_area = (BLOCK_SIZE_REF * BLOCK_SIZE_REF) * 0.15
-    
-    if contours:
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            x, y, cw, ch = cv2.boundingRect(cnt)
-            print(f"DEBUG Contour: area={area:.1f}, min_area={min_area:.1f}, x={x}, y={y}, w={cw}, h={ch}")
-            
-            if area < min_area:
-                print("  -> FILTERED: area too small")
-                continue
-            
-            # Filter edge noise: Skip thin vertical contours (width < 15)
-            if cw < 15:
-                print("  -> FILTERED: width too small")
-                continue
-            
-            # Filter bottom noise: Skip contours in bottom 40% of shape area (watermarks/UI)
-            shape_area_height = shape_area.shape[0]
-            if y > shape_area_height * 0.6:
-                print(f"  -> FILTERED: bottom noise (y={y} > {shape_area_height * 0.6:.0f})")
-                continue
-            
-            center_x = x + cw // 2
-            
-            # Simple slot assignment (no padding)
-            slot_idx = min(2, center_x // slot_width)
-            print(f"  -> ASSIGNED to slot {slot_idx}")
-            if 0 <= slot_idx < 3:
-                slots[slot_idx].append(cnt)
-                
-    # DEBUG: Visualize Contours
-    debug_viz = shape_area.copy()
-    cv2.drawContours(debug_viz, contours, -1, (0, 255, 0), 1)
-    cv2.line(debug_viz, (slot_width, 0), (slot_width, shape_area.shape[0]), (0, 0, 255), 2)
-    cv2.line(debug_viz, (slot_width*2, 0), (slot_width*2, shape_area.shape[0]), (0, 0, 255), 2)
-    cv2.imwrite("debug_contours.png", debug_viz)
-    
-    # Process each slot
-    for i in range(3):
-        slot_contours = slots[i]
-        if not slot_contours:
-            parsed_shapes.append(([], None))
-            continue
-        
-        print(f"DEBUG: Processing slot {i} with {len(slot_contours)} contours")
-            
-        all_points = np.concatenate(slot_contours)
-        x, y, w_rect, h_rect = cv2.boundingRect(all_points)
-        
-        # Accordion Logic
-        cols_count = max(1, int(round(w_rect / BLOCK_SIZE_REF)))
-        rows_count = max(1, int(round(h_rect / BLOCK_SIZE_REF)))
-        
-        print(f"DEBUG: bbox x={x}, y={y}, w={w_rect}, h={h_rect}, cols={cols_count}, rows={rows_count}, BLOCK_SIZE_REF={BLOCK_SIZE_REF}")
-        
-        actual_cell_w = w_rect / cols_count
-        actual_cell_h = h_rect / rows_count
-        
-        screen_bbox = (x, SPAWN_Y1 + y, w_rect, h_rect)
-        shape_matrix = []
-        
-        for r in range(rows_count):
-            for c_idx in range(cols_count):
-                cx_rel = (c_idx * actual_cell_w) + (actual_cell_w / 2)
-                cy_rel = (r * actual_cell_h) + (actual_cell_h / 2)
-                
-                mask_x = int(x + cx_rel)
-                mask_y = int(y + cy_rel)
-                
-                # Sample 5x5 area around center
-                y_min = max(0, mask_y - 2)
-                y_max = min(thresh.shape[0], mask_y + 3)
-                x_min = max(0, mask_x - 2)
-                x_max = min(thresh.shape[1], mask_x + 3)
-                
-                roi = thresh[y_min:y_max, x_min:x_max]
-                pixel_count = np.count_nonzero(roi)
-                # Check if any pixels are present
-                if pixel_count > 3:
-                    shape_matrix.append((r, c_idx))
-                    
-        print(f"DEBUG: shape_matrix = {shape_matrix}")
-        
-        if not shape_matrix:
-            parsed_shapes.append(([], None))
-        else:
-            parsed_shapes.append((shape_matrix, screen_bbox))
-            
-    return parsed_shapes
+        BLOCK_SIZE_REF = max(px(10, scale), int(cell_sz * 0.50))
+    
+    SPAWN_Y1 = spawn_y1_below_board(h, w)
+    return {
+        'theme': 'BLUE',
+        'spawn_y1': SPAWN_Y1,
+        'spawn_y2': h,
+        'block': BLOCK_SIZE_REF,
+        'kernel': 5,
+        # Lower min_area to detect smaller shapes
+        'min_area': (BLOCK_SIZE_REF * BLOCK_SIZE_REF) * 0.15,
+        # Filter edge noise: Skip thin vertical blobs (width < 15)
+        'min_width': px(15, scale),
+        'min_y': 0,
+        # Filter bottom noise: Skip blobs in bottom 40% of shape area (watermarks/UI)
+        'max_y': (h - SPAWN_Y1) * 0.6,
+        'largest': False,
+        'window': True,
+    }
 
-def parse_shapes(image):
+def layout_dark(image, scale=1.0):
     """
-    Analyzes the bottom area for available shapes.
-    Dispatches to the correct logic based on theme.
-    """
-    theme = detect_theme(image)
-    print(f"Detected Theme: {theme}")
-    
-    if theme == 'BLUE':
-        return parse_shapes_adaptive(image)
-    elif theme == 'DARK':
-        return parse_shapes_dark(image)
-    else:
-        # Use V12 Logic for Green/Original Theme
-        return parse_shapes_v12(image)
-
-def parse_shapes_dark(image):
-    """
-    Parses shapes for DARK theme.
+    Shape layout for the DARK theme.
     Shapes are BRIGHT and COLORFUL on dark background.
     """
     h, w, _ = image.shape
-    
-    # Constants - Calculate SPAWN_Y1 based on board position
     aspect_ratio = h / w
     
-    if aspect_ratio < 1.5:
-        max_board_h = int(h * 0.70)
-        target_board_w = int(w * 0.92)
-        board_sz = min(target_board_w, max_board_h)
-        board_y = int(h * 0.05)
-        SPAWN_Y1 = board_y + board_sz + int(h * 0.02)
-    else:
-        board_sz = int(w * 0.92)
-        board_y = int(h * 0.23)
-        if board_y + board_sz > h:
-            board_y = int(h * 0.15)
-        SPAWN_Y1 = board_y + board_sz + int(h * 0.02)
-    
-    SPAWN_Y2 = h
-    
     # Dynamic Block Size - smaller = more blocks detected
     if aspect_ratio < 1.5:
         board_sz = min(int(w * 0.92), int(h * 0.70))
         cell_sz = board_sz // 8
-        BLOCK_SIZE_REF = max(10, int(cell_sz * 0.65))  # Reduced from 0.85
+        BLOCK_SIZE_REF = max(px(10, scale), int(cell_sz * 0.65))  # Reduced from 0.85
     else:
         board_sz = int(w * 0.92)
         cell_sz = board_sz // 8
-        BLOCK_SIZE_REF = max(10, int(cell_sz * 0.45))  # Increased from 0.40 to fix 5->6 issue
-    
-    # Extract shape area
-    shape_area = image[SPAWN_Y1:SPAWN_Y2, :]
-    print(f"DEBUG DARK Shape: SPAWN_Y1={SPAWN_Y1}, shape_area size={shape_area.shape}")
-    
-    # Convert to HSV - detect BRIGHT SATURATED shapes
-    hsv = cv2.cvtColor(shape_area, cv2.COLOR_BGR2HSV)
-    s_channel = hsv[:,:,1]
-    v_channel = hsv[:,:,2]
-    
-    # Shapes are SATURATED (> 100) AND BRIGHT (> 80)
-    _, mask_sat = cv2.threshold(s_channel, 100, 255, cv2.THRESH_BINARY)
-    _, mask_val = cv2.threshold(v_channel, 80, 255, cv2.THRESH_BINARY)
-    thresh = cv2.bitwise_and(mask_sat, mask_val)
-    
-    # Dilate to merge nearby pixels
-    kernel = np.ones((5,5), np.uint8)
-    thresh_dilated = cv2.dilate(thresh, kernel, iterations=2)
-    
-    # Find contours
-    contours, _ = cv2.findContours(thresh_dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    print(f"DEBUG DARK: Found {len(contours)} contours")
-    
-    slot_width = w // 3
-    parsed_shapes = []
-    slots = [[], [], []]
-    
-    min_area = (BLOCK_SIZE_REF * BLOCK_SIZE_REF) * 0.15
-    shape_area_height = shape_area.shape[0]
-    
-    if contours:
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            x, y, cw, ch = cv2.boundingRect(cnt)
-            
-            if area < min_area: continue
-            if cw < 15: continue
-            if y > shape_area_height * 0.6: continue  # Filter bottom noise
-            
-            center_x = x + cw // 2
-            slot_idx = min(2, center_x // slot_width)
-            if 0 <= slot_idx < 3:
-                slots[slot_idx].append(cnt)
-    
-    # Process each slot
-    for i in range(3):
-        slot_contours = slots[i]
-        if not slot_contours:
-            parsed_shapes.append(([], None))
-            continue
-            
-        all_points = np.concatenate(slot_contours)
-        x, y, w_rect, h_rect = cv2.boundingRect(all_points)
-        
-        cols_count = max(1, int(round(w_rect / BLOCK_SIZE_REF)))
-        rows_count = max(1, int(round(h_rect / BLOCK_SIZE_REF)))
-        
-        actual_cell_w = w_rect / cols_count
-        actual_cell_h = h_rect / rows_count
-        
-        screen_bbox = (x, SPAWN_Y1 + y, w_rect, h_rect)
-        shape_matrix = []
-        
-        for r in range(rows_count):
-            for c_idx in range(cols_count):
-                cx_rel = (c_idx * actual_cell_w) + (actual_cell_w / 2)
-                cy_rel = (r * actual_cell_h) + (actual_cell_h / 2)
-                
-                mask_x = int(x + cx_rel)
-                mask_y = int(y + cy_rel)
-                
-                y_min = max(0, mask_y - 2)
-                y_max = min(thresh.shape[0], mask_y + 3)
-                x_min = max(0, mask_x - 2)
-                x_max = min(thresh.shape[1], mask_x + 3)
-                
-                roi = thresh[y_min:y_max, x_min:x_max]
-                if np.count_nonzero(roi) > 3:
-                    shape_matrix.append((r, c_idx))
-                    
-        if not shape_matrix:
-            parsed_shapes.append(([], None))
-        else:
-            parsed_shapes.append((shape_matrix, screen_bbox))
-    
-    # Save debug image
-    debug_viz = shape_area.copy()
-    cv2.drawContours(debug_viz, contours, -1, (0, 255, 0), 2)
-    cv2.imwrite("debug_dark_contours.png", debug_viz)
-    
-    return parsed_shapes
+        BLOCK_SIZE_REF = max(px(10, scale), int(cell_sz * 0.45))  # Increased from 0.40 to fix 5->6 issue
+    
+    SPAWN_Y1 = spawn_y1_below_board(h, w)
+    return {
+        'theme': 'DARK',
+        'spawn_y1': SPAWN_Y1,
+        'spawn_y2': h,
+        'block': BLOCK_SIZE_REF,
+        'kernel': 5,
+        'min_area': (BLOCK_SIZE_REF * BLOCK_SIZE_REF) * 0.15,
+        'min_width': px(15, scale),
+        'min_y': 0,
+        'max_y': (h - SPAWN_Y1) * 0.6,
+        'largest': False,
+        'window': True,
+    }
 
-def parse_shapes_v12(image):
+def layout_v12(image, scale=1.0):
     """
-    V12 Dilation & Accordion logic (Original for Green Theme).
+    V12 Dilation & Accordion layout (Original for Green Theme).
+    Shapes are bright (V > 120).
     """
     h, w, _ = image.shape
     
@@ -539,77 +616,245 @@ def parse_shapes_v12(image):
         SPAWN_Y1 = int(h * 0.76) # Start below the board (which ends at ~0.75h)
     else:
         SPAWN_Y1 = int(h * 0.70) 
-        if SPAWN_Y1 < 1600 and h > 2000: SPAWN_Y1 = 1600 
-        
-    SPAWN_Y2 = h
+        if SPAWN_Y1 < px(1600, scale) and h > px(2000, scale): SPAWN_Y1 = px(1600, scale)
     
     # Dynamic Block Size (approx 4.7% of screen width)
-    BLOCK_SIZE_REF = max(10, int(w * 0.047))
-    
-    TUNED_THRESHOLD = 120
-    
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    v_channel = hsv[:,:,2]
-    
-    slot_width = w // 3
-    parsed_shapes = []
-    kernel = np.ones((7, 7), np.uint8)
-    
-    for i in range(3):
-        x_start = i * slot_width
-        x_end = (i + 1) * slot_width
-        roi = v_channel[SPAWN_Y1:min(SPAWN_Y2, h), x_start:x_end]
-        
-        if roi.size == 0:
-            parsed_shapes.append(([], None))
-            continue
-            
-        _, mask = cv2.threshold(roi, TUNED_THRESHOLD, 255, cv2.THRESH_BINARY)
-        dilated_mask = cv2.dilate(mask, kernel, iterations=2)
-        contours, _ = cv2.findContours(dilated_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        shape_matrix = []
-        screen_bbox = None
-        
-        if contours:
-            sorted_contours = sorted(contours, key=cv2.contourArea, reverse=True)
-            valid_contour = None
-            for c in sorted_contours:
-                cx, cy, cw, ch = cv2.boundingRect(c)
-                if cy < 10: continue
-                if cv2.contourArea(c) > (BLOCK_SIZE_REF * BLOCK_SIZE_REF / 4):
-                    valid_contour = c
-                    break
-            
-            if valid_contour is not None:
-                x, y, w_rect, h_rect = cv2.boundingRect(valid_contour)
-                cols_count = max(1, int(round(w_rect / BLOCK_SIZE_REF)))
-                rows_count = max(1, int(round(h_rect / BLOCK_SIZE_REF)))
-                actual_cell_w = w_rect / cols_count
-                actual_cell_h = h_rect / rows_count
-                
-                global_x = x_start + x
-                global_y = SPAWN_Y1 + y
-                screen_bbox = (global_x, global_y, w_rect, h_rect)
-                
-                for r in range(rows_count):
-                    for c_idx in range(cols_count):
-                        cx_rel = (c_idx * actual_cell_w) + (actual_cell_w / 2)
-                        cy_rel = (r * actual_cell_h) + (actual_cell_h / 2)
-                        mask_x = int(x + cx_rel)
-                        mask_y = int(y + cy_rel)
-                        mask_x = min(max(0, mask_x), mask.shape[1]-1)
-                        mask_y = min(max(0, mask_y), mask.shape[0]-1)
-                        if mask[mask_y, mask_x] > 0:
-                            shape_matrix.append((r, c_idx))
-                            
-        if not shape_matrix:
-            parsed_shapes.append(([], None))
-        else:
-            parsed_shapes.append((shape_matrix, screen_bbox))
+    BLOCK_SIZE_REF = max(px(10, scale), int(w * 0.047))
+    
+    return {
+        'theme': 'GREEN',
+        'spawn_y1': SPAWN_Y1,
+        'spawn_y2': h,
+        'block': BLOCK_SIZE_REF,
+        'kernel': 7,
+        'min_area': BLOCK_SIZE_REF * BLOCK_SIZE_REF / 4,
+        'min_width': 0,
+        # Ignore blobs touching the top edge
+        'min_y': px(10, scale),
+        'max_y': None,
+        # Largest blob only
+        'largest': True,
+        'window': False,
+    }
+
+SHAPE_LAYOUTS = {'BLUE': layout_adaptive, 'DARK': layout_dark, 'GREEN': layout_v12}
+
+def shape_layout(image, theme, scale=1.0):
+    return SHAPE_LAYOUTS[theme](image, scale)
+
+def slot_roi(image, layout, slot):
+    """One third of the spawn area. Returns (roi, x_start)."""
+    slot_width = image.shape[1] // 3
+    x_start = slot * slot_width
+    return image[layout['spawn_y1']:layout['spawn_y2'], x_start:x_start + slot_width], x_start
+
+def slot_fingerprint(image, layout, slot, size=(12, 12)):
+    """Tiny gray thumbnail of one spawn slot, enough to tell whether it changed."""
+    roi, _ = slot_roi(image, layout, slot)
+    if roi.size == 0:
+        return None
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+class SlotCache:
+    """
+    Last parse of each spawn slot, keyed by its fingerprint.
+    After a placement only one slot changes (all three after the third piece),
+    so the other slots reuse their shape and bbox instead of being re-segmented.
+    """
+    def __init__(self, threshold=12):
+        self.threshold = threshold    # max thumbnail difference (gray levels)
+        self.key = None
+        self.entries = [None] * 3     # (fingerprint, (shape_matrix, screen_bbox))
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, image, scale, layout):
+        """
+        Returns (results, fingerprints): results[i] is the cached parse of
+        slot i, or None if that slot has to be parsed again.
+        """
+        key = (image.shape, scale, layout['theme'], layout['spawn_y1'], layout['spawn_y2'])
+        if key != self.key:
+            self.key = key
+            self.entries = [None] * 3
+
+        results, fingerprints = [], []
+        for slot in range(3):
+            fp = slot_fingerprint(image, layout, slot)
+            entry = self.entries[slot]
+            if fp is not None and entry is not None and int(np.max(np.abs(fp - entry[0]))) <= self.threshold:
+                results.append(entry[1])
+                self.hits += 1
+            else:
+                results.append(None)
+                self.misses += 1
+            fingerprints.append(fp)
+        return results, fingerprints
+
+    def store(self, slot, fingerprint, result):
+        if fingerprint is not None:
+            self.entries[slot] = (fingerprint, result)
+
+    def clear(self):
+        self.key = None
+        self.entries = [None] * 3
+
+def slot_mask(image, layout, slot):
+    """Shape-color mask of one spawn slot. Returns (mask, x_start)."""
+    roi, x_start = slot_roi(image, layout, slot)
+    if roi.size == 0:
+        return None, x_start
+    return classify_colors(roi, color_lut(layout['theme'], 'shape')), x_start
+
+def read_shape(mask, bbox, layout, scale, x_start):
+    """
+    Accordion sampling of the blob at `bbox` (slot mask coordinates).
+    Returns (shape_matrix, screen_bbox) or ([], None).
+    """
+    if mask is None or bbox is None:
+        return ([], None)
+    
+    x, y, w_rect, h_rect = bbox
+    BLOCK_SIZE_REF = layout['block']
+    
+    # Accordion Logic
+    cols_count = max(1, int(round(w_rect / BLOCK_SIZE_REF)))
+    rows_count = max(1, int(round(h_rect / BLOCK_SIZE_REF)))
+    actual_cell_w = w_rect / cols_count
+    actual_cell_h = h_rect / rows_count
+    
+    screen_bbox = (to_screen(x_start + x, scale), to_screen(layout['spawn_y1'] + y, scale),
+                   to_screen(w_rect, scale), to_screen(h_rect, scale))
+    shape_matrix = []
+    
+    for r in range(rows_count):
+        for c_idx in range(cols_count):
+            cx_rel = (c_idx * actual_cell_w) + (actual_cell_w / 2)
+            cy_rel = (r * actual_cell_h) + (actual_cell_h / 2)
+            mask_x = int(x + cx_rel)
+            mask_y = int(y + cy_rel)
             
+            if layout['window']:
+                # Sample 5x5 area around center
+                filled = sample_filled(mask, mask_x, mask_y, scale)
+            else:
+                mask_x = min(max(0, mask_x), mask.shape[1]-1)
+                mask_y = min(max(0, mask_y), mask.shape[0]-1)
+                filled = mask[mask_y, mask_x] > 0
+            if filled:
+                shape_matrix.append((r, c_idx))
+    
+    if not shape_matrix:
+        return ([], None)
+    return (shape_matrix, screen_bbox)
+
+def segment_args(layout):
+    return dict(min_width=layout['min_width'], min_y=layout['min_y'],
+                max_y=layout['max_y'], largest=layout['largest'])
+
+@tracing.traced('parse_slot')
+def parse_slot(image, scale, layout, slot):
+    """
+    Parses one of the three spawn slots on its own (mask, dilation,
+    segmentation, accordion sampling), for VisionExecutor's pool where the
+    slots run in parallel. The sequential path is parse_spawn.
+    Returns (shape_matrix, screen_bbox) or ([], None).
+    """
+    mask, x_start = slot_mask(image, layout, slot)
+    if mask is None:
+        return ([], None)
+    # Dilated version is ONLY for segmentation, sampling uses the original mask
+    dilated = dilate(mask, layout['kernel'], 2, scale)
+    bbox = segment_spawn(dilated, layout['min_area'], slots=1, **segment_args(layout))[0]
+    return read_shape(mask, bbox, layout, scale, x_start)
+
+@tracing.traced('parse_spawn')
+def parse_spawn(image, scale, layout, slots=(0, 1, 2)):
+    """
+    The given spawn slots with a single labelling pass: each slot is dilated
+    on its own (a dilation must not leak into the next slot), the dilated
+    slots are laid side by side with an empty column between them, and
+    segment_spawn labels that combined mask once.
+    Returns {slot: (shape_matrix, screen_bbox) or ([], None)}.
+    """
+    masks = {i: slot_mask(image, layout, i) for i in slots}
+    live = [i for i in slots if masks[i][0] is not None]
+    results = {i: ([], None) for i in slots}
+    if not live:
+        return results
+    
+    dilated = [dilate(masks[i][0], layout['kernel'], 2, scale) for i in live]
+    height, width = dilated[0].shape
+    combined = np.zeros((height, len(live) * (width + 1) - 1), np.uint8)
+    for k, d in enumerate(dilated):
+        combined[:, k * (width + 1):k * (width + 1) + width] = d
+    bboxes = segment_spawn(combined, layout['min_area'], slots=len(live), gap=1, **segment_args(layout))
+    
+    for i, bbox in zip(live, bboxes):
+        mask, x_start = masks[i]
+        results[i] = read_shape(mask, bbox, layout, scale, x_start)
+    return results
+
+def parse_slots(image, scale, layout, cache=None):
+    """Sequential path: the three slots in one labelling pass (only the changed ones with a cache)."""
+    if cache is None:
+        parsed = parse_spawn(image, scale, layout)
+        parsed_shapes = [parsed[i] for i in range(3)]
+    else:
+        parsed_shapes, fingerprints = cache.lookup(image, scale, layout)
+        missing = [i for i in range(3) if parsed_shapes[i] is None]
+        if missing:
+            parsed = parse_spawn(image, scale, layout, missing)
+            for i in missing:
+                parsed_shapes[i] = parsed[i]
+                cache.store(i, fingerprints[i], parsed[i])
+    print(f"DEBUG: {layout['theme']} shapes = {[shape for shape, _ in parsed_shapes]}")
+    
+    if SAVE_DEBUG_IMAGES:
+        shape_area = image[layout['spawn_y1']:layout['spawn_y2']]
+        cv2.imwrite("debug_shape_area.png", shape_area)
+        draw_segments(shape_area, parsed_shapes, layout['spawn_y1'], scale, "debug_contours.png")
     return parsed_shapes
 
+def parse_shapes_adaptive(image, scale=1.0):
+    """
+    Parses shapes using the Blue Theme color table.
+    Shapes are DARKER than background.
+    """
+    return parse_slots(image, scale, layout_adaptive(image, scale))
+
+def parse_shapes_dark(image, scale=1.0):
+    """
+    Parses shapes for DARK theme.
+    Shapes are BRIGHT and COLORFUL on dark background.
+    """
+    return parse_slots(image, scale, layout_dark(image, scale))
+
+def parse_shapes_v12(image, scale=1.0):
+    """
+    V12 Dilation & Accordion logic (Original for Green Theme).
+    """
+    return parse_slots(image, scale, layout_v12(image, scale))
+
+@tracing.traced('parse_shapes')
+def parse_shapes(image, scale=1.0, theme=None):
+    """
+    Analyzes the bottom area for available shapes.
+    Dispatches to the correct logic based on theme.
+    """
+    if theme is None:
+        theme = detect_theme(image, scale)
+    print(f"Detected Theme: {theme}")
+    
+    if theme == 'BLUE':
+        return parse_shapes_adaptive(image, scale)
+    elif theme == 'DARK':
+        return parse_shapes_dark(image, scale)
+    else:
+        # Use V12 Logic for Green/Original Theme
+        return parse_shapes_v12(image, scale)
+
 if __name__ == "__main__":
     # Test capture
     img = capture_screen()
@@ -0,0 +1,122 @@
+import contextlib
+import os
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import tracing
+import vision
+from frame_source import ReplayFrameSource
+
+class VisionExecutor:
+    """
+    Runs parse_board and the three spawn slots concurrently on a small,
+    reusable thread pool. OpenCV releases the GIL in the color/dilate/labelling
+    calls, so on a multi-core phone the four jobs really overlap.
+    parse() returns the same (board, [(shape_matrix, bbox), ...]) as
+    vision.parse_frame. Slots whose fingerprint did not change since the last
+    call are taken from a vision.SlotCache instead of being parsed again.
+    """
+    def __init__(self, workers=4, cache_slots=True):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vision')
+        self.slot_cache = vision.SlotCache() if cache_slots else None
+        self.last_frame = None    # (working image, scale, theme) of the last parse, for the recorder
+
+    def submit_slots(self, work, scale, layout):
+        """
+        Starts the slot parses. Returns (jobs, fingerprints); a job is either a
+        Future or, for a slot that did not change, its cached result.
+        """
+        if self.slot_cache is None:
+            return [self.pool.submit(vision.parse_slot, work, scale, layout, i) for i in range(3)], None
+        cached, fingerprints = self.slot_cache.lookup(work, scale, layout)
+        jobs = [self.pool.submit(vision.parse_slot, work, scale, layout, i) if cached[i] is None else cached[i]
+                for i in range(3)]
+        return jobs, fingerprints
+
+    def collect_slots(self, jobs, fingerprints):
+        shapes_data = []
+        for i, job in enumerate(jobs):
+            if isinstance(job, Future):
+                job = job.result()
+                if self.slot_cache is not None:
+                    self.slot_cache.store(i, fingerprints[i], job)
+            shapes_data.append(job)
+        return shapes_data
+
+    @tracing.traced('parse')
+    def parse(self, image, cell_size=None):
+        work, scale = vision.to_working_scale(image, cell_size)
+        theme = vision.detect_theme(work, scale)
+        layout = vision.shape_layout(work, theme, scale)
+        self.last_frame = (work, scale, theme)
+
+        board_job = self.pool.submit(vision.parse_board, work, scale, theme)
+        slot_jobs = self.submit_slots(work, scale, layout)
+
+        shapes_data = self.collect_slots(*slot_jobs)
+        return board_job.result(), shapes_data
+
+    @tracing.traced('parse_shapes')
+    def parse_shapes(self, image, cell_size=None):
+        """Only the three slots, for when the board is already known."""
+        work, scale = vision.to_working_scale(image, cell_size)
+        theme = vision.detect_theme(work, scale)
+        layout = vision.shape_layout(work, theme, scale)
+        self.last_frame = (work, scale, theme)
+        return self.collect_slots(*self.submit_slots(work, scale, layout))
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+def compare(paths, rounds=20):
+    """Sequential parse_frame vs VisionExecutor.parse on the same frames."""
+    source = ReplayFrameSource(paths)
+    frames = []
+    img = source.read()
+    while img is not None:
+        frames.append(img)
+        img = source.read()
+    if not frames:
+        print("No frames to compare.")
+        return
+
+    vision.SAVE_DEBUG_IMAGES = False
+    seq_times, par_times, cached_times = [], [], []
+    mismatches = 0
+    with VisionExecutor(cache_slots=False) as executor, VisionExecutor() as cached, \
+            open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(rounds):
+            for img in frames:
+                t0 = time.perf_counter()
+                board_a, shapes_a = vision.parse_frame(img)
+                t1 = time.perf_counter()
+                board_b, shapes_b = executor.parse(img)
+                t2 = time.perf_counter()
+                # Every frame twice: the second parse only runs the board
+                cached.parse(img)
+                t3 = time.perf_counter()
+                board_c, shapes_c = cached.parse(img)
+                t4 = time.perf_counter()
+                seq_times.append((t1 - t0) * 1000)
+                par_times.append((t2 - t1) * 1000)
+                cached_times.append((t4 - t3) * 1000)
+                if not np.array_equal(board_a, board_b) or shapes_a != shapes_b or shapes_a != shapes_c:
+                    mismatches += 1
+
+    print(f"{len(frames)} frames x {rounds} rounds, {os.cpu_count()} cores")
+    print(f"Sequential: median={np.median(seq_times):.2f}ms, p90={np.percentile(seq_times, 90):.2f}ms")
+    print(f"Parallel:   median={np.median(par_times):.2f}ms, p90={np.percentile(par_times, 90):.2f}ms")
+    print(f"Cached slots: median={np.median(cached_times):.2f}ms, p90={np.percentile(cached_times, 90):.2f}ms")
+    print(f"Result mismatches: {mismatches}")
+
+if __name__ == "__main__":
+    # python vision_executor.py screenshots_dir_or_files...
+    compare(sys.argv[1:] or ["."])